@@ -1,16 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # 导入服务层
 from services.hint.socratic_hint import generate_socratic_hint
 from services.ai.ai_service import get_ai_hint
+from services.ai.hint_cache import hint_cache
+from services.conversation import conversation_history
+from services.question.question_cache import question_cache
+from services.answer.record_writer import answer_record_writer
+from services.analysis.analytics_engine import BASELINE_SCORE, AnswerStats, analytics_engine, build_summary
+from services.analysis.tag_stats import tag_totals_query
 
 # 导入数据库模型和依赖
-from models.base import get_db
-from models.models import Question, QuestionTag, AnswerRecord, StudentAnalysis
+from models.base import get_async_db
 
 router = APIRouter(prefix="/api", tags=["math-challenge"])
 
@@ -19,6 +24,20 @@ router = APIRouter(prefix="/api", tags=["math-challenge"])
 class StepRequest(BaseModel):
     content: str
     use_ai: bool = False
+    question_id: Optional[int] = None
+    client_id: Optional[str] = None  # 会话ID（可选），提供时提示会参考之前的对话
+
+
+async def _conversation_history(client_id: Optional[str]) -> Optional[List[Dict]]:
+    """获取会话之前的对话，未提供会话ID时返回None"""
+    return await conversation_history.aget_history(client_id) if client_id else None
+
+
+def _record_turn(client_id: Optional[str], step_content: str, hint: str) -> None:
+    """记录本轮的解题步骤和提示，供后续提示参考"""
+    if client_id:
+        conversation_history.add_message(client_id, "user", step_content, "step")
+        conversation_history.add_message(client_id, "ai", hint, "hint")
 
 
 class HintResponse(BaseModel):
@@ -38,18 +57,22 @@ async def get_hint(request: StepRequest):
 
     - **content**: 解题步骤内容
     - **use_ai**: 是否直接使用AI（默认False，先尝试本地规则）
+    - **question_id**: 题目ID（可选）
+    - **client_id**: 会话ID（可选），提供时AI提示会参考之前的对话
     """
     try:
+        history = await _conversation_history(request.client_id)
         if request.use_ai:
             # 直接使用AI
-            hint = await get_ai_hint(request.content)
+            hint = await get_ai_hint(request.content, question_id=request.question_id, history=history)
         else:
             # 先尝试本地规则
             hint = generate_socratic_hint(request.content)
             if not hint:
                 # 本地规则没有匹配时，使用AI
-                hint = await get_ai_hint(request.content)
+                hint = await get_ai_hint(request.content, question_id=request.question_id, history=history)
 
+        _record_turn(request.client_id, request.content, hint)
         return HintResponse(content=hint)
 
     except Exception as e:
@@ -82,15 +105,41 @@ async def get_ai_hint_endpoint(request: StepRequest):
     获取基于AI的提示
 
     - **content**: 解题步骤内容
+    - **question_id**: 题目ID（可选）
+    - **client_id**: 会话ID（可选），提供时提示会参考之前的对话
     """
     try:
-        hint = await get_ai_hint(request.content)
+        hint = await get_ai_hint(
+            request.content, question_id=request.question_id, history=await _conversation_history(request.client_id)
+        )
+        _record_turn(request.client_id, request.content, hint)
         return HintResponse(content=hint)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取AI提示失败: {str(e)}")
 
 
+class HintCacheStatsResponse(BaseModel):
+    enabled: bool
+    backend: str
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+    saved_calls: int
+    stores: int
+    evictions: int
+    errors: int
+
+
+@router.get("/hint-cache/stats", response_model=HintCacheStatsResponse)
+def get_hint_cache_stats():
+    """
+    获取AI提示缓存的命中率和节省的模型调用次数
+    """
+    return HintCacheStatsResponse(**hint_cache.stats())
+
+
 @router.get("/health", response_model=HealthResponse)
 def health_check():
     """
@@ -116,108 +165,82 @@ class QuestionResponse(BaseModel):
 class QuestionListResponse(BaseModel):
     questions: List[QuestionResponse]
     total: int
+    next_cursor: Optional[int] = None
+
+
+def _not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    处理条件请求：If-None-Match与当前ETag匹配时返回304响应，否则在响应头中设置ETag
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in candidates or etag in candidates or f"W/{etag}" in candidates:
+            return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
 
 
 @router.get("/questions", response_model=QuestionListResponse)
-def get_questions(
+async def get_questions(
+    request: Request,
+    response: Response,
     difficulty: Optional[int] = None,
     tags: Optional[str] = None,
-    limit: int = 10,
-    db: Session = Depends(get_db),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     获取题目列表
 
     - **difficulty**: 难度等级 (1-5)，对应：1-2初级，3中级，4-5高级
     - **tags**: 知识点标签，多个用逗号分隔
-    - **limit**: 返回数量限制
+    - **limit**: 返回数量限制 (1-100)
+    - **cursor**: 分页游标，传入上一页返回的next_cursor获取下一页
     """
     try:
-        query = db.query(Question)
-
-        # 根据难度筛选
-        if difficulty is not None:
-            if difficulty == 1:  # 初级：难度1-2
-                query = query.filter(Question.difficulty.in_([1, 2]))
-            elif difficulty == 2:  # 中级：难度3
-                query = query.filter(Question.difficulty == 3)
-            elif difficulty == 3:  # 高级：难度4-5
-                query = query.filter(Question.difficulty.in_([4, 5]))
-
-        # 根据知识点标签筛选
-        if tags:
-            tag_list = [tag.strip() for tag in tags.split(",")]
-            # 查找包含这些标签的题目ID
-            question_ids = (
-                db.query(QuestionTag.question_id)
-                .filter(QuestionTag.tag.in_(tag_list))
-                .distinct()
-                .all()
-            )
-            question_ids = [qid[0] for qid in question_ids]
-            query = query.filter(Question.id.in_(question_ids))
-
-        # 获取题目
-        questions = query.limit(limit).all()
-
-        # 构建响应
-        result = []
-        for q in questions:
-            # 获取题目的所有标签
-            q_tags = (
-                db.query(QuestionTag.tag).filter(QuestionTag.question_id == q.id).all()
-            )
-            tags_list = [tag[0] for tag in q_tags]
-
-            result.append(
-                QuestionResponse(
-                    id=q.id,
-                    type=q.type.value if hasattr(q.type, "value") else str(q.type),
-                    content=q.content,
-                    difficulty=q.difficulty,
-                    solution=q.solution,
-                    hint_pattern=q.hint_pattern,
-                    tags=tags_list,
-                )
-            )
+        snapshot = await question_cache.aget_snapshot(db)
+        not_modified = _not_modified(request, response, snapshot.etag)
+        if not_modified:
+            return not_modified
+
+        tag_list = [tag.strip() for tag in tags.split(",")] if tags else None
+        questions, total, next_cursor = snapshot.query(
+            difficulty=difficulty, tags=tag_list, limit=limit, cursor=cursor
+        )
 
-        return QuestionListResponse(questions=result, total=len(result))
+        return QuestionListResponse(
+            questions=[QuestionResponse(**q) for q in questions],
+            total=total,
+            next_cursor=next_cursor,
+        )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取题目失败: {str(e)}")
 
 
 @router.get("/questions/{question_id}", response_model=QuestionResponse)
-def get_question(question_id: int, db: Session = Depends(get_db)):
+async def get_question(
+    question_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
     """
     根据ID获取单个题目
     """
     try:
-        question = db.query(Question).filter(Question.id == question_id).first()
+        snapshot = await question_cache.aget_snapshot(db)
+        question = snapshot.questions.get(question_id)
         if not question:
             raise HTTPException(status_code=404, detail="题目不存在")
 
-        # 获取题目的所有标签
-        q_tags = (
-            db.query(QuestionTag.tag)
-            .filter(QuestionTag.question_id == question.id)
-            .all()
-        )
-        tags_list = [tag[0] for tag in q_tags]
-
-        return QuestionResponse(
-            id=question.id,
-            type=(
-                question.type.value
-                if hasattr(question.type, "value")
-                else str(question.type)
-            ),
-            content=question.content,
-            difficulty=question.difficulty,
-            solution=question.solution,
-            hint_pattern=question.hint_pattern,
-            tags=tags_list,
-        )
+        not_modified = _not_modified(request, response, snapshot.etag)
+        if not_modified:
+            return not_modified
+
+        return QuestionResponse(**question)
 
     except HTTPException:
         raise
@@ -226,13 +249,17 @@ def get_question(question_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/tags", response_model=List[str])
-def get_all_tags(db: Session = Depends(get_db)):
+async def get_all_tags(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """
     获取所有知识点标签
     """
     try:
-        tags = db.query(QuestionTag.tag).distinct().all()
-        return [tag[0] for tag in tags]
+        snapshot = await question_cache.aget_snapshot(db)
+        not_modified = _not_modified(request, response, snapshot.etag)
+        if not_modified:
+            return not_modified
+
+        return snapshot.tags
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取标签失败: {str(e)}")
 
@@ -240,6 +267,7 @@ def get_all_tags(db: Session = Depends(get_db)):
 # 答题记录相关模型
 class AnswerRecordRequest(BaseModel):
     question_id: int
+    student_id: Optional[str] = None
     student_input: str
     level: Optional[str] = None
     tag: Optional[str] = None
@@ -256,34 +284,57 @@ class AnswerRecordResponse(BaseModel):
         from_attributes = True
 
 
+class AnswerRecordBatchRequest(BaseModel):
+    records: List[AnswerRecordRequest] = Field(..., min_length=1, max_length=500)
+
+
+class AnswerRecordBatchResponse(BaseModel):
+    records: List[AnswerRecordResponse]
+
+
 @router.post("/answer-records", response_model=AnswerRecordResponse)
-def create_answer_record(record: AnswerRecordRequest, db: Session = Depends(get_db)):
+async def create_answer_record(record: AnswerRecordRequest):
     """
     创建答题记录
+
+    并发提交的记录会合并为一个事务批量写入
     """
     try:
-        db_record = AnswerRecord(
-            question_id=record.question_id,
-            student_input=record.student_input,
-            level=record.level,
-            tag=record.tag,
-            time_spent=record.time_spent,
-            hint_count=record.hint_count,
-        )
-        db.add(db_record)
-        db.commit()
-        db.refresh(db_record)
+        record_id, created_at = await answer_record_writer.submit(record.model_dump())
 
         return AnswerRecordResponse(
-            id=db_record.id,
-            question_id=db_record.question_id,
-            created_at=db_record.created_at.isoformat(),
+            id=record_id,
+            question_id=record.question_id,
+            created_at=created_at.isoformat(),
         )
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"保存答题记录失败: {str(e)}")
 
 
+@router.post("/answer-records/batch", response_model=AnswerRecordBatchResponse)
+async def create_answer_records_batch(batch: AnswerRecordBatchRequest):
+    """
+    批量创建答题记录，一次最多500条
+
+    - **records**: 答题记录列表
+    """
+    try:
+        results = await answer_record_writer.submit_many([record.model_dump() for record in batch.records])
+
+        return AnswerRecordBatchResponse(
+            records=[
+                AnswerRecordResponse(
+                    id=record_id,
+                    question_id=record.question_id,
+                    created_at=created_at.isoformat(),
+                )
+                for record, (record_id, created_at) in zip(batch.records, results)
+            ]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量保存答题记录失败: {str(e)}")
+
+
 # 分析数据相关模型
 class AnalysisResponse(BaseModel):
     abilities: dict
@@ -292,55 +343,80 @@ class AnalysisResponse(BaseModel):
 
 
 @router.get("/analysis", response_model=AnalysisResponse)
-def get_analysis(question_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def get_analysis(
+    question_id: Optional[int] = None,
+    student_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
     """
     获取学习分析数据
 
-    - **question_id**: 题目ID（可选）
+    - **question_id**: 题目ID（可选），指定时知识点得分只包含该题目的标签
+    - **student_id**: 学生ID（可选），为空时统计全部答题记录
     """
     try:
-        # 这里可以根据实际答题记录计算分析数据
-        # 目前返回示例数据
+        result = await analytics_engine.compute(db, student_id=student_id)
+        abilities = result["abilities"]
+        tag_scores = result["tag_scores"]
 
-        # 获取该题目的标签
-        tags = []
+        tags = None
         if question_id:
-            q_tags = (
-                db.query(QuestionTag.tag)
-                .filter(QuestionTag.question_id == question_id)
-                .all()
-            )
-            tags = [tag[0] for tag in q_tags]
-
-        # 生成示例分析数据
-        abilities = {
-            "逻辑推理": 75,
-            "空间想象": 60,
-            "计算能力": 80,
-            "问题分析": 70,
-            "创新思维": 65,
-            "知识应用": 72,
-        }
-
-        tag_scores = {}
-        for tag in tags:
-            # 可以根据历史答题记录计算实际分数
-            tag_scores[tag] = 65
-
-        summary = f"根据您的答题表现，建议加强空间想象和创新思维能力的训练。"
-        if tags:
-            summary += f"在知识点方面，建议重点复习{', '.join(tags)}相关内容。"
-
-        # 保存分析数据
-        analysis = StudentAnalysis(
-            abilities=abilities, tag_scores=tag_scores, summary=summary
-        )
-        db.add(analysis)
-        db.commit()
+            # 题目标签来自题库缓存
+            snapshot = await question_cache.aget_snapshot(db)
+            question = snapshot.questions.get(question_id)
+            tags = question["tags"] if question else []
+            tag_scores = {tag: tag_scores.get(tag, BASELINE_SCORE) for tag in tags}
+
+        summary = build_summary(abilities, result["tag_scores"], tags)
 
         return AnalysisResponse(
             abilities=abilities, tag_scores=tag_scores, summary=summary
         )
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"获取分析数据失败: {str(e)}")
+
+
+class TagStatResponse(BaseModel):
+    tag: str
+    record_count: int
+    avg_time: Optional[float] = None
+    avg_hints: float
+    no_hint_rate: float
+    score: int
+
+
+@router.get("/tag-stats", response_model=List[TagStatResponse])
+async def get_tag_stats(
+    days: Optional[int] = Query(None, ge=1),
+    level: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    获取各知识点的答题统计，数据来自知识点统计汇总表
+
+    - **days**: 统计最近N天（可选，至少为1），为空时统计全部
+    - **level**: 难度级别（可选）
+    """
+    try:
+        since = datetime.utcnow().date() - timedelta(days=days - 1) if days is not None else None
+        rows = (await db.execute(tag_totals_query(since=since, level=level))).all()
+
+        totals: Dict[str, AnswerStats] = {}
+        for tag, _, _, *values in rows:
+            if tag:
+                totals.setdefault(tag, AnswerStats()).add(AnswerStats.from_totals(values))
+
+        return [
+            TagStatResponse(
+                tag=tag,
+                record_count=stats.count,
+                avg_time=stats.time_total / stats.timed_count if stats.timed_count else None,
+                avg_hints=stats.hint_total / stats.count,
+                no_hint_rate=stats.no_hint_count / stats.count,
+                score=stats.score(),
+            )
+            for tag, stats in sorted(totals.items())
+            if stats.count
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取知识点统计失败: {str(e)}")
@@ -1,15 +1,17 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Union
+import asyncio
 import logging
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
 # 导入服务层
 from services.hint.socratic_hint import generate_socratic_hint
-from services.ai.ai_service import get_ai_hint
-from services.conversation.connection_manager import ConnectionManager
+from services.ai.ai_service import get_ai_hint, stream_ai_hint
+from services.conversation import connection_manager, conversation_history
+from config import settings
 
 
 # WebSocket消息模型
@@ -17,11 +19,14 @@ class WebSocketMessage(BaseModel):
     type: str
     content: Optional[str] = None
     metadata: Optional[Dict] = None
+    request_id: Optional[Union[str, int]] = None  # 请求ID（可选），响应中原样返回，用于关联乱序到达的响应
 
 
 class StepMessage(WebSocketMessage):
     type: str = "step"
     content: str
+    stream: bool = False  # 是否以hint_delta/hint_done流式返回AI提示
+    question_id: Optional[int] = None
 
 
 class ErrorReportMessage(WebSocketMessage):
@@ -29,80 +34,203 @@ class ErrorReportMessage(WebSocketMessage):
     content: str
 
 
+class SubscribeMessage(WebSocketMessage):
+    type: str = "subscribe"  # subscribe加入房间，unsubscribe离开房间
+    room: str = Field(..., min_length=1, max_length=100)  # 房间名称，如class:3A、question:42
+
+
 class PingMessage(WebSocketMessage):
     type: str = "ping"
     content: Optional[str] = None
 
 
-# 创建连接管理器实例
-manager = ConnectionManager()
+# 使用全局连接管理器，与其他模块发送的消息共享同一组连接
+manager = connection_manager
+
+# 发送响应的函数，参数为响应消息
+Reply = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def handle_message(client_id: str, raw_data: dict, reply: Reply) -> None:
+    """
+    处理一条客户端消息
+
+    Args:
+        client_id: 客户端ID
+        raw_data: 客户端发送的消息
+        reply: 发送响应的函数
+    """
+    # 验证消息格式
+    message = WebSocketMessage(**raw_data)
+
+    # 根据消息类型处理
+    if message.type == "step":
+        # 处理解题步骤
+        step_msg = StepMessage(**raw_data)
+        step_content = step_msg.content
+
+        # 之前的对话，AI提示会参考，由上下文构建器按token预算截断
+        history = await conversation_history.aget_history(client_id)
+        conversation_history.add_message(client_id, "user", step_content, "step")
+
+        # 1. 首先尝试本地苏格拉底式提问规则
+        hint = generate_socratic_hint(step_content)
+
+        # 2. 本地规则没有匹配且客户端请求流式返回时，逐段推送AI提示
+        if not hint and step_msg.stream:
+            chunks = []
+            async for delta in stream_ai_hint(step_content, step_msg.question_id, history):
+                chunks.append(delta)
+                await reply({"type": "hint_delta", "content": delta})
+            hint = "".join(chunks)
+            conversation_history.add_message(client_id, "ai", hint, "hint")
+            await reply({"type": "hint_done", "content": hint})
+            return
+
+        # 3. 如果本地规则没有匹配，调用AI服务
+        if not hint:
+            hint = await get_ai_hint(step_content, question_id=step_msg.question_id, history=history)
+        conversation_history.add_message(client_id, "ai", hint, "hint")
+
+        # 4. 返回提示给客户端
+        await reply({"type": "hint", "content": hint})
+
+    elif message.type == "error_report":
+        # 处理错误报告（可扩展）
+        error_msg = ErrorReportMessage(**raw_data)
+        error_data = error_msg.content
+        # 可以在这里记录错误数据到数据库
+        await reply({"type": "acknowledge", "content": "错误报告已接收"})
+
+    elif message.type in ("subscribe", "unsubscribe"):
+        # 加入或离开房间，之后可接收发送到该房间的消息
+        subscribe_msg = SubscribeMessage(**raw_data)
+        if message.type == "subscribe":
+            manager.join_room(client_id, subscribe_msg.room)
+        else:
+            manager.leave_room(client_id, subscribe_msg.room)
+        await reply({
+            "type": f"{message.type}d",
+            "room": subscribe_msg.room,
+            "rooms": manager.get_client_rooms(client_id),
+        })
+
+    elif message.type == "ping":
+        # 心跳检测
+        ping_msg = PingMessage(**raw_data)
+        await reply({"type": "pong"})
+
+    else:
+        # 未知消息类型
+        await reply({"type": "error", "content": f"未知消息类型: {message.type}"})
+
+
+class ClientSession:
+    """
+    单个连接的消息调度
+
+    心跳消息在接收循环中直接响应；其他消息在独立的任务中处理，同一连接同时处理的消息数有上限。
+    新的解题步骤到达时取消仍在处理的上一个步骤，避免为过时的步骤调用大模型；
+    连接断开后取消全部消息且不再发送任何响应
+    """
+
+    def __init__(self, client_id: str, max_concurrency: int = 4):
+        """
+        初始化消息调度
+
+        Args:
+            client_id: 客户端ID
+            max_concurrency: 同时处理的最大消息数
+        """
+        self.client_id = client_id
+        self.max_concurrency = max_concurrency
+        self.tasks: Set[asyncio.Task] = set()
+        self.step_task: Optional[asyncio.Task] = None
+        # 被新的解题步骤取代而取消的任务，只有这些任务会收到cancelled响应
+        self.superseded: Set[asyncio.Task] = set()
+        self.closed = False
+
+    def _reply_for(self, request_id: Optional[Union[str, int]]) -> Reply:
+        """创建发送响应的函数，消息带有请求ID时响应中原样返回"""
+        async def reply(payload: Dict[str, Any]) -> None:
+            # 连接已断开，响应只会经消息总线转发给不存在的客户端
+            if self.closed:
+                return
+            if request_id is not None:
+                payload = dict(payload, request_id=request_id)
+            await manager.send_personal_message(payload, self.client_id)
+        return reply
+
+    async def _run(self, raw_data: dict, reply: Reply) -> None:
+        """处理消息并将错误返回给客户端"""
+        try:
+            await handle_message(self.client_id, raw_data, reply)
+        except asyncio.CancelledError:
+            if asyncio.current_task() in self.superseded:
+                await reply({"type": "cancelled", "content": "已被新的解题步骤取代"})
+            raise
+        except ValueError as ve:
+            # 消息格式错误
+            logger.warning(f"WebSocket消息格式错误: {str(ve)}")
+            await reply({"type": "error", "content": f"消息格式错误: {str(ve)}"})
+        except Exception as e:
+            # 其他处理错误
+            logger.error(f"处理WebSocket消息时出错: {str(e)}")
+            await reply({"type": "error", "content": f"处理消息时出错: {str(e)}"})
+
+    async def dispatch(self, raw_data: Any) -> None:
+        """
+        调度一条客户端消息
+
+        Args:
+            raw_data: 客户端发送的消息
+        """
+        data = raw_data if isinstance(raw_data, dict) else {}
+        reply = self._reply_for(data.get("request_id"))
+        message_type = data.get("type")
+
+        # 心跳消息直接响应，不受其他消息处理耗时的影响
+        if message_type == "ping":
+            await self._run(data, reply)
+            return
+
+        # 新的解题步骤取代仍在处理的上一个步骤
+        if message_type == "step" and self.step_task is not None and not self.step_task.done():
+            self.superseded.add(self.step_task)
+            self.step_task.cancel()
+            self.tasks.discard(self.step_task)
+
+        if len(self.tasks) >= self.max_concurrency:
+            await reply({"type": "error", "content": f"同时处理的消息过多（最多{self.max_concurrency}条），请稍后重试"})
+            return
+
+        task = asyncio.create_task(self._run(data, reply))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        task.add_done_callback(self.superseded.discard)
+        if message_type == "step":
+            self.step_task = task
+
+    def cancel_all(self) -> None:
+        """连接断开时取消所有正在处理的消息"""
+        self.closed = True
+        for task in list(self.tasks):
+            task.cancel()
+        self.tasks.clear()
 
 
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket端点处理函数"""
     client_id = await manager.connect(websocket)
+    session = ClientSession(client_id, max_concurrency=settings.websocket_max_concurrent_messages)
 
     try:
         while True:
             # 接收客户端消息
             raw_data = await websocket.receive_json()
-
-            try:
-                # 验证消息格式
-                message = WebSocketMessage(**raw_data)
-
-                # 根据消息类型处理
-                if message.type == "step":
-                    # 处理解题步骤
-                    step_msg = StepMessage(**raw_data)
-                    step_content = step_msg.content
-
-                    # 1. 首先尝试本地苏格拉底式提问规则
-                    hint = generate_socratic_hint(step_content)
-
-                    # 2. 如果本地规则没有匹配，调用AI服务
-                    if not hint:
-                        hint = await get_ai_hint(step_content)
-
-                    # 3. 返回提示给客户端
-                    await manager.send_personal_message(
-                        {"type": "hint", "content": hint}, client_id
-                    )
-
-                elif message.type == "error_report":
-                    # 处理错误报告（可扩展）
-                    error_msg = ErrorReportMessage(**raw_data)
-                    error_data = error_msg.content
-                    # 可以在这里记录错误数据到数据库
-                    await manager.send_personal_message(
-                        {"type": "acknowledge", "content": "错误报告已接收"}, client_id
-                    )
-
-                elif message.type == "ping":
-                    # 心跳检测
-                    ping_msg = PingMessage(**raw_data)
-                    manager.update_ping(client_id)
-                    await manager.send_personal_message({"type": "pong"}, client_id)
-
-                else:
-                    # 未知消息类型
-                    await manager.send_personal_message(
-                        {"type": "error", "content": f"未知消息类型: {message.type}"},
-                        client_id,
-                    )
-
-            except ValueError as ve:
-                # 消息格式错误
-                logger.warning(f"WebSocket消息格式错误: {str(ve)}")
-                await manager.send_personal_message(
-                    {"type": "error", "content": f"消息格式错误: {str(ve)}"}, client_id
-                )
-            except Exception as e:
-                # 其他处理错误
-                logger.error(f"处理WebSocket消息时出错: {str(e)}")
-                await manager.send_personal_message(
-                    {"type": "error", "content": f"处理消息时出错: {str(e)}"}, client_id
-                )
+            # 收到任何消息都说明连接仍然有效
+            manager.update_ping(client_id)
+            await session.dispatch(raw_data)
 
     except WebSocketDisconnect:
         # 客户端断开连接
@@ -113,4 +241,8 @@ async def websocket_endpoint(websocket: WebSocket):
         await manager.send_personal_message(
             {"type": "error", "content": f"服务器错误: {str(e)}"}, client_id
         )
+        # 断开会丢弃发送队列中的消息，先在有限时间内等待错误消息发出
+        await manager.flush([client_id], timeout=manager.send_timeout)
         manager.disconnect(client_id)
+    finally:
+        session.cancel_all()
@@ -0,0 +1,135 @@
+"""
+索引基准测试：在临时SQLite数据库中生成答题记录，对比创建索引前后热点查询的耗时
+
+用法：
+    python benchmarks/benchmark_indexes.py --rows 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select, text
+
+from models.base import Base
+from models.models import AnswerRecord, Question, QuestionTag, StudentAnalysis
+from services.analysis.analytics_engine import AnalyticsEngine
+
+TAGS = ["二次函数", "一元二次方程", "全等三角形", "相似三角形", "圆", "勾股定理", "平行四边形", "反比例函数"]
+LEVELS = ["beginner", "intermediate", "advanced"]
+QUESTION_COUNT = 2000
+STUDENT_COUNT = 5000
+
+
+def seed(engine, rows: int) -> None:
+    """生成题目、标签、答题记录和分析快照"""
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Question.__table__.insert(), [
+            {"id": qid, "type": rng.choice(["CHOICE", "CALCULATION", "PROOF"]), "content": f"题目{qid}", "difficulty": rng.randint(1, 5)}
+            for qid in range(1, QUESTION_COUNT + 1)
+        ])
+        conn.execute(QuestionTag.__table__.insert(), [
+            {"question_id": qid, "tag": tag}
+            for qid in range(1, QUESTION_COUNT + 1)
+            for tag in rng.sample(TAGS, 2)
+        ])
+
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "question_id": rng.randint(1, QUESTION_COUNT),
+                "student_id": f"s{rng.randint(1, STUDENT_COUNT)}",
+                "student_input": "x=1",
+                "level": rng.choice(LEVELS),
+                "tag": rng.choice(TAGS),
+                "time_spent": rng.randint(30, 1200),
+                "hint_count": rng.choice([0, 0, 0, 1, 2, 3]),
+                "created_at": start + timedelta(seconds=i * 30),
+            })
+            if len(batch) == 50000:
+                conn.execute(AnswerRecord.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(AnswerRecord.__table__.insert(), batch)
+
+        conn.execute(StudentAnalysis.__table__.insert(), [
+            {"student_id": f"s{sid}", "summary": "", "created_at": start + timedelta(days=day)}
+            for sid in range(1, STUDENT_COUNT + 1)
+            for day in range(0, 60, 6)
+        ])
+
+
+def hot_queries(rows: int):
+    """热点查询：名称和查询语句"""
+    recent = datetime(2025, 1, 1) + timedelta(seconds=int(rows * 30 * 0.95))
+    return [
+        ("单个学生的分析聚合", AnalyticsEngine._aggregate_query("s42")),
+        ("题目的答题记录数", select(func.count()).select_from(AnswerRecord).where(AnswerRecord.question_id == 42)),
+        ("知识点最近的答题记录", select(func.count()).select_from(AnswerRecord).where(
+            AnswerRecord.tag == "圆", AnswerRecord.created_at >= recent)),
+        ("学生最近的分析快照", select(StudentAnalysis.id).where(StudentAnalysis.student_id == "s42")
+            .order_by(StudentAnalysis.created_at.desc()).limit(1)),
+        ("按标签筛选题目", select(QuestionTag.question_id).where(QuestionTag.tag == "圆")),
+    ]
+
+
+def measure(engine, queries, repeat: int):
+    """每条查询执行repeat次，返回平均耗时（毫秒）"""
+    results = {}
+    with engine.connect() as conn:
+        for name, query in queries:
+            conn.execute(query).all()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(query).all()
+            results[name] = (time.perf_counter() - started) / repeat * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比创建索引前后热点查询的耗时")
+    parser.add_argument("--rows", type=int, default=1000000, help="答题记录数")
+    parser.add_argument("--repeat", type=int, default=5, help="每条查询的执行次数")
+    args = parser.parse_args()
+
+    from models.schema import upgrade_schema
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+        Base.metadata.create_all(bind=engine)
+        # 删除模型中定义的索引，模拟升级前的数据库
+        with engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+        print(f"正在生成 {args.rows} 条答题记录...")
+        started = time.perf_counter()
+        seed(engine, args.rows)
+        print(f"数据生成完成，耗时 {time.perf_counter() - started:.1f} 秒")
+
+        queries = hot_queries(args.rows)
+        before = measure(engine, queries, args.repeat)
+
+        started = time.perf_counter()
+        upgrade_schema(engine)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        print(f"索引创建完成，耗时 {time.perf_counter() - started:.1f} 秒")
+        after = measure(engine, queries, args.repeat)
+        engine.dispose()
+
+    print(f"\n{'查询':<16}{'无索引(ms)':>12}{'有索引(ms)':>12}{'加速比':>10}")
+    for name, _ in queries:
+        print(f"{name:<16}{before[name]:>12.2f}{after[name]:>12.2f}{before[name] / max(after[name], 1e-6):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,5 +26,88 @@ class Settings:
         self.ai_temperature = float(os.getenv("AI_TEMPERATURE", "0.7"))
         self.ai_max_tokens = int(os.getenv("AI_MAX_TOKENS", "100"))
         
+        # AI客户端连接池配置
+        self.ai_http_max_connections = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "100"))
+        self.ai_http_max_keepalive = int(os.getenv("AI_HTTP_MAX_KEEPALIVE", "20"))
+        self.ai_http_timeout = float(os.getenv("AI_HTTP_TIMEOUT", "60"))
+        
+        # AI重试配置
+        self.ai_retry_base_delay = float(os.getenv("AI_RETRY_BASE_DELAY", "1.0"))  # 退避基础延迟（秒）
+        self.ai_retry_max_delay = float(os.getenv("AI_RETRY_MAX_DELAY", "8.0"))  # 退避最大延迟（秒）
+        self.ai_retry_budget = float(os.getenv("AI_RETRY_BUDGET", "10"))  # 重试预算令牌桶容量
+        self.ai_retry_budget_refill = float(os.getenv("AI_RETRY_BUDGET_REFILL", "1.0"))  # 每秒补充的重试令牌数
+        
+        # AI提示缓存配置
+        self.hint_cache_enabled = os.getenv("HINT_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+        self.hint_cache_backend = os.getenv("HINT_CACHE_BACKEND", "memory")  # 缓存后端：memory, sqlite, redis
+        self.hint_cache_ttl = float(os.getenv("HINT_CACHE_TTL", "3600"))  # 缓存过期时间（秒）
+        self.hint_cache_max_entries = int(os.getenv("HINT_CACHE_MAX_ENTRIES", "10000"))
+        self.hint_cache_sqlite_path = os.getenv("HINT_CACHE_SQLITE_PATH", "./hint_cache.db")
+        self.hint_cache_redis_url = os.getenv("HINT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+        
+        # 多轮提示上下文配置
+        self.hint_max_prompt_tokens = int(os.getenv("HINT_MAX_PROMPT_TOKENS", "1024"))  # 单次提示请求的提示token上限（含系统提示）
+        self.hint_context_turns = int(os.getenv("HINT_CONTEXT_TURNS", "6"))  # 完整保留的最近对话消息数，更早的压缩为摘要
+        self.hint_question_max_tokens = int(os.getenv("HINT_QUESTION_MAX_TOKENS", "256"))  # 题目内容的token上限
+        self.hint_summary_tokens = int(os.getenv("HINT_SUMMARY_TOKENS", "64"))  # 较早对话摘要的token上限
+        
+        # 提示规则引擎配置
+        self.hint_rules_reload_interval = float(os.getenv("HINT_RULES_RELOAD_INTERVAL", "60"))  # 规则自动重新加载间隔（秒），0表示仅在本进程修改规则后重新加载
+        
+        # 题库缓存配置
+        self.question_cache_ttl = float(os.getenv("QUESTION_CACHE_TTL", "300"))  # 题库缓存有效期（秒），用于感知其他进程对题库的修改
+        
+        # WebSocket连接配置
+        self.websocket_heartbeat_timeout = float(os.getenv("WEBSOCKET_HEARTBEAT_TIMEOUT", "90"))  # 超过该时间（秒）没有收到消息的连接视为失效
+        self.websocket_reaper_interval = float(os.getenv("WEBSOCKET_REAPER_INTERVAL", "30"))  # 清理失效连接的间隔（秒），0表示不清理
+        self.websocket_send_queue_size = int(os.getenv("WEBSOCKET_SEND_QUEUE_SIZE", "100"))  # 每个客户端发送队列的最大消息数
+        self.websocket_send_timeout = float(os.getenv("WEBSOCKET_SEND_TIMEOUT", "5"))  # 单条消息的发送超时时间（秒），超时的客户端被断开
+        self.websocket_overflow_policy = os.getenv("WEBSOCKET_OVERFLOW_POLICY", "disconnect")  # 发送队列已满时：drop丢弃新消息，disconnect断开客户端
+        self.websocket_max_rooms_per_client = int(os.getenv("WEBSOCKET_MAX_ROOMS_PER_CLIENT", "20"))  # 每个连接最多加入的房间数
+        self.websocket_max_concurrent_messages = int(os.getenv("WEBSOCKET_MAX_CONCURRENT_MESSAGES", "4"))  # 每个连接同时处理的最大消息数（心跳除外）
+        self.websocket_bus_backend = os.getenv("WEBSOCKET_BUS_BACKEND", "memory")  # 跨worker消息总线：memory（仅本进程）, redis
+        self.websocket_bus_redis_url = os.getenv("WEBSOCKET_BUS_REDIS_URL", "redis://localhost:6379/2")
+        self.websocket_bus_channel = os.getenv("WEBSOCKET_BUS_CHANNEL", "endgame:ws")  # 发布订阅频道
+        
+        # 对话历史配置
+        self.conversation_max_history = int(os.getenv("CONVERSATION_MAX_HISTORY", "20"))  # 每个客户端保留的消息数
+        self.conversation_idle_ttl = float(os.getenv("CONVERSATION_IDLE_TTL", "1800"))  # 客户端空闲过期时间（秒），0表示不过期
+        self.conversation_max_memory_mb = float(os.getenv("CONVERSATION_MAX_MEMORY_MB", "64"))  # 全部对话历史的内存上限（MB），0表示不限制
+        
+        # 学习跟踪配置
+        self.learning_session_ttl = float(os.getenv("LEARNING_SESSION_TTL", "604800"))  # 学习会话在状态存储中的保留时间（秒）
+        self.learning_idle_ttl = float(os.getenv("LEARNING_IDLE_TTL", "1800"))  # 会话在本进程中的空闲过期时间（秒），0表示不过期
+        self.learning_max_sessions = int(os.getenv("LEARNING_MAX_SESSIONS", "10000"))  # 本进程保留的最大会话数，0表示不限制
+        
+        # 状态存储配置（对话历史和学习跟踪数据，多worker部署时使用sqlite或redis共享）
+        self.state_store_backend = os.getenv("STATE_STORE_BACKEND", "memory")  # 存储后端：memory, sqlite, redis
+        self.state_store_sqlite_path = os.getenv("STATE_STORE_SQLITE_PATH", "./state.db")
+        self.state_store_redis_url = os.getenv("STATE_STORE_REDIS_URL", "redis://localhost:6379/1")
+        self.state_store_batch_size = int(os.getenv("STATE_STORE_BATCH_SIZE", "100"))  # 缓冲区达到该数量时立即写入
+        self.state_store_flush_interval = float(os.getenv("STATE_STORE_FLUSH_INTERVAL", "1.0"))  # 缓冲区最长保留时间（秒）
+        self.state_store_cache_ttl = float(os.getenv("STATE_STORE_CACHE_TTL", "5.0"))  # 本进程读缓存有效期（秒）
+        self.state_store_cache_max_entries = int(os.getenv("STATE_STORE_CACHE_MAX_ENTRIES", "10000"))  # 本进程读缓存最大条目数
+        
+        # 答题记录批量写入配置
+        self.answer_record_batch_size = int(os.getenv("ANSWER_RECORD_BATCH_SIZE", "100"))  # 缓冲区达到该数量时立即写入
+        self.answer_record_flush_interval = float(os.getenv("ANSWER_RECORD_FLUSH_INTERVAL", "0.05"))  # 批量写入的最长等待时间（秒）
+        
+        # 学习分析配置
+        self.analysis_cache_ttl = float(os.getenv("ANALYSIS_CACHE_TTL", "300"))  # 分析结果缓存有效期（秒）
+        self.analysis_cache_max_entries = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))  # 缓存分析结果的最大学生数
+        self.analysis_snapshot_interval = float(os.getenv("ANALYSIS_SNAPSHOT_INTERVAL", "3600"))  # 保存分析快照的间隔（秒），0表示不保存
+        
         # 数据库配置
         self.database_url = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+        
+        # 数据库连接池配置
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # 获取连接的等待时间（秒）
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # 连接回收时间（秒），-1表示不回收
+        self.db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "True").lower() in ("true", "1", "yes")
+        
+        # SQLite并发配置
+        self.sqlite_wal = os.getenv("SQLITE_WAL", "True").lower() in ("true", "1", "yes")  # 启用WAL，读写互不阻塞
+        self.sqlite_synchronous = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # 同步模式：OFF, NORMAL, FULL, EXTRA
+        self.sqlite_busy_timeout = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # 数据库锁等待时间（毫秒）
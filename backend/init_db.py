@@ -2,7 +2,9 @@
 初始化数据库，插入 sql.log 中的数据
 """
 import json
+import argparse
 from models.base import Base, engine, SessionLocal
+from models.schema import upgrade_schema
 from models.models import (
     Question,
     QuestionTag,
@@ -18,6 +20,17 @@ def init_database():
     Base.metadata.create_all(bind=engine)
     print("数据库表创建完成！")
 
+def upgrade_database(bind=None):
+    """
+    升级已有的数据库：创建缺少的表，并为已有的表补充模型中新增的可空列和索引
+
+    参数:
+        bind: 数据库引擎，默认使用应用配置的引擎
+    """
+    print("正在升级数据库...")
+    upgrade_schema(bind)
+    print("数据库升级完成！")
+
 def insert_questions():
     """插入题目数据"""
     db = SessionLocal()
@@ -205,8 +218,32 @@ def insert_hint_rules():
     finally:
         db.close()
 
+def rebuild_statistics():
+    """根据答题记录重建知识点统计表"""
+    from services.analysis.tag_stats import rebuild_tag_stats
+
+    db = SessionLocal()
+    try:
+        print("正在重建知识点统计表...")
+        count = rebuild_tag_stats(db)
+        print(f"知识点统计表重建完成，共 {count} 行！")
+    except Exception as e:
+        db.rollback()
+        print(f"重建知识点统计表失败: {e}")
+        raise
+    finally:
+        db.close()
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="初始化数据库")
+    parser.add_argument("--rebuild-tag-stats", action="store_true", help="只重建知识点统计表")
+    args = parser.parse_args()
+
+    if args.rebuild_tag_stats:
+        rebuild_statistics()
+        return
+
     print("=" * 50)
     print("开始初始化数据库...")
     print("=" * 50)
@@ -215,12 +252,18 @@ def main():
         # 创建表
         init_database()
         
+        # 升级已有的表
+        upgrade_database()
+        
         # 插入题目
         insert_questions()
         
         # 插入规则
         insert_hint_rules()
         
+        # 重建统计表
+        rebuild_statistics()
+        
         print("=" * 50)
         print("数据库初始化完成！")
         print("=" * 50)
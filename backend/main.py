@@ -1,5 +1,7 @@
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 # 配置日志
@@ -15,8 +17,78 @@ from config.settings import Settings
 # 创建配置实例
 settings = Settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时预热共享资源，关闭时释放"""
+    from services.ai.model_client import model_client_registry
+    from models.base import dispose_async_engine
+    from services.answer.record_writer import answer_record_writer
+    from services.analysis.analytics_engine import analytics_engine
+    from services.conversation import conversation_history
+    from services.learning.learning_tracker import learning_tracker
+    from services.conversation import connection_manager
+    from services.hint.socratic_hint import rule_engine
+    from models.schema import upgrade_schema
+
+    from services.analysis.tag_stats import rebuild_tag_stats
+
+    # 升级数据库，创建缺少的表并补充新版本模型中的列和索引
+    created_tables = await asyncio.to_thread(upgrade_schema)
+    # 新建的知识点统计表根据已有的答题记录填充
+    if "tag_stats" in created_tables:
+        await asyncio.to_thread(rebuild_tag_stats)
+    # 预热模型客户端，建立可复用的连接池
+    model_client_registry.warm_up()
+    # 在线程池中加载数据库提示规则，首次匹配时不再查询数据库
+    await rule_engine.areload()
+    # 定期保存学习分析快照
+    snapshot_task = None
+    if settings.analysis_snapshot_interval > 0:
+        snapshot_task = asyncio.create_task(
+            analytics_engine.run_snapshots(settings.analysis_snapshot_interval)
+        )
+    # 定期将对话历史和学习数据的修改写入共享状态存储
+    flush_tasks = [
+        asyncio.create_task(store.run_flusher())
+        for store in (conversation_history.store, learning_tracker.store)
+        if store is not None
+    ]
+    # 订阅跨worker消息总线，定期清理心跳超时的WebSocket连接
+    await connection_manager.start()
+    reaper_task = None
+    if settings.websocket_reaper_interval > 0:
+        reaper_task = asyncio.create_task(
+            connection_manager.run_reaper(settings.websocket_reaper_interval, settings.websocket_heartbeat_timeout)
+        )
+    yield
+    if reaper_task is not None:
+        reaper_task.cancel()
+    await connection_manager.close()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+    for task in flush_tasks:
+        task.cancel()
+    # 关闭模型客户端连接池
+    await model_client_registry.aclose()
+    # 写入缓冲区中剩余的答题记录
+    await answer_record_writer.flush()
+    # 写入尚未保存的对话历史和学习数据
+    await asyncio.to_thread(conversation_history.flush)
+    await asyncio.to_thread(learning_tracker.flush)
+    # 保存尚未保存的学习分析快照
+    if snapshot_task is not None:
+        try:
+            await analytics_engine.save_snapshots()
+        except Exception as e:
+            logger.warning(f"保存学习分析快照失败: {str(e)}")
+    # 关闭异步数据库连接池
+    await dispose_async_engine()
+
+
 # 创建FastAPI应用
 app = FastAPI(
+    lifespan=lifespan,
     title="初中数学残局挑战系统",
     description="AI辅助的初中数学学习系统，提供实时的解题指导和苏格拉底式提示",
     version="1.0.0",
@@ -1,4 +1,4 @@
-from .base import Base, engine, get_db, SessionLocal
+from .base import Base, engine, get_db, SessionLocal, get_async_db, AsyncSessionLocal
 from .models import (
     Question,
     QuestionTag,
@@ -6,6 +6,7 @@ from .models import (
     HintRule,
     AnswerRecord,
     StudentAnalysis,
+    TagStat,
 )
 
 __all__ = [
@@ -13,10 +14,13 @@ __all__ = [
     "engine",
     "get_db",
     "SessionLocal",
+    "get_async_db",
+    "AsyncSessionLocal",
     "Question",
     "QuestionTag",
     "QuestionType",
     "HintRule",
     "AnswerRecord",
     "StudentAnalysis",
+    "TagStat",
 ]
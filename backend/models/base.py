@@ -1,14 +1,149 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import StaticPool
 from datetime import datetime
+from typing import Any, Dict, Tuple
 from config.settings import Settings
 
 # 获取配置
 settings = Settings()
 
+# SQLite允许的同步模式
+SQLITE_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def _is_memory_sqlite(database: str) -> bool:
+    """判断是否为SQLite内存数据库"""
+    return not database or database == ":memory:" or database.startswith("file::memory:")
+
+
+def _set_sqlite_pragmas(engine: Engine, settings: Settings, memory: bool) -> None:
+    """每个新连接建立时设置SQLite的并发相关参数"""
+    synchronous = settings.sqlite_synchronous.upper()
+    if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"不支持的SQLite同步模式: {settings.sqlite_synchronous}")
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if settings.sqlite_wal and not memory:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+        finally:
+            cursor.close()
+
+
+# 同步驱动到异步驱动的映射
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def _engine_options(url: URL, settings: Settings) -> Tuple[Dict[str, Any], bool]:
+    """
+    根据数据库类型生成引擎参数
+
+    Returns:
+        Tuple[Dict[str, Any], bool]: 引擎参数，以及是否为SQLite内存数据库
+    """
+    kwargs: Dict[str, Any] = {
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    pool_kwargs = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+
+    if url.get_backend_name() != "sqlite":
+        kwargs.update(pool_kwargs)
+        return kwargs, False
+
+    memory = _is_memory_sqlite(url.database or "")
+    # FastAPI在线程池中执行同步路由，连接需要允许跨线程使用
+    kwargs["connect_args"] = {
+        "check_same_thread": False,
+        "timeout": settings.sqlite_busy_timeout / 1000,
+    }
+    if memory:
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(pool_kwargs)
+    return kwargs, memory
+
+
+def create_engine_from_settings(settings: Settings) -> Engine:
+    """
+    根据配置创建数据库引擎
+
+    - SQLite：允许跨线程使用连接，设置WAL、synchronous和busy_timeout，
+      内存数据库使用单连接池
+    - 其他数据库：按配置设置连接池大小、溢出数、超时和回收时间
+
+    Args:
+        settings: 应用配置
+
+    Returns:
+        Engine: 数据库引擎
+    """
+    url = make_url(settings.database_url)
+    kwargs, memory = _engine_options(url, settings)
+    engine = create_engine(url, **kwargs)
+    if url.get_backend_name() == "sqlite":
+        _set_sqlite_pragmas(engine, settings, memory)
+    return engine
+
+
+def async_database_url(database_url: str) -> URL:
+    """
+    将同步数据库URL转换为异步驱动URL，例如sqlite -> sqlite+aiosqlite
+
+    Args:
+        database_url: 数据库URL
+
+    Returns:
+        URL: 异步驱动URL，已指定驱动时保持不变
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"不支持异步访问的数据库类型: {backend}")
+    if url.get_driver_name() in ASYNC_DRIVERS.values():
+        return url
+    return url.set(drivername=f"{backend}+{driver}")
+
+
+def create_async_engine_from_settings(settings: Settings):
+    """
+    根据配置创建异步数据库引擎，连接池和SQLite参数与同步引擎一致
+
+    Args:
+        settings: 应用配置
+
+    Returns:
+        AsyncEngine: 异步数据库引擎
+    """
+    # 异步驱动为可选依赖，使用时再导入
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_database_url(settings.database_url)
+    kwargs, memory = _engine_options(url, settings)
+    async_engine = create_async_engine(url, **kwargs)
+    if url.get_backend_name() == "sqlite":
+        _set_sqlite_pragmas(async_engine.sync_engine, settings, memory)
+    return async_engine
+
+
 # 创建数据库引擎
-engine = create_engine(settings.database_url)
+engine = create_engine_from_settings(settings)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -24,3 +159,43 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# 异步引擎和会话工厂，首次使用时创建
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    """获取全局异步数据库引擎，首次调用时创建"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_engine = create_async_engine_from_settings(settings)
+        _async_session_factory = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    """创建异步数据库会话"""
+    get_async_engine()
+    return _async_session_factory()
+
+
+# 依赖项：获取异步数据库会话
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    """关闭异步引擎的连接池"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
@@ -7,6 +7,8 @@ from sqlalchemy import (
     Text,
     Enum as SQLEnum,
     JSON,
+    Date,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -50,6 +52,11 @@ class QuestionTag(Base):
     # 关系
     question = relationship("Question", back_populates="tags")
 
+    __table_args__ = (
+        # 按标签筛选题目，主键以question_id开头无法使用
+        Index("ix_question_tags_tag_question_id", "tag", "question_id"),
+    )
+
 
 class HintRule(Base):
     """规则引擎表"""
@@ -68,18 +75,26 @@ class AnswerRecord(Base):
     __tablename__ = "answer_records"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False, index=True)
+    student_id = Column(String(50), nullable=True, comment="学生ID（可选）")
     student_input = Column(Text, nullable=True, comment="学生输入步骤")
     used_hint = Column(Text, nullable=True, comment="使用的提示")
     level = Column(String(20), nullable=True, comment="难度级别")
     tag = Column(String(50), nullable=True, comment="知识点标签")
     time_spent = Column(Integer, nullable=True, comment="答题耗时（秒）")
     hint_count = Column(Integer, default=0, comment="提示使用次数")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     # 关系
     question = relationship("Question", backref="answer_records")
 
+    __table_args__ = (
+        # 单个学生的分析：按学生筛选后按知识点和级别分组
+        Index("ix_answer_records_student_id_tag_level", "student_id", "tag", "level"),
+        # 按知识点统计最近的答题记录
+        Index("ix_answer_records_tag_created_at", "tag", "created_at"),
+    )
+
 
 class StudentAnalysis(Base):
     """学生分析数据表"""
@@ -92,3 +107,25 @@ class StudentAnalysis(Base):
     tag_scores = Column(JSON, nullable=True, comment="知识点评分")
     summary = Column(Text, nullable=True, comment="分析总结")
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # 查询学生最近的分析快照
+        Index("ix_student_analyses_student_id_created_at", "student_id", "created_at"),
+    )
+
+
+class TagStat(Base):
+    """知识点统计汇总表，按知识点、难度级别、题型和日期汇总答题记录"""
+
+    __tablename__ = "tag_stats"
+
+    tag = Column(String(50), primary_key=True, comment="知识点标签，未标注时为空字符串")
+    level = Column(String(20), primary_key=True, comment="难度级别，未标注时为空字符串")
+    question_type = Column(String(20), primary_key=True, comment="题型")
+    day = Column(Date, primary_key=True, index=True, comment="答题日期")
+    record_count = Column(Integer, nullable=False, default=0, comment="答题记录数")
+    hint_total = Column(Integer, nullable=False, default=0, comment="提示使用总次数")
+    no_hint_count = Column(Integer, nullable=False, default=0, comment="未使用提示的记录数")
+    time_total = Column(Integer, nullable=False, default=0, comment="答题总耗时（秒）")
+    timed_count = Column(Integer, nullable=False, default=0, comment="有耗时数据的记录数")
+    target_total = Column(Integer, nullable=False, default=0, comment="有耗时数据记录的目标耗时之和（秒）")
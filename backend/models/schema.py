@@ -0,0 +1,53 @@
+import logging
+from typing import List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from .base import Base, engine
+# 导入全部模型，确保元数据完整
+from . import models  # noqa: F401
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema(bind: Optional[Engine] = None) -> List[str]:
+    """
+    升级数据库：创建缺少的表，并为已有的表补充模型中新增的可空列和索引，可重复执行
+
+    应用启动时自动执行，已有的数据库（包括仓库中的app.db）不需要手动迁移
+
+    Args:
+        bind: 数据库引擎，默认使用应用配置的引擎
+
+    Returns:
+        List[str]: 本次新创建的表名
+    """
+    bind = bind or engine
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                logger.info(f"为表 {table.name} 添加列 {column.name}")
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name in existing_indexes:
+                    continue
+                logger.info(f"为表 {table.name} 创建索引 {index.name}")
+                index.create(conn)
+
+    created = [table.name for table in Base.metadata.sorted_tables if table.name not in existing_tables]
+    if created:
+        logger.info(f"创建数据库表: {', '.join(created)}")
+        Base.metadata.create_all(bind=bind)
+    return created
@@ -1,4 +1,4 @@
 # AI服务模块
-from .ai_service import get_ai_hint, analyze_solution
+from .ai_service import get_ai_hint, stream_ai_hint, analyze_solution
 
-__all__ = ["get_ai_hint", "analyze_solution"]
+__all__ = ["get_ai_hint", "stream_ai_hint", "analyze_solution"]
@@ -1,83 +1,256 @@
-import os
+import hashlib
 import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from config import settings
-from .model_client import ModelClient, ModelType
+from utils.retry import async_retry, RetryBudget
+from utils.string_utils import normalize_math_text
+from services.prompt.context_builder import HintContextBuilder, estimate_tokens
+from .model_client import model_client_registry
+from .hint_cache import hint_cache
+from .single_flight import SingleFlight
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 进程级重试预算，上游故障时限制重试总量
+retry_budget = RetryBudget(
+    max_tokens=settings.ai_retry_budget,
+    refill_rate=settings.ai_retry_budget_refill
+)
 
-async def get_ai_hint(step_content: str, max_retries: int = 3) -> str:
+# 进程级请求合并器，相同的并发请求共享一次上游调用
+ai_single_flight = SingleFlight()
+
+
+# 苏格拉底式提示的系统提示
+HINT_SYSTEM_PROMPT = """
+    你是一位初中数学老师，使用苏格拉底式提问引导学生思考。
+    针对学生的解题步骤，提出一个引导性问题，不要直接给出答案。
+    问题应该帮助学生发现可能的错误或优化解题方法。
+    保持问题简洁明了，符合初中学生的理解水平。
+    """
+
+
+# 提示上下文构建器，限制每次请求的提示token数
+hint_context_builder = HintContextBuilder(
+    max_prompt_tokens=settings.hint_max_prompt_tokens,
+    max_question_tokens=settings.hint_question_max_tokens,
+    max_turns=settings.hint_context_turns,
+    summary_tokens=settings.hint_summary_tokens
+)
+
+
+def _build_hint_prompt(
+    step_content: str,
+    history: Optional[List[Dict[str, Any]]] = None,
+    question: Optional[str] = None
+) -> str:
+    """构建提示请求的用户提示，包含题目和最近的对话，总长度不超过提示token上限"""
+    return hint_context_builder.build(
+        step_content, history, question, reserved_tokens=estimate_tokens(HINT_SYSTEM_PROMPT)
+    )
+
+
+# 提示词版本，提示词或上下文格式变更后旧的缓存自动失效
+HINT_PROMPT_VERSION = hashlib.sha1(
+    (HINT_SYSTEM_PROMPT + _build_hint_prompt("x", [{"role": "ai", "content": "y"}], "z")).encode("utf-8")
+).hexdigest()[:8]
+
+
+def _hint_cache_key(step_content: str, question_id: Optional[int], prompt: Optional[str] = None) -> str:
+    """
+    生成提示缓存键
+
+    没有对话历史时按步骤和题目缓存；有对话历史时提示随上下文变化，以完整提示作为键
+    """
+    return hint_cache.make_key(
+        prompt if prompt is not None else step_content,
+        question_id=question_id,
+        prompt_version=HINT_PROMPT_VERSION,
+        model_type=settings.ai_model_type.lower()
+    )
+
+
+async def _load_question_content(question_id: Optional[int]) -> Optional[str]:
+    """从题库缓存获取题目内容，加载失败时返回None，不影响提示生成"""
+    if question_id is None:
+        return None
+    try:
+        from models.base import AsyncSessionLocal
+        from services.question.question_cache import question_cache
+
+        async with AsyncSessionLocal() as db:
+            snapshot = await question_cache.aget_snapshot(db)
+        question = snapshot.questions.get(question_id)
+        return question["content"] if question else None
+    except Exception as e:
+        logger.warning(f"加载题目内容失败: {str(e)}")
+        return None
+
+
+async def _prepare_hint_request(
+    step_content: str,
+    question_id: Optional[int],
+    history: Optional[List[Dict[str, Any]]]
+) -> Tuple[str, str]:
+    """构建提示请求的用户提示和缓存键"""
+    question = await _load_question_content(question_id)
+    prompt = _build_hint_prompt(step_content, history, question)
+    return prompt, _hint_cache_key(step_content, question_id, prompt if history else None)
+
+
+def _with_retry(max_retries: int):
+    """构建AI调用的异步重试装饰器"""
+    return async_retry(
+        max_attempts=max_retries,
+        base_delay=settings.ai_retry_base_delay,
+        max_delay=settings.ai_retry_max_delay,
+        budget=retry_budget
+    )
+
+
+def _flight_key(prompt: str, system_prompt: str, max_tokens: int) -> tuple:
+    """生成请求合并键：归一化提示、系统提示、模型类型和生成参数"""
+    return (
+        normalize_math_text(prompt),
+        system_prompt,
+        settings.ai_model_type.lower(),
+        settings.ai_temperature,
+        max_tokens
+    )
+
+
+async def _call_model_shared(
+    prompt: str,
+    system_prompt: str,
+    max_tokens: int,
+    max_retries: int
+) -> str:
+    """
+    带重试的大模型调用，相同的并发请求合并为一次上游调用
+
+    参数:
+        prompt: 用户提示
+        system_prompt: 系统提示
+        max_tokens: 最大生成token数
+        max_retries: 最大重试次数
+
+    返回:
+        str: 模型生成的文本
+    """
+    return await ai_single_flight.do(
+        _flight_key(prompt, system_prompt, max_tokens),
+        lambda: _with_retry(max_retries)(_call_model)(prompt, system_prompt, max_tokens)
+    )
+
+
+async def _call_model(prompt: str, system_prompt: str, max_tokens: int) -> str:
     """
-    调用AI服务获取苏格拉底式提示，支持重试机制
-    
+    按配置的模型类型调用大模型
+
+    参数:
+        prompt: 用户提示
+        system_prompt: 系统提示
+        max_tokens: 最大生成token数
+
+    返回:
+        str: 模型生成的文本
+    """
+    # 从注册表获取复用的模型客户端
+    client = model_client_registry.get_default()
+
+    return await client.agenerate(
+        prompt=prompt,
+        system_prompt=system_prompt,
+        temperature=settings.ai_temperature,
+        max_tokens=max_tokens
+    )
+
+
+async def get_ai_hint(
+    step_content: str,
+    max_retries: int = 3,
+    question_id: Optional[int] = None,
+    history: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    """
+    调用AI服务获取苏格拉底式提示，支持重试机制和响应缓存
+
     参数:
         step_content: 用户的解题步骤内容
         max_retries: 最大重试次数
-        
+        question_id: 题目ID（可选），题目内容加入提示，并作为缓存键的一部分
+        history: 之前的对话（可选），按token预算截断后加入提示
+
     返回:
         str: AI生成的提示问题
     """
-    import time
-    
-    # 构建系统提示
-    system_prompt = """
-    你是一位初中数学老师，使用苏格拉底式提问引导学生思考。
-    针对学生的解题步骤，提出一个引导性问题，不要直接给出答案。
-    问题应该帮助学生发现可能的错误或优化解题方法。
-    保持问题简洁明了，符合初中学生的理解水平。
+    prompt, cache_key = await _prepare_hint_request(step_content, question_id, history)
+    cached = await hint_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        hint = await _call_model_shared(prompt, HINT_SYSTEM_PROMPT, settings.ai_max_tokens, max_retries)
+    except Exception as e:
+        logger.error(f"AI服务错误: {str(e)}")
+        raise Exception(f"获取AI提示失败: {str(e)}")
+
+    await hint_cache.aset(cache_key, hint)
+    return hint
+
+
+async def stream_ai_hint(
+    step_content: str,
+    question_id: Optional[int] = None,
+    history: Optional[List[Dict[str, Any]]] = None
+) -> AsyncIterator[str]:
     """
-    
-    # 构建用户提示
-    user_prompt = f"学生的解题步骤：{step_content}\n请提出一个引导性问题。"
-    
-    for attempt in range(max_retries):
-        try:
-            # 根据环境变量选择模型类型
-            model_type = ModelType(settings.ai_model_type.lower())
-            
-            # 创建模型客户端
-            client = ModelClient(
-                model_type,
-                api_key=os.getenv(f"{model_type.value.upper()}_API_KEY"),
-                secret_key=os.getenv(f"{model_type.value.upper()}_SECRET_KEY"),
-                access_token=os.getenv(f"{model_type.value.upper()}_ACCESS_TOKEN")
-            )
-            
-            # 调用模型生成提示
-            hint = client.generate(
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                temperature=settings.ai_temperature,
-                max_tokens=settings.ai_max_tokens
-            )
-            
-            return hint
-        
-        except Exception as e:
-            logger.error(f"AI服务错误 (尝试 {attempt+1}/{max_retries}): {str(e)}")
-            if attempt < max_retries - 1:
-                # 指数退避重试
-                retry_delay = 2 ** attempt
-                logger.info(f"等待 {retry_delay} 秒后重试...")
-                time.sleep(retry_delay)
-            else:
-                raise Exception(f"获取AI提示失败: {str(e)}")
+    流式获取苏格拉底式提示，逐段返回模型生成的文本；缓存命中时一次性返回
+
+    参数:
+        step_content: 用户的解题步骤内容
+        question_id: 题目ID（可选），题目内容加入提示，并作为缓存键的一部分
+        history: 之前的对话（可选），按token预算截断后加入提示
+
+    返回:
+        AsyncIterator[str]: 提示文本的增量片段
+    """
+    prompt, cache_key = await _prepare_hint_request(step_content, question_id, history)
+    cached = await hint_cache.aget(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    try:
+        client = model_client_registry.get_default()
+        async for delta in client.astream(
+            prompt=prompt,
+            system_prompt=HINT_SYSTEM_PROMPT,
+            temperature=settings.ai_temperature,
+            max_tokens=settings.ai_max_tokens
+        ):
+            chunks.append(delta)
+            yield delta
+    except Exception as e:
+        logger.error(f"AI流式服务错误: {str(e)}")
+        raise Exception(f"获取AI提示失败: {str(e)}")
+
+    await hint_cache.aset(cache_key, "".join(chunks))
 
 
 async def analyze_solution(solution_steps: list, max_retries: int = 3) -> dict:
     """
     分析完整的解题过程，提供综合评价和建议，支持重试机制
-    
+
     参数:
         solution_steps: 解题步骤列表
         max_retries: 最大重试次数
-        
+
     返回:
         dict: 包含评价和建议的分析结果
     """
-    import time
-    
     # 构建系统提示
     system_prompt = """
     你是一位初中数学老师，负责分析学生的解题过程。
@@ -86,46 +259,21 @@ async def analyze_solution(solution_steps: list, max_retries: int = 3) -> dict:
     2. 是否有错误或可以改进的地方
     3. 提供针对性的建议
     4. 评价解题过程的优缺点
-    
+
     保持评价客观、友好，使用学生容易理解的语言。
     """
-    
+
     # 构建用户提示
     solution_text = "\n".join([f"步骤 {i+1}: {step}" for i, step in enumerate(solution_steps)])
     user_prompt = f"学生的解题过程：\n{solution_text}\n请进行分析和评价。"
-    
-    for attempt in range(max_retries):
-        try:
-            # 根据环境变量选择模型类型
-            model_type = ModelType(settings.ai_model_type.lower())
-            
-            # 创建模型客户端
-            client = ModelClient(
-                model_type,
-                api_key=os.getenv(f"{model_type.value.upper()}_API_KEY"),
-                secret_key=os.getenv(f"{model_type.value.upper()}_SECRET_KEY"),
-                access_token=os.getenv(f"{model_type.value.upper()}_ACCESS_TOKEN")
-            )
-            
-            # 调用模型生成分析结果
-            analysis = client.generate(
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                temperature=settings.ai_temperature,
-                max_tokens=200
-            )
-            
-            return {
-                "analysis": analysis,
-                "solution_steps": solution_steps
-            }
-        
-        except Exception as e:
-            logger.error(f"AI分析服务错误 (尝试 {attempt+1}/{max_retries}): {str(e)}")
-            if attempt < max_retries - 1:
-                # 指数退避重试
-                retry_delay = 2 ** attempt
-                logger.info(f"等待 {retry_delay} 秒后重试...")
-                time.sleep(retry_delay)
-            else:
-                raise Exception(f"分析解题过程失败: {str(e)}")
+
+    try:
+        analysis = await _call_model_shared(user_prompt, system_prompt, 200, max_retries)
+    except Exception as e:
+        logger.error(f"AI分析服务错误: {str(e)}")
+        raise Exception(f"分析解题过程失败: {str(e)}")
+
+    return {
+        "analysis": analysis,
+        "solution_steps": solution_steps
+    }
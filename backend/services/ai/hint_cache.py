@@ -0,0 +1,411 @@
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from utils.string_utils import normalize_math_text
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+# 缓存后端接口
+class HintCacheBackend(ABC):
+    # 读写是否为阻塞I/O，为True时异步调用方在线程池中执行，避免阻塞事件循环
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[str]: 缓存值，不存在或已过期时返回None
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 过期时间（秒）
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """清空缓存"""
+        pass
+
+    @abstractmethod
+    def size(self) -> int:
+        """
+        获取缓存条目数
+
+        Returns:
+            int: 条目数
+        """
+        pass
+
+    def pop_evictions(self) -> int:
+        """
+        获取并清零自上次调用以来的淘汰条目数
+
+        Returns:
+            int: 淘汰条目数
+        """
+        return 0
+
+
+# 进程内缓存后端
+class MemoryHintCacheBackend(HintCacheBackend):
+    def __init__(self, max_entries: int = 10000):
+        """
+        初始化进程内TTL + LRU缓存
+
+        Args:
+            max_entries: 最大条目数，超过后淘汰最久未使用的条目
+        """
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def size(self) -> int:
+        return len(self._data)
+
+    def pop_evictions(self) -> int:
+        with self._lock:
+            evictions, self._evictions = self._evictions, 0
+            return evictions
+
+
+# SQLite缓存后端
+class SQLiteHintCacheBackend(HintCacheBackend):
+    blocking = True
+
+    def __init__(self, path: str = "./hint_cache.db", max_entries: int = 10000):
+        """
+        初始化SQLite缓存，重启后缓存仍然有效，多个worker可共享同一文件
+
+        Args:
+            path: 数据库文件路径
+            max_entries: 最大条目数，超过后淘汰最久未使用的条目
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hint_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_hint_cache_accessed_at ON hint_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM hint_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM hint_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE hint_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hint_cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM hint_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM hint_cache WHERE key IN "
+                    "(SELECT key FROM hint_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self._evictions += overflow
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM hint_cache")
+            self._conn.commit()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM hint_cache").fetchone()[0]
+
+    def pop_evictions(self) -> int:
+        with self._lock:
+            evictions, self._evictions = self._evictions, 0
+            return evictions
+
+
+# Redis协议缓存后端
+class RedisHintCacheBackend(HintCacheBackend):
+    blocking = True
+
+    def __init__(self, client: Any = None, url: Optional[str] = None, prefix: str = "hint:"):
+        """
+        初始化Redis缓存，LRU淘汰由服务端的maxmemory-policy负责
+
+        Args:
+            client: 兼容Redis协议的客户端（需支持get/set/delete/scan_iter）
+            url: Redis连接地址，未提供client时使用
+            prefix: 缓存键前缀
+        """
+        if client is None:
+            import redis
+
+            if not url:
+                raise ValueError("Redis连接地址未提供")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def clear(self) -> None:
+        for key in list(self.client.scan_iter(match=self.prefix + "*")):
+            self.client.delete(key)
+
+    def size(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+class HintCache:
+    """
+    AI提示响应缓存
+
+    以归一化后的解题步骤、题目ID、提示词版本和模型类型作为缓存键，
+    相同班级中提交的近似步骤可以复用已生成的提示，避免重复调用大模型
+    """
+
+    def __init__(self, backend: HintCacheBackend, ttl: float = 3600, enabled: bool = True):
+        """
+        初始化提示缓存
+
+        Args:
+            backend: 缓存后端
+            ttl: 缓存过期时间（秒）
+            enabled: 是否启用缓存
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(
+        step_content: str,
+        question_id: Optional[int] = None,
+        prompt_version: str = "",
+        model_type: str = ""
+    ) -> str:
+        """
+        生成缓存键
+
+        Args:
+            step_content: 解题步骤内容
+            question_id: 题目ID
+            prompt_version: 提示词版本
+            model_type: 模型类型
+
+        Returns:
+            str: 缓存键
+        """
+        raw = f"{prompt_version}|{model_type}|{question_id or ''}|{normalize_math_text(step_content)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存并记录命中情况，后端异常时视为未命中
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[str]: 缓存的提示，未命中返回None
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"读取提示缓存失败: {str(e)}")
+            return None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """
+        写入缓存，后端异常时仅记录日志
+
+        Args:
+            key: 缓存键
+            value: 提示内容
+        """
+        if not self.enabled or not value:
+            return
+
+        try:
+            self.backend.set(key, value, self.ttl)
+            self.stores += 1
+            self.evictions += self.backend.pop_evictions()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"写入提示缓存失败: {str(e)}")
+
+    async def aget(self, key: str) -> Optional[str]:
+        """
+        异步读取缓存，阻塞I/O的后端在线程池中执行
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[str]: 缓存的提示，未命中返回None
+        """
+        if self.enabled and self.backend.blocking:
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """
+        异步写入缓存，阻塞I/O的后端在线程池中执行
+
+        Args:
+            key: 缓存键
+            value: 提示内容
+        """
+        if self.enabled and value and self.backend.blocking:
+            await asyncio.to_thread(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def clear(self) -> None:
+        """清空缓存和统计数据"""
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计指标
+
+        Returns:
+            Dict[str, Any]: 命中次数、命中率、节省的模型调用次数等
+        """
+        lookups = self.hits + self.misses
+        try:
+            entries = self.backend.size()
+        except Exception:
+            entries = -1
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_calls": self.hits,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+def create_hint_cache() -> HintCache:
+    """按应用配置创建提示缓存"""
+    from config import settings
+
+    backend_name = settings.hint_cache_backend.lower()
+    if backend_name == "sqlite":
+        backend = SQLiteHintCacheBackend(
+            path=settings.hint_cache_sqlite_path,
+            max_entries=settings.hint_cache_max_entries
+        )
+    elif backend_name == "redis":
+        backend = RedisHintCacheBackend(url=settings.hint_cache_redis_url)
+    elif backend_name == "memory":
+        backend = MemoryHintCacheBackend(max_entries=settings.hint_cache_max_entries)
+    else:
+        raise ValueError(f"不支持的缓存后端: {settings.hint_cache_backend}")
+
+    return HintCache(backend, ttl=settings.hint_cache_ttl, enabled=settings.hint_cache_enabled)
+
+
+# 全局提示缓存实例
+hint_cache = create_hint_cache()
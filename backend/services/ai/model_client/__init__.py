@@ -1,10 +1,13 @@
 # 大模型客户端模块
 from .types import ModelRequest, ModelResponse, ModelType
 from .client import ModelClient
+from .registry import ModelClientRegistry, model_client_registry
 from .strategies import ModelStrategy, OpenAIStrategy, DoubaoStrategy, ErnieStrategy, QwenStrategy, HunyuanStrategy, ClaudeStrategy, GeminiStrategy
 
 __all__ = [
     "ModelClient",
+    "ModelClientRegistry",
+    "model_client_registry",
     "ModelRequest",
     "ModelResponse",
     "ModelType",
@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 from .types import ModelRequest, ModelResponse, ModelType
 from .strategies import (
     ModelStrategy,
@@ -55,7 +55,8 @@ class ModelClient:
         elif self.model_type == ModelType.DOUBAO:
             return DoubaoStrategy(
                 api_key=kwargs.get("api_key", self.api_key),
-                secret_key=kwargs.get("secret_key")
+                secret_key=kwargs.get("secret_key"),
+                async_client=kwargs.get("async_client")
             )
         else:
             raise ValueError(f"不支持的模型类型: {self.model_type}")
@@ -101,6 +102,61 @@ class ModelClient:
         messages: Optional[List[Dict[str, str]]] = None
     ) -> str:
         """
-        异步生成文本（预留接口，部分模型支持异步调用）
+        异步生成文本，不阻塞事件循环
+        
+        Args:
+            prompt: 用户提示词
+            temperature: 温度参数
+            max_tokens: 最大生成token数
+            system_prompt: 系统提示词
+            messages: 对话历史
+            
+        Returns:
+            生成的文本
+        """
+        request = ModelRequest(
+            prompt=prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_prompt=system_prompt,
+            messages=messages
+        )
+        
+        response = await self.strategy.acall(request)
+        return response.text
+    
+    async def astream(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        system_prompt: str = "",
+        messages: Optional[List[Dict[str, str]]] = None
+    ) -> AsyncIterator[str]:
+        """
+        流式生成文本，逐段返回增量内容
+        
+        Args:
+            prompt: 用户提示词
+            temperature: 温度参数
+            max_tokens: 最大生成token数
+            system_prompt: 系统提示词
+            messages: 对话历史
+            
+        Yields:
+            增量文本片段
         """
-        return self.generate(prompt, temperature, max_tokens, system_prompt, messages)
+        request = ModelRequest(
+            prompt=prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_prompt=system_prompt,
+            messages=messages
+        )
+        
+        async for delta in self.strategy.astream(request):
+            yield delta
+    
+    async def aclose(self) -> None:
+        """释放底层策略持有的连接资源"""
+        await self.strategy.aclose()
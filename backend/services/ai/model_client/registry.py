@@ -0,0 +1,148 @@
+import os
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+from .types import ModelType
+from .client import ModelClient
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+# 模型客户端注册表
+class ModelClientRegistry:
+    """
+    进程级模型客户端注册表
+
+    按模型类型和凭据缓存ModelClient实例，复用SDK客户端和HTTP连接池，
+    避免每次调用都重新初始化SDK、读取环境变量和建立TLS连接
+    """
+
+    def __init__(
+        self,
+        http_max_connections: int = 100,
+        http_max_keepalive: int = 20,
+        http_timeout: float = 60.0
+    ):
+        """
+        初始化注册表
+
+        Args:
+            http_max_connections: 共享HTTP连接池的最大连接数
+            http_max_keepalive: 共享HTTP连接池保持的空闲长连接数
+            http_timeout: HTTP请求超时时间（秒）
+        """
+        self.http_max_connections = http_max_connections
+        self.http_max_keepalive = http_max_keepalive
+        self.http_timeout = http_timeout
+        self._clients: Dict[Tuple, ModelClient] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def credentials_from_env(model_type: ModelType) -> Dict[str, Optional[str]]:
+        """
+        从环境变量读取模型凭据
+
+        Args:
+            model_type: 模型类型
+
+        Returns:
+            Dict[str, Optional[str]]: 凭据参数
+        """
+        prefix = model_type.value.upper()
+        return {
+            "api_key": os.getenv(f"{prefix}_API_KEY"),
+            "secret_key": os.getenv(f"{prefix}_SECRET_KEY"),
+            "access_token": os.getenv(f"{prefix}_ACCESS_TOKEN")
+        }
+
+    def _build_client(self, model_type: ModelType, credentials: Dict[str, Optional[str]]) -> ModelClient:
+        """创建模型客户端，HTTP类策略使用带连接池的共享客户端"""
+        kwargs = dict(credentials)
+        if model_type == ModelType.DOUBAO:
+            import httpx
+
+            kwargs["async_client"] = httpx.AsyncClient(
+                timeout=self.http_timeout,
+                limits=httpx.Limits(
+                    max_connections=self.http_max_connections,
+                    max_keepalive_connections=self.http_max_keepalive
+                )
+            )
+        return ModelClient(model_type, **kwargs)
+
+    def get(self, model_type: ModelType, **credentials: Optional[str]) -> ModelClient:
+        """
+        获取模型客户端，不存在时创建并缓存
+
+        Args:
+            model_type: 模型类型
+            **credentials: 凭据参数（api_key、secret_key、access_token等），
+                未提供时从环境变量读取
+
+        Returns:
+            ModelClient: 模型客户端
+        """
+        if not credentials:
+            credentials = self.credentials_from_env(model_type)
+
+        key = (model_type, tuple(sorted(credentials.items())))
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._build_client(model_type, credentials)
+                self._clients[key] = client
+                logger.info(f"已创建模型客户端: {model_type.value}")
+        return client
+
+    def get_default(self) -> ModelClient:
+        """
+        获取配置中指定模型类型的客户端
+
+        Returns:
+            ModelClient: 模型客户端
+        """
+        from config import settings
+
+        return self.get(ModelType(settings.ai_model_type.lower()))
+
+    def warm_up(self) -> None:
+        """预先创建默认模型客户端，配置缺失时仅记录警告"""
+        try:
+            self.get_default()
+        except Exception as e:
+            logger.warning(f"预热模型客户端失败: {str(e)}")
+
+    async def aclose(self) -> None:
+        """关闭所有客户端并清空注册表"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"关闭模型客户端失败: {str(e)}")
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+def _create_registry() -> ModelClientRegistry:
+    """按应用配置创建注册表"""
+    from config import settings
+
+    return ModelClientRegistry(
+        http_max_connections=settings.ai_http_max_connections,
+        http_max_keepalive=settings.ai_http_max_keepalive,
+        http_timeout=settings.ai_http_timeout
+    )
+
+
+# 全局模型客户端注册表
+model_client_registry = _create_registry()
@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
+import asyncio
 import os
-from typing import Optional
+from typing import AsyncIterator, Optional, TYPE_CHECKING
 from .types import ModelRequest, ModelResponse, ModelType
 
+if TYPE_CHECKING:
+    import httpx
+
 
 # 模型策略接口
 class ModelStrategy(ABC):
@@ -18,6 +22,41 @@ class ModelStrategy(ABC):
             响应结果
         """
         pass
+    
+    async def acall(self, request: ModelRequest) -> ModelResponse:
+        """
+        异步调用模型生成文本
+        
+        默认在线程池中执行同步的call，避免阻塞事件循环；
+        提供原生异步SDK或HTTP客户端的策略应覆盖此方法。
+        
+        Args:
+            request: 请求参数
+            
+        Returns:
+            响应结果
+        """
+        return await asyncio.to_thread(self.call, request)
+    
+    async def astream(self, request: ModelRequest) -> AsyncIterator[str]:
+        """
+        流式调用模型，逐段返回生成的文本
+        
+        默认一次性返回acall的完整结果；支持流式接口的策略应覆盖此方法。
+        
+        Args:
+            request: 请求参数
+            
+        Yields:
+            str: 增量文本片段
+        """
+        response = await self.acall(request)
+        if response.text:
+            yield response.text
+    
+    async def aclose(self) -> None:
+        """释放策略持有的连接资源，默认无需处理"""
+        pass
 
 
 # OpenAI策略实现
@@ -30,7 +69,7 @@ class OpenAIStrategy(ModelStrategy):
             api_key: OpenAI API密钥
             base_url: 自定义API地址
         """
-        from openai import OpenAI
+        from openai import OpenAI, AsyncOpenAI
         
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
@@ -42,6 +81,10 @@ class OpenAIStrategy(ModelStrategy):
             api_key=self.api_key,
             base_url=self.base_url
         )
+        self.async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url
+        )
     
     def call(self, request: ModelRequest) -> ModelResponse:
         """调用OpenAI API"""
@@ -54,6 +97,32 @@ class OpenAIStrategy(ModelStrategy):
         
         text = response.choices[0].message.content
         return ModelResponse(text, ModelType.OPENAI)
+    
+    async def acall(self, request: ModelRequest) -> ModelResponse:
+        """异步调用OpenAI API"""
+        response = await self.async_client.chat.completions.create(
+            model="gpt-4o",  # 可配置
+            messages=request.messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens
+        )
+        
+        text = response.choices[0].message.content
+        return ModelResponse(text, ModelType.OPENAI)
+    
+    async def astream(self, request: ModelRequest) -> AsyncIterator[str]:
+        """流式调用OpenAI API"""
+        stream = await self.async_client.chat.completions.create(
+            model="gpt-4o",  # 可配置
+            messages=request.messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            stream=True
+        )
+        
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
 
 # Claude策略实现
@@ -65,7 +134,7 @@ class ClaudeStrategy(ModelStrategy):
         Args:
             api_key: Claude API密钥
         """
-        from anthropic import Anthropic
+        from anthropic import Anthropic, AsyncAnthropic
         
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         
@@ -73,6 +142,7 @@ class ClaudeStrategy(ModelStrategy):
             raise ValueError("Claude API密钥未提供")
         
         self.client = Anthropic(api_key=self.api_key)
+        self.async_client = AsyncAnthropic(api_key=self.api_key)
     
     def call(self, request: ModelRequest) -> ModelResponse:
         """调用Claude API"""
@@ -85,6 +155,29 @@ class ClaudeStrategy(ModelStrategy):
         
         text = response.content[0].text
         return ModelResponse(text, ModelType.CLAUDE)
+    
+    async def acall(self, request: ModelRequest) -> ModelResponse:
+        """异步调用Claude API"""
+        response = await self.async_client.messages.create(
+            model="claude-3-sonnet-20240229",  # 可配置
+            messages=request.messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens
+        )
+        
+        text = response.content[0].text
+        return ModelResponse(text, ModelType.CLAUDE)
+    
+    async def astream(self, request: ModelRequest) -> AsyncIterator[str]:
+        """流式调用Claude API"""
+        async with self.async_client.messages.stream(
+            model="claude-3-sonnet-20240229",  # 可配置
+            messages=request.messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
 
 
 # Gemini策略实现
@@ -123,6 +216,21 @@ class GeminiStrategy(ModelStrategy):
         
         text = response.text
         return ModelResponse(text, ModelType.GEMINI)
+    
+    async def acall(self, request: ModelRequest) -> ModelResponse:
+        """异步调用Gemini API"""
+        contents = [msg["content"] for msg in request.messages]
+        
+        response = await self.model.generate_content_async(
+            contents,
+            generation_config={
+                "temperature": request.temperature,
+                "max_output_tokens": request.max_tokens
+            }
+        )
+        
+        text = response.text
+        return ModelResponse(text, ModelType.GEMINI)
 
 
 # 文心一言策略实现
@@ -155,6 +263,20 @@ class ErnieStrategy(ModelStrategy):
         
         text = response.result
         return ModelResponse(text, ModelType.ERNIE)
+    
+    async def acall(self, request: ModelRequest) -> ModelResponse:
+        """异步调用文心一言API"""
+        import erniebot
+        
+        response = await erniebot.ChatCompletion.acreate(
+            model="ernie-4.0",  # 可配置
+            messages=request.messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens
+        )
+        
+        text = response.result
+        return ModelResponse(text, ModelType.ERNIE)
 
 
 # 通义千问策略实现
@@ -186,6 +308,23 @@ class QwenStrategy(ModelStrategy):
         
         text = response.output.text
         return ModelResponse(text, ModelType.QWEN)
+    
+    async def astream(self, request: ModelRequest) -> AsyncIterator[str]:
+        """流式调用通义千问API"""
+        from dashscope import AioGeneration
+        
+        responses = await AioGeneration.call(
+            model="qwen-max",  # 可配置
+            messages=request.messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            stream=True,
+            incremental_output=True
+        )
+        
+        async for response in responses:
+            if response.output and response.output.text:
+                yield response.output.text
 
 
 # 混元大模型策略实现
@@ -232,13 +371,19 @@ class HunyuanStrategy(ModelStrategy):
 
 # 豆包策略实现
 class DoubaoStrategy(ModelStrategy):
-    def __init__(self, api_key: Optional[str] = None, secret_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        async_client: Optional["httpx.AsyncClient"] = None
+    ):
         """
         初始化豆包策略
         
         Args:
             api_key: 豆包API密钥
             secret_key: 豆包SecretKey（预留，当前版本未使用）
+            async_client: 异步HTTP客户端，为None时按需创建
         """
         self.api_key = api_key or os.getenv("DOUBAO_API_KEY")
         
@@ -248,6 +393,83 @@ class DoubaoStrategy(ModelStrategy):
         # API端点配置
         self.api_url = "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
         self.default_model = "doubao-seed-1-6-251015"
+        self.timeout = 60.0
+        self.async_client = async_client
+        self.session = None
+    
+    def _build_headers(self) -> dict:
+        """构建请求头"""
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+    
+    def _build_payload(self, request: ModelRequest) -> dict:
+        """构建请求体"""
+        # 转换消息格式为豆包API需要的格式
+        converted_messages = []
+        for msg in request.messages:
+            # 豆包API要求content是数组，包含text和type字段
+            content = []
+            if isinstance(msg["content"], str):
+                # 如果是字符串，转换为豆包API需要的格式
+                content.append({
+                    "text": msg["content"],
+                    "type": "text"
+                })
+            else:
+                # 如果已经是正确的格式，直接使用
+                content = msg["content"]
+            
+            converted_messages.append({
+                "role": msg["role"],
+                "content": content
+            })
+        
+        return {
+            "model": self.default_model,
+            "messages": converted_messages,
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens
+        }
+    
+    @staticmethod
+    def _parse_stream_line(line: str) -> Optional[str]:
+        """
+        解析SSE数据行，返回增量文本
+        
+        Args:
+            line: SSE响应中的一行
+            
+        Returns:
+            Optional[str]: 增量文本，非数据行或无内容时返回None
+        """
+        import json
+        
+        if not line.startswith("data:"):
+            return None
+        data = line[len("data:"):].strip()
+        if not data or data == "[DONE]":
+            return None
+        
+        chunk = json.loads(data)
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        return choices[0].get("delta", {}).get("content") or None
+    
+    def _parse_response(self, status_code: int, body: str) -> ModelResponse:
+        """解析响应"""
+        import json
+        
+        if status_code != 200:
+            raise RuntimeError(f"豆包API调用失败: 状态码 {status_code}, 错误信息: {body}")
+        
+        result = json.loads(body)
+        if result.get("choices") and len(result["choices"]) > 0:
+            text = result["choices"][0]["message"]["content"]
+            return ModelResponse(text, ModelType.DOUBAO)
+        raise RuntimeError(f"豆包API响应格式错误: {json.dumps(result)}")
     
     def call(self, request: ModelRequest) -> ModelResponse:
         """调用豆包API"""
@@ -255,56 +477,70 @@ class DoubaoStrategy(ModelStrategy):
         import json
         
         try:
-            # 构建请求头
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            # 转换消息格式为豆包API需要的格式
-            converted_messages = []
-            for msg in request.messages:
-                # 豆包API要求content是数组，包含text和type字段
-                content = []
-                if isinstance(msg["content"], str):
-                    # 如果是字符串，转换为豆包API需要的格式
-                    content.append({
-                        "text": msg["content"],
-                        "type": "text"
-                    })
-                else:
-                    # 如果已经是正确的格式，直接使用
-                    content = msg["content"]
-                
-                converted_messages.append({
-                    "role": msg["role"],
-                    "content": content
-                })
-            
-            # 构建请求体
-            payload = {
-                "model": self.default_model,
-                "messages": converted_messages,
-                "temperature": request.temperature,
-                "max_tokens": request.max_tokens
-            }
+            # 复用同一会话，保持长连接
+            if self.session is None:
+                self.session = requests.Session()
             
-            # 发送请求
-            response = requests.post(
+            response = self.session.post(
                 self.api_url,
-                headers=headers,
-                data=json.dumps(payload)
+                headers=self._build_headers(),
+                data=json.dumps(self._build_payload(request)),
+                timeout=self.timeout
             )
+            return self._parse_response(response.status_code, response.text)
+        except Exception as e:
+            raise RuntimeError(f"豆包API调用失败: {str(e)}")
+    
+    async def acall(self, request: ModelRequest) -> ModelResponse:
+        """异步调用豆包API"""
+        import httpx
+        
+        try:
+            if self.async_client is None:
+                self.async_client = httpx.AsyncClient(timeout=self.timeout)
             
-            # 处理响应
-            if response.status_code == 200:
-                result = response.json()
-                if result.get("choices") and len(result["choices"]) > 0:
-                    text = result["choices"][0]["message"]["content"]
-                    return ModelResponse(text, ModelType.DOUBAO)
-                else:
-                    raise RuntimeError(f"豆包API响应格式错误: {json.dumps(result)}")
-            else:
-                raise RuntimeError(f"豆包API调用失败: 状态码 {response.status_code}, 错误信息: {response.text}")
+            response = await self.async_client.post(
+                self.api_url,
+                headers=self._build_headers(),
+                json=self._build_payload(request)
+            )
+            return self._parse_response(response.status_code, response.text)
         except Exception as e:
             raise RuntimeError(f"豆包API调用失败: {str(e)}")
+    
+    async def astream(self, request: ModelRequest) -> AsyncIterator[str]:
+        """流式调用豆包API（SSE）"""
+        import httpx
+        
+        if self.async_client is None:
+            self.async_client = httpx.AsyncClient(timeout=self.timeout)
+        
+        payload = self._build_payload(request)
+        payload["stream"] = True
+        
+        try:
+            async with self.async_client.stream(
+                "POST",
+                self.api_url,
+                headers=self._build_headers(),
+                json=payload
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise RuntimeError(f"状态码 {response.status_code}, 错误信息: {body}")
+                
+                async for line in response.aiter_lines():
+                    delta = self._parse_stream_line(line)
+                    if delta:
+                        yield delta
+        except Exception as e:
+            raise RuntimeError(f"豆包API调用失败: {str(e)}")
+    
+    async def aclose(self) -> None:
+        """关闭HTTP连接池"""
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+        if self.session is not None:
+            self.session.close()
+            self.session = None
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """进行中的上游调用及其等待者数量"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    请求合并（single-flight）
+
+    相同键的并发请求只执行一次上游调用，其余请求等待并共享同一结果或异常。
+    上游调用在独立任务中执行，单个等待者被取消不会影响其他等待者；
+    全部等待者都被取消时取消上游调用，不再为没有人等待的结果消耗资源。
+    """
+
+    def __init__(self):
+        """初始化请求合并器"""
+        self._inflight: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.shared = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行或加入相同键的进行中请求
+
+        Args:
+            key: 请求键，相同键的并发请求会被合并
+            func: 发起上游调用的协程函数
+
+        Returns:
+            T: 上游调用结果
+        """
+        call = self._inflight.get(key)
+        if call is None:
+            self.calls += 1
+            call = _Call(asyncio.ensure_future(func()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.shared += 1
+            logger.debug(f"合并进行中的请求: {key}")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # 最后一个等待者离开，立即移除记录，之后的相同请求发起新的上游调用
+                self._discard(key, call)
+                call.task.cancel()
+                self.cancelled += 1
+                logger.debug(f"等待者全部取消，取消上游请求: {key}")
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _discard(self, key: Hashable, call: _Call) -> None:
+        """移除请求记录，相同键已被新的请求占用时保留"""
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        """请求完成后移除记录，并取回异常避免未处理异常警告"""
+        self._discard(key, call)
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def inflight_count(self) -> int:
+        """
+        获取进行中的请求数
+
+        Returns:
+            int: 请求数
+        """
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计数据
+
+        Returns:
+            Dict[str, int]: 上游调用次数、被合并的请求数、因等待者全部取消而取消的上游调用数和进行中的请求数
+        """
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "cancelled": self.cancelled,
+            "inflight": self.inflight_count(),
+        }
@@ -0,0 +1,4 @@
+# 学习分析模块
+from .analytics_engine import AnalyticsEngine, analytics_engine
+
+__all__ = ["analytics_engine", "AnalyticsEngine"]
@@ -0,0 +1,353 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 六维能力
+ABILITY_NAMES = ("逻辑推理", "空间想象", "计算能力", "问题分析", "创新思维", "知识应用")
+
+# 没有答题数据时的默认分数
+BASELINE_SCORE = 60
+
+# 各难度级别的目标答题时间（秒），不低于该时间的作答按比例扣分
+LEVEL_TARGET_SECONDS = {
+    "beginner": 300,
+    "初级": 300,
+    "intermediate": 480,
+    "中级": 480,
+    "advanced": 600,
+    "高级": 600,
+}
+DEFAULT_TARGET_SECONDS = 480
+
+# 高难度级别，用于评估创新思维
+ADVANCED_LEVELS = ("advanced", "高级")
+
+# 几何类知识点关键词，用于评估空间想象
+GEOMETRY_KEYWORDS = ("三角形", "圆", "相似", "全等", "几何", "四边形", "角", "线", "图形")
+
+# 题型与能力的对应关系
+QUESTION_TYPE_ABILITIES = {
+    "calculation": "计算能力",
+    "proof": "逻辑推理",
+    "choice": "知识应用",
+}
+
+# 低于该分数的能力或知识点会在总结中提示加强
+WEAK_SCORE = 70
+
+
+class AnswerStats:
+    """答题记录的聚合统计，可按记录数加权合并"""
+
+    __slots__ = ("count", "hint_total", "no_hint_count", "time_total", "timed_count", "target_total")
+
+    def __init__(self):
+        self.count = 0
+        self.hint_total = 0
+        self.no_hint_count = 0
+        self.time_total = 0
+        self.timed_count = 0
+        self.target_total = 0
+
+    @classmethod
+    def from_totals(cls, totals: Iterable[Optional[int]]) -> "AnswerStats":
+        """
+        由聚合查询返回的统计列构建，列顺序与__slots__一致
+
+        Args:
+            totals: 记录数、提示总次数、未使用提示记录数、总耗时、有耗时记录数、目标耗时之和
+
+        Returns:
+            AnswerStats: 统计对象
+        """
+        stats = cls()
+        for name, value in zip(cls.__slots__, totals):
+            setattr(stats, name, value or 0)
+        return stats
+
+    def add(self, other: "AnswerStats") -> None:
+        """合并另一组统计"""
+        self.count += other.count
+        self.hint_total += other.hint_total
+        self.no_hint_count += other.no_hint_count
+        self.time_total += other.time_total
+        self.timed_count += other.timed_count
+        self.target_total += other.target_total
+
+    def score(self) -> int:
+        """
+        计算0-100的得分：独立完成率和平均提示次数占60%，答题用时相对目标时间占40%
+
+        Returns:
+            int: 得分，没有记录时返回默认分数
+        """
+        if not self.count:
+            return BASELINE_SCORE
+
+        avg_hints = self.hint_total / self.count
+        hint_score = 100 * (0.5 * self.no_hint_count / self.count + 0.5 / (1 + avg_hints))
+        if not self.timed_count or not self.time_total:
+            return round(hint_score)
+
+        time_score = 100 * min(1.0, self.target_total / self.time_total)
+        return round(0.6 * hint_score + 0.4 * time_score)
+
+
+class AnalyticsEngine:
+    """
+    学习分析引擎
+
+    全体学生的结果由知识点统计表（tag_stats）汇总，耗时与知识点数量成正比；
+    单个学生的结果用一条GROUP BY查询按知识点、题型和难度级别聚合答题记录，
+    数据库只返回分组统计。结果按学生缓存，有新答题记录时失效。
+    计算出的结果定期保存为StudentAnalysis快照，而不是每次请求都写入。
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 10000):
+        """
+        初始化分析引擎
+
+        Args:
+            ttl: 分析结果缓存有效期（秒）
+            max_entries: 缓存和待保存快照的最大学生数，超过后淘汰最久未使用的学生
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Optional[str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # 计算后尚未保存快照的学生
+        self._dirty: "OrderedDict[Optional[str], Dict[str, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    @staticmethod
+    def _aggregate_query(student_id: Optional[str]):
+        """构建按知识点、题型和难度级别分组的聚合查询"""
+        from sqlalchemy import case, func, select
+        from models.models import AnswerRecord, Question
+
+        hint_count = func.coalesce(AnswerRecord.hint_count, 0)
+        target = case(
+            *[(AnswerRecord.level == level, seconds) for level, seconds in LEVEL_TARGET_SECONDS.items()],
+            else_=DEFAULT_TARGET_SECONDS,
+        )
+        timed = AnswerRecord.time_spent.isnot(None)
+
+        query = (
+            select(
+                AnswerRecord.tag,
+                Question.type,
+                AnswerRecord.level,
+                func.count(AnswerRecord.id),
+                func.sum(hint_count),
+                func.sum(case((hint_count == 0, 1), else_=0)),
+                func.sum(func.coalesce(AnswerRecord.time_spent, 0)),
+                func.count(AnswerRecord.time_spent),
+                func.sum(case((timed, target), else_=0)),
+            )
+            .join(Question, Question.id == AnswerRecord.question_id)
+            .group_by(AnswerRecord.tag, Question.type, AnswerRecord.level)
+        )
+        if student_id is not None:
+            query = query.where(AnswerRecord.student_id == student_id)
+        return query
+
+    @staticmethod
+    def _build_result(rows: Iterable[Tuple]) -> Dict[str, Any]:
+        """将分组统计合并为知识点得分和六维能力得分"""
+        tag_stats: Dict[str, AnswerStats] = {}
+        ability_stats = {name: AnswerStats() for name in ABILITY_NAMES}
+        record_count = 0
+
+        for tag, question_type, level, *totals in rows:
+            stats = AnswerStats.from_totals(totals)
+            record_count += stats.count
+
+            if tag:
+                tag_stats.setdefault(tag, AnswerStats()).add(stats)
+                if any(keyword in tag for keyword in GEOMETRY_KEYWORDS):
+                    ability_stats["空间想象"].add(stats)
+
+            type_value = question_type.value if hasattr(question_type, "value") else str(question_type)
+            ability = QUESTION_TYPE_ABILITIES.get(type_value)
+            if ability:
+                ability_stats[ability].add(stats)
+            if level in ADVANCED_LEVELS:
+                ability_stats["创新思维"].add(stats)
+            ability_stats["问题分析"].add(stats)
+
+        return {
+            "abilities": {name: stats.score() for name, stats in ability_stats.items()},
+            "tag_scores": {tag: stats.score() for tag, stats in tag_stats.items()},
+            "record_count": record_count,
+        }
+
+    async def compute(self, db, student_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取学生的分析结果，缓存未命中时从数据库聚合计算
+
+        Args:
+            db: 异步数据库会话
+            student_id: 学生ID，为空时统计全部答题记录
+
+        Returns:
+            Dict[str, Any]: 包含abilities、tag_scores和record_count的分析结果
+        """
+        cached = self._cache.get(student_id)
+        if cached is not None:
+            if time.monotonic() - cached[0] <= self.ttl:
+                self._cache.move_to_end(student_id)
+                return cached[1]
+            del self._cache[student_id]
+
+        if student_id is None:
+            from .tag_stats import tag_totals_query
+            query = tag_totals_query()
+        else:
+            query = self._aggregate_query(student_id)
+        rows = (await db.execute(query)).all()
+        result = self._build_result(rows)
+        self._cache[student_id] = (time.monotonic(), result)
+        self._cache.move_to_end(student_id)
+        self._dirty[student_id] = result
+        self._dirty.move_to_end(student_id)
+        self._evict()
+        return result
+
+    def _evict(self) -> None:
+        """超过最大学生数时淘汰最久未使用的缓存和最早的待保存快照"""
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+        while len(self._dirty) > self.max_entries:
+            # 快照只是分析结果的留档，丢弃最早的结果，学生下次查询时重新计算
+            self._dirty.popitem(last=False)
+
+    def prune(self) -> int:
+        """
+        清理已过期的缓存结果
+
+        Returns:
+            int: 清理的条目数
+        """
+        deadline = time.monotonic() - self.ttl
+        expired = [student_id for student_id, (computed_at, _) in self._cache.items() if computed_at < deadline]
+        for student_id in expired:
+            del self._cache[student_id]
+        return len(expired)
+
+    def invalidate(self, student_ids: Iterable[Optional[str]]) -> None:
+        """
+        使学生的分析结果失效，全体统计随之失效
+
+        Args:
+            student_ids: 有新答题记录的学生ID
+        """
+        for student_id in set(student_ids) | {None}:
+            self._cache.pop(student_id, None)
+
+    def clear(self) -> None:
+        """清空全部缓存和待保存的分析结果"""
+        self._cache.clear()
+        self._dirty.clear()
+
+    async def save_snapshots(self, session_factory: Optional[Callable[[], Any]] = None) -> int:
+        """
+        将上次保存后重新计算过的分析结果保存为StudentAnalysis快照
+
+        Args:
+            session_factory: 异步会话工厂，默认使用models.base.AsyncSessionLocal
+
+        Returns:
+            int: 保存的快照数
+        """
+        if not self._dirty:
+            return 0
+
+        from models.models import StudentAnalysis
+
+        if session_factory is None:
+            from models.base import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+
+        dirty, self._dirty = self._dirty, OrderedDict()
+        try:
+            async with session_factory() as db:
+                db.add_all([
+                    StudentAnalysis(
+                        student_id=student_id,
+                        abilities=result["abilities"],
+                        tag_scores=result["tag_scores"],
+                        summary=build_summary(result["abilities"], result["tag_scores"]),
+                    )
+                    for student_id, result in dirty.items()
+                ])
+                await db.commit()
+        except Exception:
+            # 保存失败时保留待保存的结果，下次重试
+            for student_id, result in dirty.items():
+                self._dirty.setdefault(student_id, result)
+            self._evict()
+            raise
+        return len(dirty)
+
+    async def run_snapshots(self, interval: float) -> None:
+        """
+        定期保存分析快照并清理过期的缓存结果，直到任务被取消
+
+        Args:
+            interval: 保存间隔（秒）
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.prune()
+            try:
+                saved = await self.save_snapshots()
+                if saved:
+                    logger.info(f"已保存 {saved} 条学习分析快照")
+            except Exception as e:
+                logger.warning(f"保存学习分析快照失败: {str(e)}")
+
+
+def build_summary(abilities: Dict[str, int], tag_scores: Dict[str, int], tags: Optional[List[str]] = None) -> str:
+    """
+    根据能力和知识点得分生成分析总结
+
+    Args:
+        abilities: 六维能力得分
+        tag_scores: 知识点得分
+        tags: 需要重点说明的知识点，为空时说明全部知识点
+
+    Returns:
+        str: 分析总结
+    """
+    weak_abilities = sorted((score, name) for name, score in abilities.items() if score < WEAK_SCORE)[:2]
+    if weak_abilities:
+        summary = f"根据您的答题表现，建议加强{'和'.join(name for _, name in weak_abilities)}能力的训练。"
+    else:
+        summary = "根据您的答题表现，各项能力均衡发展，请继续保持。"
+
+    candidates = tags if tags is not None else list(tag_scores)
+    weak_tags = [tag for tag in candidates if tag_scores.get(tag, BASELINE_SCORE) < WEAK_SCORE]
+    if weak_tags:
+        summary += f"在知识点方面，建议重点复习{', '.join(weak_tags)}相关内容。"
+    return summary
+
+
+def _create_analytics_engine() -> AnalyticsEngine:
+    """按应用配置创建分析引擎，答题记录写入后使相关结果失效"""
+    from config import settings
+    from services.answer.record_writer import answer_record_writer
+
+    engine = AnalyticsEngine(ttl=settings.analysis_cache_ttl, max_entries=settings.analysis_cache_max_entries)
+    answer_record_writer.add_listener(
+        lambda rows: engine.invalidate(row.get("student_id") for row in rows)
+    )
+    return engine
+
+
+# 全局分析引擎实例
+analytics_engine = _create_analytics_engine()
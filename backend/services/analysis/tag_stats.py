@@ -0,0 +1,178 @@
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .analytics_engine import DEFAULT_TARGET_SECONDS, LEVEL_TARGET_SECONDS
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 汇总键：知识点、难度级别、题型、日期
+StatKey = Tuple[str, str, str, date]
+
+# 累加的统计列
+STAT_COLUMNS = ("record_count", "hint_total", "no_hint_count", "time_total", "timed_count", "target_total")
+
+
+def _question_type_value(question_type: Any) -> str:
+    """题型枚举转换为字符串"""
+    return question_type.value if hasattr(question_type, "value") else str(question_type)
+
+
+def _record_deltas(rows: List[Dict[str, Any]], question_types: Dict[int, str]) -> Dict[StatKey, List[int]]:
+    """将一批答题记录按汇总键累加为增量"""
+    deltas: Dict[StatKey, List[int]] = {}
+    for row in rows:
+        created_at = row.get("created_at") or datetime.utcnow()
+        level = row.get("level") or ""
+        key = (row.get("tag") or "", level, question_types.get(row["question_id"], ""), created_at.date())
+
+        hint_count = row.get("hint_count") or 0
+        time_spent = row.get("time_spent")
+        timed = time_spent is not None
+
+        delta = deltas.setdefault(key, [0] * len(STAT_COLUMNS))
+        delta[0] += 1
+        delta[1] += hint_count
+        delta[2] += 1 if hint_count == 0 else 0
+        delta[3] += time_spent or 0
+        delta[4] += 1 if timed else 0
+        delta[5] += LEVEL_TARGET_SECONDS.get(level, DEFAULT_TARGET_SECONDS) if timed else 0
+    return deltas
+
+
+async def apply_answer_records(db, rows: List[Dict[str, Any]]) -> None:
+    """
+    在答题记录写入的同一事务中累加知识点统计
+
+    Args:
+        db: 异步数据库会话
+        rows: 本批次写入的答题记录字段
+    """
+    from sqlalchemy import select, update
+    from models.models import Question, TagStat
+
+    question_ids = {row["question_id"] for row in rows}
+    result = await db.execute(select(Question.id, Question.type).where(Question.id.in_(question_ids)))
+    question_types = {qid: _question_type_value(qtype) for qid, qtype in result}
+
+    deltas = _record_deltas(rows, question_types)
+    values = [
+        dict(zip(("tag", "level", "question_type", "day"), key), **dict(zip(STAT_COLUMNS, delta)))
+        for key, delta in deltas.items()
+    ]
+
+    dialect = (await db.connection()).dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(TagStat).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tag", "level", "question_type", "day"],
+            set_={column: getattr(TagStat, column) + getattr(stmt.excluded, column) for column in STAT_COLUMNS},
+        )
+        await db.execute(stmt)
+        return
+
+    # 其他数据库：先更新，不存在时插入
+    for value in values:
+        updated = await db.execute(
+            update(TagStat)
+            .where(
+                TagStat.tag == value["tag"],
+                TagStat.level == value["level"],
+                TagStat.question_type == value["question_type"],
+                TagStat.day == value["day"],
+            )
+            .values({column: getattr(TagStat, column) + value[column] for column in STAT_COLUMNS})
+        )
+        if updated.rowcount == 0:
+            db.add(TagStat(**value))
+
+
+def rebuild_tag_stats(db=None) -> int:
+    """
+    根据全部答题记录重建知识点统计表
+
+    Args:
+        db: 数据库会话，为空时使用新的会话
+
+    Returns:
+        int: 重建后的汇总行数
+    """
+    from sqlalchemy import case, delete, func, insert, select
+    from models.models import AnswerRecord, Question, QuestionType, TagStat
+
+    if db is None:
+        from models.base import SessionLocal
+
+        with SessionLocal() as session:
+            return rebuild_tag_stats(session)
+
+    hint_count = func.coalesce(AnswerRecord.hint_count, 0)
+    timed = AnswerRecord.time_spent.isnot(None)
+    # 与增量维护一致，题型保存为枚举值
+    question_type = case(*[(Question.type == member, member.value) for member in QuestionType], else_="")
+    target = case(
+        *[(AnswerRecord.level == level, seconds) for level, seconds in LEVEL_TARGET_SECONDS.items()],
+        else_=DEFAULT_TARGET_SECONDS,
+    )
+    tag = func.coalesce(AnswerRecord.tag, "")
+    level = func.coalesce(AnswerRecord.level, "")
+    day = func.date(AnswerRecord.created_at)
+
+    aggregate = (
+        select(
+            tag,
+            level,
+            question_type,
+            day,
+            func.count(AnswerRecord.id),
+            func.sum(hint_count),
+            func.sum(case((hint_count == 0, 1), else_=0)),
+            func.sum(func.coalesce(AnswerRecord.time_spent, 0)),
+            func.count(AnswerRecord.time_spent),
+            func.sum(case((timed, target), else_=0)),
+        )
+        # 与增量维护一致，题目不存在的记录保留，题型为空字符串
+        .outerjoin(Question, Question.id == AnswerRecord.question_id)
+        .group_by(tag, level, question_type, day)
+    )
+
+    db.execute(delete(TagStat))
+    db.execute(insert(TagStat).from_select(["tag", "level", "question_type", "day", *STAT_COLUMNS], aggregate))
+    db.commit()
+
+    count = db.query(func.count()).select_from(TagStat).scalar()
+    logger.info(f"知识点统计表已重建，共 {count} 行")
+    return count
+
+
+def tag_totals_query(since: Optional[date] = None, level: Optional[str] = None):
+    """
+    构建按知识点、题型和难度级别汇总统计表的查询，列顺序与分析引擎的聚合查询一致
+
+    Args:
+        since: 起始日期（包含），为空时汇总全部日期
+        level: 难度级别，为空时汇总全部级别
+
+    Returns:
+        Select: 查询语句
+    """
+    from sqlalchemy import func, select
+    from models.models import TagStat
+
+    query = select(
+        TagStat.tag,
+        TagStat.question_type,
+        TagStat.level,
+        *[func.sum(getattr(TagStat, column)) for column in STAT_COLUMNS],
+    ).group_by(TagStat.tag, TagStat.question_type, TagStat.level)
+    if since is not None:
+        query = query.where(TagStat.day >= since)
+    if level is not None:
+        query = query.where(TagStat.level == level)
+    return query
@@ -0,0 +1,4 @@
+# 答题记录模块
+from .record_writer import AnswerRecordWriter, answer_record_writer
+
+__all__ = ["answer_record_writer", "AnswerRecordWriter"]
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 写入结果：记录ID和创建时间
+WriteResult = Tuple[int, datetime]
+
+# 一次提交：记录字段列表和等待写入结果的Future
+Submission = Tuple[List[Dict[str, Any]], "asyncio.Future[List[WriteResult]]"]
+
+
+class AnswerRecordWriter:
+    """
+    答题记录批量写入器（write-behind）
+
+    并发提交的答题记录先进入缓冲区，达到批量大小或等待超过刷新间隔后，
+    在一个事务中批量插入，提交方等待所在批次写入完成后获得记录ID。
+    下课集中提交时，多个请求合并为一次写事务，减少SQLite写锁竞争。
+    批次写入失败时二分重试，只有包含错误记录的提交方收到异常。
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        batch_size: int = 100,
+        flush_interval: float = 0.05
+    ):
+        """
+        初始化写入器
+
+        Args:
+            session_factory: 异步会话工厂，默认使用models.base.AsyncSessionLocal
+            batch_size: 批量大小，缓冲区达到该数量时立即写入
+            flush_interval: 刷新间隔（秒），批次中第一条记录最多等待的时间
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Submission] = []
+        self._pending_records = 0
+        self._batch_full: Optional[asyncio.Event] = None
+        self._flushes: List["asyncio.Task[None]"] = []
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self._batch_hooks: List[Callable[[Any, List[Dict[str, Any]]], Awaitable[None]]] = []
+        self.records_written = 0
+        self.batches_written = 0
+
+    def add_listener(self, callback: Callable[[List[Dict[str, Any]]], None]) -> None:
+        """
+        注册批次写入成功后的回调，用于使依赖答题记录的缓存失效
+
+        Args:
+            callback: 回调函数，参数为本批次写入的记录字段列表
+        """
+        self._listeners.append(callback)
+
+    def add_batch_hook(self, hook: Callable[[Any, List[Dict[str, Any]]], Awaitable[None]]) -> None:
+        """
+        注册在批量写入事务中执行的钩子，用于与答题记录一起维护汇总数据
+
+        Args:
+            hook: 协程函数，参数为异步数据库会话和本批次的记录字段列表，抛出异常时整个批次回滚
+        """
+        self._batch_hooks.append(hook)
+
+    async def submit(self, record: Dict[str, Any]) -> WriteResult:
+        """
+        提交单条答题记录
+
+        Args:
+            record: 答题记录字段
+
+        Returns:
+            WriteResult: 记录ID和创建时间
+        """
+        results = await self.submit_many([record])
+        return results[0]
+
+    async def submit_many(self, records: List[Dict[str, Any]]) -> List[WriteResult]:
+        """
+        提交多条答题记录，等待所在批次写入完成
+
+        Args:
+            records: 答题记录字段列表
+
+        Returns:
+            List[WriteResult]: 按提交顺序返回的记录ID和创建时间
+        """
+        if not records:
+            return []
+        now = datetime.utcnow()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(([{"created_at": now, **record} for record in records], future))
+        self._pending_records += len(records)
+
+        if self._batch_full is None:
+            # 批次中第一个提交者负责安排写入
+            self._batch_full = asyncio.Event()
+            task = asyncio.ensure_future(self._flush_after(self._batch_full))
+            self._flushes.append(task)
+            task.add_done_callback(self._flushes.remove)
+        if self._pending_records >= self.batch_size:
+            self._batch_full.set()
+
+        return await future
+
+    async def _flush_after(self, batch_full: asyncio.Event) -> None:
+        """等待批次满或超过刷新间隔后写入缓冲区中的记录"""
+        try:
+            await asyncio.wait_for(batch_full.wait(), timeout=self.flush_interval)
+        except asyncio.TimeoutError:
+            pass
+
+        batch, self._pending = self._pending, []
+        self._pending_records = 0
+        self._batch_full = None
+        if batch:
+            await self._write(batch)
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[WriteResult]:
+        """在一个事务中批量插入记录并执行批次钩子，失败时整个事务回滚"""
+        from sqlalchemy import insert
+        from models.models import AnswerRecord
+
+        session_factory = self.session_factory
+        if session_factory is None:
+            from models.base import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+
+        async with session_factory() as db:
+            result = await db.execute(
+                insert(AnswerRecord).returning(
+                    AnswerRecord.id, AnswerRecord.created_at, sort_by_parameter_order=True
+                ),
+                rows,
+            )
+            written = [(row.id, row.created_at) for row in result]
+            for hook in self._batch_hooks:
+                await hook(db, rows)
+            await db.commit()
+        return written
+
+    async def _write(self, batch: List[Submission]) -> None:
+        """
+        写入一批提交并将结果通知各提交方
+
+        批次写入失败时拆成两半分别重试，直到定位出写入失败的单个提交，
+        其他提交方的记录照常写入
+        """
+        rows = [record for records, _ in batch for record in records]
+        try:
+            written = await self._insert(rows)
+        except Exception as e:
+            if len(batch) > 1:
+                logger.warning(f"批量写入答题记录失败，拆分批次重试: {str(e)}")
+                middle = len(batch) // 2
+                await self._write(batch[:middle])
+                await self._write(batch[middle:])
+                return
+            logger.error(f"写入答题记录失败: {str(e)}")
+            future = batch[0][1]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        self.records_written += len(rows)
+        self.batches_written += 1
+        for callback in self._listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                logger.warning(f"答题记录写入回调失败: {str(e)}")
+        offset = 0
+        for records, future in batch:
+            if not future.done():
+                future.set_result(written[offset:offset + len(records)])
+            offset += len(records)
+
+    async def flush(self) -> None:
+        """立即写入缓冲区中的记录，并等待进行中的写入完成，用于应用关闭时"""
+        if self._batch_full is not None:
+            self._batch_full.set()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计数据
+
+        Returns:
+            Dict[str, int]: 已写入的记录数、批次数和缓冲区中的记录数
+        """
+        return {
+            "records_written": self.records_written,
+            "batches_written": self.batches_written,
+            "pending": self._pending_records,
+        }
+
+
+async def _apply_tag_stats(db: Any, rows: List[Dict[str, Any]]) -> None:
+    """在批量写入事务中累加知识点统计"""
+    # 分析模块导入时会引用全局写入器，在调用时导入避免循环导入
+    from services.analysis.tag_stats import apply_answer_records
+
+    await apply_answer_records(db, rows)
+
+
+def _create_answer_record_writer() -> AnswerRecordWriter:
+    """按应用配置创建答题记录写入器，知识点统计与答题记录在同一事务中维护"""
+    from config import settings
+
+    writer = AnswerRecordWriter(
+        batch_size=settings.answer_record_batch_size,
+        flush_interval=settings.answer_record_flush_interval,
+    )
+    writer.add_batch_hook(_apply_tag_stats)
+    return writer
+
+
+# 全局答题记录写入器实例
+answer_record_writer = _create_answer_record_writer()
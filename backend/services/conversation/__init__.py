@@ -1,11 +1,29 @@
 # 对话管理模块
-from .connection_manager import ConnectionManager
-from .conversation_history import ConversationHistory
-
-# 创建连接管理器实例
-connection_manager = ConnectionManager()
+from .connection_manager import ConnectionManager, create_connection_manager
+from .message_bus import MessageBus, MemoryMessageBus, RedisMessageBus
+from .conversation_history import ConversationHistory, ConversationMessage
+from config import settings
+from storage.state_store import create_state_store
 
 # 创建对话历史管理器实例
-conversation_history = ConversationHistory()
+conversation_history = ConversationHistory(
+    max_history_length=settings.conversation_max_history,
+    idle_ttl=settings.conversation_idle_ttl,
+    max_memory_bytes=int(settings.conversation_max_memory_mb * 1024 * 1024),
+    store=create_state_store(ttl=settings.conversation_idle_ttl),
+)
+
+# 创建连接管理器实例，客户端断开或心跳超时被清理后释放其对话历史的内存副本
+connection_manager = create_connection_manager()
+connection_manager.add_disconnect_listener(conversation_history.remove_client)
 
-__all__ = ["connection_manager", "conversation_history", "ConnectionManager", "ConversationHistory"]
+__all__ = [
+    "connection_manager",
+    "conversation_history",
+    "ConnectionManager",
+    "ConversationHistory",
+    "ConversationMessage",
+    "MessageBus",
+    "MemoryMessageBus",
+    "RedisMessageBus",
+]
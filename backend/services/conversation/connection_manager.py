@@ -1,18 +1,90 @@
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional, Set
+import asyncio
+import json
 import logging
+import time
+
+from utils.id_generator import generate_ulid
+from .message_bus import MessageBus
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
 
+# 发送队列已满时的处理策略：drop丢弃新消息，disconnect断开该客户端
+OVERFLOW_POLICIES = ("drop", "disconnect")
+
+
 class ConnectionManager:
-    """WebSocket连接管理器"""
+    """
+    WebSocket连接管理器
+    
+    记录每个客户端最近一次活动的单调时间，后台清理任务定期关闭超过心跳超时的连接，
+    并通知断开监听器清理与客户端相关的状态（如对话历史）。
     
-    def __init__(self):
-        """初始化连接管理器"""
+    每个客户端有一个有界的发送队列和独立的发送任务，消息只序列化一次后放入队列，
+    广播不等待任何一个客户端；发送超时或队列已满的慢客户端按策略丢弃消息或断开，
+    不会拖慢其他客户端。
+    
+    客户端可以加入房间（如班级、题目），按房间发送时只发给房间内的客户端。
+    
+    配置了消息总线时，单发、广播和按房间发送的消息同时发布到总线，
+    其他worker收到后发给各自的本地连接，多个worker可以共同服务所有客户端
+    """
+    
+    def __init__(
+        self,
+        close_timeout: float = 5.0,
+        queue_size: int = 100,
+        send_timeout: float = 5.0,
+        overflow_policy: str = "disconnect",
+        max_rooms_per_client: int = 20,
+        bus: Optional[MessageBus] = None
+    ):
+        """
+        初始化连接管理器
+        
+        Args:
+            close_timeout: 关闭失效连接的最长等待时间（秒）
+            queue_size: 每个客户端发送队列的最大消息数
+            send_timeout: 单条消息的发送超时时间（秒），超时的客户端被断开
+            overflow_policy: 发送队列已满时的处理策略（drop或disconnect）
+            max_rooms_per_client: 每个客户端最多加入的房间数
+            bus: 跨worker的消息总线，为空时消息只发给本进程的连接
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"不支持的发送队列溢出策略: {overflow_policy}")
         self.active_connections: Dict[str, WebSocket] = {}
         self.last_ping: Dict[str, float] = {}
+        self.close_timeout = close_timeout
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.overflow_policy = overflow_policy
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._senders: Dict[str, asyncio.Task] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self.max_rooms_per_client = max_rooms_per_client
+        # 房间 -> 客户端ID，客户端ID -> 房间
+        self.rooms: Dict[str, Set[str]] = {}
+        self.client_rooms: Dict[str, Set[str]] = {}
+        self.bus = bus
+        # 本进程的标识，用于忽略自己发布到总线的消息
+        self.worker_id = generate_ulid()
+        self.bus_errors = 0
+        self._disconnect_listeners: List[Callable[[str], None]] = []
+        self.reaped = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+    
+    def add_disconnect_listener(self, callback: Callable[[str], None]) -> None:
+        """
+        注册断开监听器，客户端断开或被清理后调用
+        
+        Args:
+            callback: 回调函数，参数为客户端ID
+        """
+        self._disconnect_listeners.append(callback)
     
     async def connect(self, websocket: WebSocket, client_id: str = None) -> str:
         """
@@ -20,16 +92,19 @@ class ConnectionManager:
         
         Args:
             websocket: WebSocket实例
-            client_id: 客户端ID，如为None则自动生成
+            client_id: 客户端ID，如为None则生成按连接时间排序的唯一ID
             
         Returns:
             str: 客户端ID
         """
         await websocket.accept()
         if client_id is None:
-            client_id = str(id(websocket))
+            client_id = generate_ulid()
         self.active_connections[client_id] = websocket
-        self.last_ping[client_id] = 0
+        self.last_ping[client_id] = time.monotonic()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues[client_id] = queue
+        self._senders[client_id] = asyncio.create_task(self._sender(client_id, websocket, queue))
         logger.info(f"客户端 {client_id} 已连接，当前连接数: {len(self.active_connections)}")
         return client_id
     
@@ -40,47 +115,261 @@ class ConnectionManager:
         Args:
             client_id: 客户端ID
         """
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-            logger.info(f"客户端 {client_id} 已断开连接，当前连接数: {len(self.active_connections)}")
-        if client_id in self.last_ping:
-            del self.last_ping[client_id]
+        self.last_ping.pop(client_id, None)
+        if client_id not in self.active_connections:
+            return
+        del self.active_connections[client_id]
+        self._queues.pop(client_id, None)
+        for room in self.client_rooms.pop(client_id, ()):
+            self._remove_member(room, client_id)
+        sender = self._senders.pop(client_id, None)
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
+        logger.info(f"客户端 {client_id} 已断开连接，当前连接数: {len(self.active_connections)}")
+        for callback in self._disconnect_listeners:
+            try:
+                callback(client_id)
+            except Exception as e:
+                logger.warning(f"断开监听器执行失败: {str(e)}")
+    
+    @staticmethod
+    def _serialize(message: Any) -> str:
+        """序列化消息，格式与WebSocket.send_json一致"""
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+    
+    async def _sender(self, client_id: str, websocket: WebSocket, queue: asyncio.Queue) -> None:
+        """按顺序发送客户端队列中的消息，发送失败或超时时断开该客户端"""
+        while True:
+            text = await queue.get()
+            try:
+                await asyncio.wait_for(websocket.send_text(text), timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(client_id, f"发送超时（{self.send_timeout}秒）")
+                return
+            except Exception as e:
+                # 连接已关闭或出现其他错误，移除该连接
+                logger.warning(f"向客户端 {client_id} 发送消息失败: {e}")
+                self.disconnect(client_id)
+                return
+            finally:
+                queue.task_done()
+    
+    def _evict(self, client_id: str, reason: str) -> None:
+        """断开慢客户端并在后台关闭连接"""
+        websocket = self.active_connections.get(client_id)
+        if websocket is None:
+            return
+        logger.warning(f"客户端 {client_id} 接收过慢，断开连接: {reason}")
+        self.slow_disconnects += 1
+        self.disconnect(client_id)
+        task = asyncio.ensure_future(self._close(client_id, websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    def _enqueue(self, client_id: str, text: str) -> bool:
+        """将序列化后的消息放入客户端的发送队列，队列已满时按策略处理"""
+        queue = self._queues.get(client_id)
+        if queue is None:
+            return False
+        try:
+            queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            if self.overflow_policy == "drop":
+                self.dropped += 1
+            else:
+                self._evict(client_id, f"发送队列已满（{self.queue_size}条）")
+            return False
+    
+    def _deliver(self, scope: str, target: Optional[str], text: str, exclude: Optional[str] = None) -> List[str]:
+        """
+        将消息放入本进程连接的发送队列
+        
+        Args:
+            scope: 发送范围（client单发，room按房间，all广播）
+            target: 客户端ID或房间名称
+            text: 序列化后的消息
+            exclude: 不接收消息的客户端ID
+            
+        Returns:
+            List[str]: 成功放入发送队列的客户端ID
+        """
+        if scope == "client":
+            client_ids = [target] if target in self._queues else []
+        elif scope == "room":
+            client_ids = list(self.rooms.get(target, ()))
+        else:
+            client_ids = list(self._queues)
+        # 使用副本，放入队列时可能断开慢客户端
+        return [client_id for client_id in client_ids if client_id != exclude and self._enqueue(client_id, text)]
+    
+    async def _publish(self, scope: str, target: Optional[str], text: str, exclude: Optional[str] = None) -> None:
+        """发布消息到总线，发布失败不影响本进程的发送"""
+        if self.bus is None:
+            return
+        try:
+            await self.bus.publish({
+                "origin": self.worker_id,
+                "scope": scope,
+                "target": target,
+                "exclude": exclude,
+                "text": text,
+            })
+        except Exception as e:
+            self.bus_errors += 1
+            logger.warning(f"发布总线消息失败: {str(e)}")
+    
+    def _on_bus_message(self, message: Dict[str, Any]) -> None:
+        """处理其他worker发布的消息"""
+        if message.get("origin") == self.worker_id:
+            return
+        self._deliver(message["scope"], message.get("target"), message["text"], message.get("exclude"))
+    
+    async def start(self) -> None:
+        """开始接收总线消息，应用启动时调用"""
+        if self.bus is not None:
+            await self.bus.start(self._on_bus_message)
+    
+    async def close(self) -> None:
+        """停止接收总线消息，应用关闭时调用"""
+        if self.bus is not None:
+            await self.bus.close()
     
     async def send_personal_message(self, message: dict, client_id: str) -> None:
         """
-        向特定客户端发送消息
+        向特定客户端发送消息，消息进入该客户端的发送队列后立即返回；
+        客户端不在本进程时通过总线转发给其所在的worker
         
         Args:
             message: 消息内容
             client_id: 客户端ID
         """
-        if client_id in self.active_connections:
-            try:
-                connection = self.active_connections[client_id]
-                # 直接尝试发送消息，通过异常处理处理连接关闭情况
-                await connection.send_json(message)
-            except (RuntimeError, ConnectionResetError, AttributeError) as e:
-                # 连接已关闭或出现其他错误，移除该连接
-                logger.warning(f"向客户端 {client_id} 发送消息失败: {e}")
-                self.disconnect(client_id)
+        text = self._serialize(message)
+        if client_id in self._queues:
+            self._enqueue(client_id, text)
+        else:
+            await self._publish("client", client_id, text)
     
-    async def broadcast(self, message: dict) -> None:
+    async def broadcast(self, message: dict, wait: bool = False) -> int:
         """
-        向所有连接的客户端广播消息
+        向所有连接的客户端广播消息，消息只序列化一次
         
         Args:
             message: 消息内容
+            wait: 是否等待本进程各客户端发送完成（最多send_timeout秒）
+            
+        Returns:
+            int: 本进程成功放入发送队列的客户端数
         """
-        # 创建一个副本，避免在迭代过程中修改字典
-        connections_copy = list(self.active_connections.items())
-        for client_id, connection in connections_copy:
-            try:
-                # 直接尝试发送消息，通过异常处理处理连接关闭情况
-                await connection.send_json(message)
-            except (RuntimeError, ConnectionResetError, AttributeError) as e:
-                # 连接已关闭或出现其他错误，移除该连接
-                logger.warning(f"向客户端 {client_id} 广播消息失败: {e}")
-                self.disconnect(client_id)
+        text = self._serialize(message)
+        queued = self._deliver("all", None, text)
+        await self._publish("all", None, text)
+        if wait and queued:
+            await self.flush(queued, timeout=self.send_timeout)
+        return len(queued)
+    
+    async def flush(self, client_ids: Optional[List[str]] = None, timeout: Optional[float] = None) -> None:
+        """
+        等待客户端发送队列中的消息发送完成
+        
+        Args:
+            client_ids: 客户端ID列表，为None时等待全部客户端
+            timeout: 最长等待时间（秒），为None时不限制
+        """
+        if client_ids is None:
+            client_ids = list(self._queues)
+        queues = [self._queues[client_id] for client_id in client_ids if client_id in self._queues]
+        if not queues:
+            return
+        # 等待期间断开的客户端不会再处理剩余消息，超时后不再等待
+        waiters = [asyncio.ensure_future(queue.join()) for queue in queues]
+        _, pending = await asyncio.wait(waiters, timeout=timeout)
+        for waiter in pending:
+            waiter.cancel()
+    
+    def _remove_member(self, room: str, client_id: str) -> None:
+        """从房间中移除客户端，房间为空时删除"""
+        members = self.rooms.get(room)
+        if members is None:
+            return
+        members.discard(client_id)
+        if not members:
+            del self.rooms[room]
+    
+    def join_room(self, client_id: str, room: str) -> None:
+        """
+        将客户端加入房间
+        
+        Args:
+            client_id: 客户端ID
+            room: 房间名称（如class:3A、question:42）
+        """
+        if client_id not in self.active_connections:
+            raise ValueError(f"客户端未连接: {client_id}")
+        if not room:
+            raise ValueError("房间名称不能为空")
+        joined = self.client_rooms.setdefault(client_id, set())
+        if room not in joined and len(joined) >= self.max_rooms_per_client:
+            raise ValueError(f"每个客户端最多加入 {self.max_rooms_per_client} 个房间")
+        joined.add(room)
+        self.rooms.setdefault(room, set()).add(client_id)
+    
+    def leave_room(self, client_id: str, room: str) -> None:
+        """
+        将客户端移出房间
+        
+        Args:
+            client_id: 客户端ID
+            room: 房间名称
+        """
+        joined = self.client_rooms.get(client_id)
+        if joined is not None:
+            joined.discard(room)
+        self._remove_member(room, client_id)
+    
+    def get_room_members(self, room: str) -> List[str]:
+        """
+        获取房间内的客户端
+        
+        Args:
+            room: 房间名称
+            
+        Returns:
+            List[str]: 客户端ID列表
+        """
+        return list(self.rooms.get(room, ()))
+    
+    def get_client_rooms(self, client_id: str) -> List[str]:
+        """
+        获取客户端加入的房间
+        
+        Args:
+            client_id: 客户端ID
+            
+        Returns:
+            List[str]: 房间名称列表
+        """
+        return sorted(self.client_rooms.get(client_id, ()))
+    
+    async def send_to_room(self, room: str, message: dict, exclude: Optional[str] = None, wait: bool = False) -> int:
+        """
+        向房间内的客户端发送消息，消息只序列化一次
+        
+        Args:
+            room: 房间名称
+            message: 消息内容
+            exclude: 不接收消息的客户端ID（如发送者）
+            wait: 是否等待本进程各客户端发送完成（最多send_timeout秒）
+            
+        Returns:
+            int: 本进程成功放入发送队列的客户端数
+        """
+        text = self._serialize(message)
+        queued = self._deliver("room", room, text, exclude)
+        await self._publish("room", room, text, exclude)
+        if wait and queued:
+            await self.flush(queued, timeout=self.send_timeout)
+        return len(queued)
     
     def update_ping(self, client_id: str) -> None:
         """
@@ -89,10 +378,10 @@ class ConnectionManager:
         Args:
             client_id: 客户端ID
         """
-        if client_id in self.last_ping:
-            self.last_ping[client_id] = 0
+        if client_id in self.active_connections:
+            self.last_ping[client_id] = time.monotonic()
     
-    def check_timeouts(self, timeout: int = 30) -> List[str]:
+    def check_timeouts(self, timeout: float = 30) -> List[str]:
         """
         检查客户端连接超时，返回超时的客户端ID列表
         
@@ -102,15 +391,72 @@ class ConnectionManager:
         Returns:
             List[str]: 超时的客户端ID列表
         """
-        import time
-        current_time = time.time()
-        timed_out = []
+        deadline = time.monotonic() - timeout
+        return [client_id for client_id, last_ping_time in self.last_ping.items() if last_ping_time < deadline]
+    
+    async def _close(self, client_id: str, websocket: WebSocket) -> None:
+        """关闭连接，对方无响应时不超过close_timeout"""
+        try:
+            await asyncio.wait_for(websocket.close(code=1001), timeout=self.close_timeout)
+        except Exception as e:
+            logger.debug(f"关闭客户端 {client_id} 的连接失败: {e}")
+    
+    async def reap(self, timeout: float = 30) -> List[str]:
+        """
+        关闭并移除超过心跳超时的连接
+        
+        Args:
+            timeout: 超时时间（秒）
+            
+        Returns:
+            List[str]: 被移除的客户端ID列表
+        """
+        stale = self.check_timeouts(timeout)
+        if not stale:
+            return []
+        
+        websockets = [(client_id, self.active_connections.get(client_id)) for client_id in stale]
+        # 先移除再关闭，关闭期间不会再向这些连接发送消息
+        for client_id in stale:
+            self.disconnect(client_id)
+        await asyncio.gather(*[
+            self._close(client_id, websocket) for client_id, websocket in websockets if websocket is not None
+        ])
+        
+        self.reaped += len(stale)
+        logger.info(f"已清理 {len(stale)} 个心跳超时的连接，当前连接数: {len(self.active_connections)}")
+        return stale
+    
+    async def run_reaper(self, interval: float, timeout: float) -> None:
+        """
+        定期清理心跳超时的连接，直到任务被取消
         
-        for client_id, last_ping_time in self.last_ping.items():
-            if current_time - last_ping_time > timeout:
-                timed_out.append(client_id)
+        Args:
+            interval: 检查间隔（秒）
+            timeout: 心跳超时时间（秒）
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reap(timeout)
+            except Exception as e:
+                logger.warning(f"清理超时连接失败: {str(e)}")
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计数据
         
-        return timed_out
+        Returns:
+            Dict[str, int]: 连接数、房间数、待发送消息数、丢弃的消息数、因接收过慢被断开的客户端数和心跳超时被清理的客户端数
+        """
+        return {
+            "connections": len(self.active_connections),
+            "rooms": len(self.rooms),
+            "queued": sum(queue.qsize() for queue in self._queues.values()),
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "reaped": self.reaped,
+        }
     
     def get_connection_count(self) -> int:
         """
@@ -120,3 +466,22 @@ class ConnectionManager:
             int: 当前连接数
         """
         return len(self.active_connections)
+
+
+def create_connection_manager() -> ConnectionManager:
+    """
+    按应用配置创建连接管理器
+    
+    Returns:
+        ConnectionManager: 连接管理器
+    """
+    from config import settings
+    from .message_bus import create_message_bus
+    
+    return ConnectionManager(
+        queue_size=settings.websocket_send_queue_size,
+        send_timeout=settings.websocket_send_timeout,
+        overflow_policy=settings.websocket_overflow_policy,
+        max_rooms_per_client=settings.websocket_max_rooms_per_client,
+        bus=create_message_bus(),
+    )
@@ -1,108 +1,333 @@
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Any
+
+
+class ConversationMessage:
+    """对话消息"""
+
+    __slots__ = ("role", "content", "type", "timestamp", "size")
+
+    # 消息对象本身（不含内容字符串）的近似内存占用（字节）
+    OVERHEAD = 120
+
+    def __init__(self, role: str, content: str, message_type: str = "text", timestamp: Optional[float] = None):
+        """
+        初始化消息
+
+        Args:
+            role: 角色（user, ai, system）
+            content: 消息内容
+            message_type: 消息类型（text, hint, error等）
+            timestamp: Unix时间戳（秒），默认为当前时间
+        """
+        self.role = role
+        self.content = content
+        self.type = message_type
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.size = self.OVERHEAD + sys.getsizeof(content)
+
+    def to_list(self) -> List[Any]:
+        """转换为紧凑的列表，用于持久化"""
+        return [self.role, self.content, self.type, self.timestamp]
+
+    @classmethod
+    def from_list(cls, data: List[Any]) -> "ConversationMessage":
+        """由to_list的结果恢复消息"""
+        role, content, message_type, timestamp = data
+        return cls(role, content, message_type, timestamp)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典
+
+        Returns:
+            Dict[str, Any]: 包含role、content、type和timestamp的字典
+        """
+        return {
+            "role": self.role,
+            "content": self.content,
+            "type": self.type,
+            "timestamp": self.timestamp,
+        }
+
+
+class _ClientConversation:
+    """单个客户端的对话记录"""
+
+    __slots__ = ("messages", "size", "last_active", "loaded_at")
+
+    def __init__(self, max_length: int):
+        self.messages: Deque[ConversationMessage] = deque(maxlen=max_length)
+        self.size = 0
+        self.last_active = time.monotonic()
+        # 上次从状态存储加载的时间，0表示尚未加载
+        self.loaded_at = 0.0
 
 
 class ConversationHistory:
-    """对话历史管理器，用于管理用户和AI之间的对话历史"""
-    
-    def __init__(self, max_history_length: int = 20):
+    """
+    对话历史管理器，用于管理用户和AI之间的对话历史
+
+    每个客户端最多保留max_history_length条消息；超过idle_ttl未活动的客户端会被清除；
+    全部消息的近似内存占用超过max_memory_bytes时，按最近最少使用顺序清除客户端。
+    配置了状态存储时，每条消息追加到存储中客户端的消息列表，多个worker同时写入不会互相覆盖；
+    读取时本进程的副本超过存储的缓存有效期后从存储重新加载，重启或切换worker后对话历史不会丢失
+    """
+
+    # 状态存储中的键前缀，每个客户端的消息保存为一个列表，元素为ConversationMessage.to_list()的结果
+    STORE_PREFIX = "conversation:"
+
+    def __init__(
+        self,
+        max_history_length: int = 20,
+        idle_ttl: float = 0,
+        max_memory_bytes: int = 0,
+        store: Optional[Any] = None
+    ):
         """
         初始化对话历史管理器
-        
+
         Args:
-            max_history_length: 最大历史记录长度，超过后会自动裁剪
+            max_history_length: 每个客户端的最大历史记录长度，超过后丢弃最早的消息
+            idle_ttl: 客户端空闲过期时间（秒），0表示不过期
+            max_memory_bytes: 全部对话历史的内存上限（字节），0表示不限制
+            store: 状态存储（storage.state_store.StateStore），为空时只保存在本进程
         """
-        self.conversations: Dict[str, List[Dict[str, Any]]] = {}
+        self.conversations: "OrderedDict[str, _ClientConversation]" = OrderedDict()
         self.max_history_length = max_history_length
-    
+        self.idle_ttl = idle_ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.store = store
+        self.total_size = 0
+        self.evictions = 0
+
+    def _touch(self, client_id: str, create: bool = False) -> Optional[_ClientConversation]:
+        """获取本进程中客户端的对话记录并标记为最近使用"""
+        conversation = self.conversations.get(client_id)
+        if conversation is None:
+            if not create:
+                return None
+            conversation = _ClientConversation(self.max_history_length)
+            self.conversations[client_id] = conversation
+        else:
+            self.conversations.move_to_end(client_id)
+        conversation.last_active = time.monotonic()
+        return conversation
+
+    def _needs_refresh(self, client_id: str) -> bool:
+        """本进程的副本是否需要从状态存储重新加载"""
+        if self.store is None:
+            return False
+        conversation = self.conversations.get(client_id)
+        return conversation is None or time.monotonic() - conversation.loaded_at > self.store.cache_ttl
+
+    def _load(self, client_id: str, data: List[Any]) -> None:
+        """用状态存储中的消息列表替换本进程的副本"""
+        previous = self.conversations.get(client_id)
+        self._remove(client_id)
+        if not data:
+            return
+
+        conversation = _ClientConversation(self.max_history_length)
+        for item in data:
+            message = ConversationMessage.from_list(item)
+            if len(conversation.messages) == conversation.messages.maxlen:
+                conversation.size -= conversation.messages[0].size
+            conversation.messages.append(message)
+            conversation.size += message.size
+        if previous is not None:
+            conversation.last_active = previous.last_active
+        conversation.loaded_at = time.monotonic()
+        self.conversations[client_id] = conversation
+        self.total_size += conversation.size
+
+    def _refresh(self, client_id: str) -> None:
+        """本进程的副本过期时从状态存储重新加载，包含其他worker追加的消息"""
+        if self._needs_refresh(client_id):
+            self._load(client_id, self.store.get_list(self.STORE_PREFIX + client_id))
+
     def add_message(self, client_id: str, role: str, content: str, message_type: str = "text") -> None:
         """
         添加对话消息
-        
+
         Args:
             client_id: 客户端ID
             role: 角色（user, ai, system）
             content: 消息内容
             message_type: 消息类型（text, hint, error等）
         """
-        if client_id not in self.conversations:
-            self.conversations[client_id] = []
-        
-        message = {
-            "role": role,
-            "content": content,
-            "type": message_type,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        self.conversations[client_id].append(message)
-        
-        # 裁剪历史记录，保持在最大长度以内
-        if len(self.conversations[client_id]) > self.max_history_length:
-            self.conversations[client_id] = self.conversations[client_id][-self.max_history_length:]
-    
+        self.evict_idle()
+        # 只追加，不需要先从状态存储加载；新建的副本尚未加载，下次读取时从存储加载完整历史
+        conversation = self._touch(client_id, create=True)
+
+        message = ConversationMessage(role, content, message_type)
+        if len(conversation.messages) == conversation.messages.maxlen:
+            # deque已满，追加时会自动丢弃最早的消息
+            dropped = conversation.messages[0].size
+            conversation.size -= dropped
+            self.total_size -= dropped
+        conversation.messages.append(message)
+        conversation.size += message.size
+        self.total_size += message.size
+        if self.store is not None:
+            self.store.append(self.STORE_PREFIX + client_id, message.to_list(), max_length=self.max_history_length)
+
+        self._enforce_memory_limit(client_id)
+
+    def _enforce_memory_limit(self, current_client_id: str) -> None:
+        """超过内存上限时，从最近最少使用的客户端开始清除"""
+        if not self.max_memory_bytes:
+            return
+        while self.total_size > self.max_memory_bytes and self.conversations:
+            client_id = next(iter(self.conversations))
+            if client_id == current_client_id:
+                # 只剩当前客户端时，丢弃其最早的消息
+                conversation = self.conversations[client_id]
+                if len(conversation.messages) <= 1:
+                    break
+                dropped = conversation.messages.popleft().size
+                conversation.size -= dropped
+                self.total_size -= dropped
+                continue
+            self._remove(client_id)
+            self.evictions += 1
+
+    def evict_idle(self) -> List[str]:
+        """
+        清除超过空闲过期时间的客户端
+
+        Returns:
+            List[str]: 被清除的客户端ID列表
+        """
+        if not self.idle_ttl:
+            return []
+
+        deadline = time.monotonic() - self.idle_ttl
+        expired = []
+        # 按最近使用顺序排列，遇到未过期的客户端即可停止
+        for client_id, conversation in self.conversations.items():
+            if conversation.last_active > deadline:
+                break
+            expired.append(client_id)
+        for client_id in expired:
+            self._remove(client_id)
+        self.evictions += len(expired)
+        return expired
+
     def get_history(self, client_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         获取对话历史
-        
+
         Args:
             client_id: 客户端ID
             limit: 返回的最大消息数，None表示返回全部
-        
+
+        Returns:
+            List[Dict[str, Any]]: 对话历史列表，timestamp为Unix时间戳（秒）
+        """
+        self._refresh(client_id)
+        return self._history(client_id, limit)
+
+    def _history(self, client_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """将本进程的副本转换为对话历史列表"""
+        conversation = self._touch(client_id)
+        if conversation is None:
+            return []
+        messages = conversation.messages
+        if limit and len(messages) > limit:
+            start = len(messages) - limit
+            return [messages[i].to_dict() for i in range(start, len(messages))]
+        return [message.to_dict() for message in messages]
+
+    async def aget_history(self, client_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        异步获取对话历史，需要从状态存储加载时在线程池中读取，不阻塞事件循环
+
+        Args:
+            client_id: 客户端ID
+            limit: 返回的最大消息数，None表示返回全部
+
         Returns:
-            List[Dict[str, Any]]: 对话历史列表
+            List[Dict[str, Any]]: 对话历史列表，timestamp为Unix时间戳（秒）
         """
-        history = self.conversations.get(client_id, [])
-        if limit and len(history) > limit:
-            return history[-limit:]
-        return history
-    
+        if self._needs_refresh(client_id):
+            self._load(client_id, await self.store.aget_list(self.STORE_PREFIX + client_id))
+        return self._history(client_id, limit)
+
     def get_context(self, client_id: str, recent_messages: int = 5) -> str:
         """
         获取对话上下文，用于AI生成响应
-        
+
         Args:
             client_id: 客户端ID
             recent_messages: 最近的消息数，用于生成上下文
-        
+
         Returns:
             str: 格式化的对话上下文
         """
         history = self.get_history(client_id, recent_messages)
-        context = ""
-        
+        lines = []
+
         for message in history:
             if message["role"] == "user":
-                context += f"学生: {message['content']}\n"
+                lines.append(f"学生: {message['content']}")
             elif message["role"] == "ai":
-                context += f"老师: {message['content']}\n"
-        
-        return context.strip()
-    
+                lines.append(f"老师: {message['content']}")
+
+        return "\n".join(lines).strip()
+
+    def _remove(self, client_id: str) -> None:
+        """移除客户端并更新内存统计"""
+        conversation = self.conversations.pop(client_id, None)
+        if conversation is not None:
+            self.total_size -= conversation.size
+
     def clear_history(self, client_id: str) -> None:
         """
         清除对话历史
-        
+
         Args:
             client_id: 客户端ID
         """
-        if client_id in self.conversations:
-            del self.conversations[client_id]
-    
+        self._remove(client_id)
+        if self.store is not None:
+            self.store.delete(self.STORE_PREFIX + client_id)
+
     def remove_client(self, client_id: str) -> None:
         """
-        移除客户端的对话历史
-        
+        移除客户端在本进程中的对话历史副本，状态存储中的历史保留到过期，重连后仍可加载
+
         Args:
             client_id: 客户端ID
         """
-        self.clear_history(client_id)
-    
+        self._remove(client_id)
+
+    def flush(self) -> None:
+        """将尚未写入的对话历史写入状态存储"""
+        if self.store is not None:
+            self.store.flush()
+
     def get_client_count(self) -> int:
         """
         获取当前管理的客户端数量
-        
+
         Returns:
             int: 客户端数量
         """
         return len(self.conversations)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计数据
+
+        Returns:
+            Dict[str, int]: 客户端数、消息数、近似内存占用（字节）和被清除的客户端数
+        """
+        return {
+            "clients": len(self.conversations),
+            "messages": sum(len(c.messages) for c in self.conversations.values()),
+            "memory_bytes": self.total_size,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,167 @@
+import json
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 总线消息处理函数，参数为发布的消息
+BusHandler = Callable[[Dict[str, Any]], None]
+
+
+# 消息总线接口
+class MessageBus(ABC):
+    @abstractmethod
+    async def start(self, handler: BusHandler) -> None:
+        """
+        开始接收总线消息
+
+        Args:
+            handler: 消息处理函数，每条消息（包括本进程发布的）调用一次
+        """
+        pass
+
+    @abstractmethod
+    async def publish(self, message: Dict[str, Any]) -> None:
+        """
+        发布消息到所有订阅者
+
+        Args:
+            message: 可JSON序列化的消息
+        """
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        """停止接收消息并释放连接"""
+        pass
+
+
+class MemoryBroker:
+    """进程内的消息代理，多个MemoryMessageBus共享同一代理时可模拟多个worker"""
+
+    def __init__(self):
+        """初始化消息代理"""
+        self.subscribers: List[BusHandler] = []
+
+    def deliver(self, message: Dict[str, Any]) -> None:
+        """将消息分发给所有订阅者"""
+        for handler in list(self.subscribers):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.warning(f"处理总线消息失败: {str(e)}")
+
+
+# 进程内消息总线
+class MemoryMessageBus(MessageBus):
+    def __init__(self, broker: Optional[MemoryBroker] = None):
+        """
+        初始化进程内消息总线，主要用于测试
+
+        Args:
+            broker: 共享的消息代理，为空时创建独立的代理
+        """
+        self.broker = broker or MemoryBroker()
+        self._handler: Optional[BusHandler] = None
+
+    async def start(self, handler: BusHandler) -> None:
+        self._handler = handler
+        self.broker.subscribers.append(handler)
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        # 经过一次序列化，与跨进程总线的行为一致
+        self.broker.deliver(json.loads(json.dumps(message, ensure_ascii=False)))
+
+    async def close(self) -> None:
+        if self._handler in self.broker.subscribers:
+            self.broker.subscribers.remove(self._handler)
+        self._handler = None
+
+
+# Redis协议消息总线
+class RedisMessageBus(MessageBus):
+    def __init__(self, client: Any = None, url: Optional[str] = None, channel: str = "ws:bus"):
+        """
+        初始化Redis发布订阅总线，同一台机器的多个worker和多台服务器可共享
+
+        Args:
+            client: 兼容Redis协议的异步客户端（需支持publish和pubsub）
+            url: Redis连接地址，未提供client时使用
+            channel: 发布订阅频道
+        """
+        if client is None:
+            import redis.asyncio as redis
+
+            if not url:
+                raise ValueError("Redis连接地址未提供")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: BusHandler) -> None:
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen(handler))
+
+    async def _listen(self, handler: BusHandler) -> None:
+        """接收订阅消息，连接中断后重新订阅"""
+        while True:
+            try:
+                async for item in self._pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    data = item["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode("utf-8")
+                    try:
+                        handler(json.loads(data))
+                    except Exception as e:
+                        logger.warning(f"处理总线消息失败: {str(e)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"总线订阅中断，1秒后重新订阅: {str(e)}")
+                await asyncio.sleep(1)
+                try:
+                    await self._pubsub.subscribe(self.channel)
+                except Exception as resubscribe_error:
+                    logger.warning(f"重新订阅总线失败: {str(resubscribe_error)}")
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        await self.client.publish(self.channel, json.dumps(message, ensure_ascii=False))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            if hasattr(self._pubsub, "aclose"):
+                await self._pubsub.aclose()
+            self._pubsub = None
+
+
+def create_message_bus() -> Optional[MessageBus]:
+    """
+    按应用配置创建消息总线
+
+    Returns:
+        Optional[MessageBus]: 消息总线，配置为memory时返回None，消息只在本进程内发送
+    """
+    from config import settings
+
+    backend_name = settings.websocket_bus_backend.lower()
+    if backend_name == "memory":
+        return None
+    if backend_name == "redis":
+        return RedisMessageBus(url=settings.websocket_bus_redis_url, channel=settings.websocket_bus_channel)
+    raise ValueError(f"不支持的消息总线后端: {settings.websocket_bus_backend}")
@@ -0,0 +1,260 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Union
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 触发条件：字符串表示单个关键词，列表表示需同时出现的多个关键词
+Trigger = Union[str, Sequence[str]]
+
+
+class AhoCorasickAutomaton:
+    """
+    Aho–Corasick多模式匹配自动机
+
+    一次扫描文本即可找出所有出现的关键词，耗时与文本长度成正比，与关键词数量无关
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        构建自动机
+
+        Args:
+            keywords: 关键词集合
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+
+        for keyword in keywords:
+            if keyword:
+                self._add(keyword)
+        self._build_fail_links()
+
+    def _add(self, keyword: str) -> None:
+        """向字典树中插入关键词"""
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node].add(keyword)
+
+    def _build_fail_links(self) -> None:
+        """广度优先构建失配指针，并合并后缀节点的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] |= self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> Set[str]:
+        """
+        查找文本中出现的所有关键词
+
+        Args:
+            text: 待匹配文本
+
+        Returns:
+            Set[str]: 出现过的关键词集合
+        """
+        found: Set[str] = set()
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                found |= self._output[node]
+        return found
+
+
+class SocraticRule:
+    """苏格拉底式提示规则"""
+
+    __slots__ = ("priority", "pattern_id", "conditions", "hint_text")
+
+    def __init__(self, priority: int, pattern_id: str, triggers: Iterable[Trigger], hint_text: str):
+        """
+        初始化规则
+
+        Args:
+            priority: 优先级，数值越小越优先
+            pattern_id: 规则标识
+            triggers: 触发条件列表，任一条件满足即触发；单个字符串视为只有一个关键词
+            hint_text: 提示内容
+        """
+        if isinstance(triggers, str):
+            # 数据库中的trigger_keywords可能存为单个字符串，避免按字符逐个触发
+            triggers = [triggers]
+        self.priority = priority
+        self.pattern_id = pattern_id
+        self.conditions = [
+            (trigger.lower(),) if isinstance(trigger, str) else tuple(k.lower() for k in trigger)
+            for trigger in triggers
+        ]
+        self.hint_text = hint_text
+
+    def keywords(self) -> Set[str]:
+        """获取规则涉及的所有关键词"""
+        return {keyword for condition in self.conditions for keyword in condition}
+
+    def matches(self, found: Set[str]) -> bool:
+        """
+        判断规则是否被已匹配的关键词触发
+
+        Args:
+            found: 文本中出现的关键词集合
+
+        Returns:
+            bool: 是否触发
+        """
+        return any(all(keyword in found for keyword in condition) for condition in self.conditions)
+
+
+class SocraticRuleEngine:
+    """
+    苏格拉底式提示规则引擎
+
+    将所有规则的触发关键词编译为一个Aho–Corasick自动机，单次扫描步骤文本后
+    按优先级返回第一个满足条件的规则，结果与逐条if判断等价。
+    规则变更后标记为过期，下次匹配时自动重新加载；在事件循环中由后台线程加载，不阻塞匹配。
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[SocraticRule]] = None,
+        loader: Optional[Callable[[], List[SocraticRule]]] = None,
+        reload_interval: float = 0
+    ):
+        """
+        初始化规则引擎
+
+        Args:
+            rules: 初始规则列表
+            loader: 规则加载函数，重新加载时调用
+            reload_interval: 自动重新加载间隔（秒），0表示仅在标记过期时重新加载
+        """
+        self.loader = loader
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._rules: List[SocraticRule] = []
+        self._keyword_rules: Dict[str, List[SocraticRule]] = {}
+        self._automaton = AhoCorasickAutomaton([])
+        self._reload_task: Optional[asyncio.Task] = None
+        if rules is not None:
+            self.compile(rules)
+        # 有加载函数时，首次匹配前加载完整规则
+        self._stale = loader is not None
+
+    def compile(self, rules: List[SocraticRule]) -> None:
+        """
+        编译规则：按优先级排序并构建关键词索引和自动机
+
+        Args:
+            rules: 规则列表
+        """
+        ordered = sorted(rules, key=lambda rule: rule.priority)
+        keyword_rules: Dict[str, List[SocraticRule]] = {}
+        for rule in ordered:
+            for keyword in rule.keywords():
+                keyword_rules.setdefault(keyword, []).append(rule)
+
+        automaton = AhoCorasickAutomaton(keyword_rules.keys())
+        with self._lock:
+            self._rules = ordered
+            self._keyword_rules = keyword_rules
+            self._automaton = automaton
+            self._loaded_at = time.monotonic()
+            self._stale = False
+
+    def mark_stale(self) -> None:
+        """标记规则已变更，下次匹配前重新加载"""
+        self._stale = True
+
+    def reload(self) -> None:
+        """调用加载函数重新加载规则，加载失败时保留现有规则"""
+        if self.loader is None:
+            return
+        try:
+            self.compile(self.loader())
+            logger.info(f"提示规则已重新加载，共 {len(self._rules)} 条")
+        except Exception as e:
+            # 避免每次匹配都重试失败的加载
+            self._stale = False
+            self._loaded_at = time.monotonic()
+            logger.warning(f"重新加载提示规则失败: {str(e)}")
+
+    async def areload(self) -> None:
+        """在线程池中重新加载规则，避免加载函数的数据库查询阻塞事件循环"""
+        if self.loader is None:
+            return
+        await asyncio.to_thread(self.reload)
+
+    def _reload_if_needed(self) -> None:
+        """
+        规则过期或超过重新加载间隔时重新加载
+
+        在事件循环中调用时在后台线程加载，本次匹配仍使用现有规则；没有事件循环时直接加载
+        """
+        if self.loader is None:
+            return
+        if self._reload_task is not None and not self._reload_task.done():
+            return
+        expired = self.reload_interval > 0 and time.monotonic() - self._loaded_at > self.reload_interval
+        if not (self._stale or expired):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.reload()
+            return
+        self._reload_task = loop.create_task(self.areload())
+
+    def match(self, text: str) -> Optional[SocraticRule]:
+        """
+        匹配文本，返回优先级最高的触发规则
+
+        Args:
+            text: 解题步骤内容
+
+        Returns:
+            Optional[SocraticRule]: 触发的规则，没有匹配时返回None
+        """
+        self._reload_if_needed()
+
+        automaton = self._automaton
+        keyword_rules = self._keyword_rules
+        found = automaton.find_all(text.lower())
+        if not found:
+            return None
+
+        best: Optional[SocraticRule] = None
+        for keyword in found:
+            for rule in keyword_rules.get(keyword, ()):
+                if best is not None and rule.priority >= best.priority:
+                    # 同一关键词下的规则已按优先级排序
+                    break
+                if rule.matches(found):
+                    best = rule
+                    break
+        return best
+
+    def __len__(self) -> int:
+        return len(self._rules)
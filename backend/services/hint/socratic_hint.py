@@ -1,62 +1,123 @@
+import logging
+from typing import List
+from .rule_engine import SocraticRule, SocraticRuleEngine
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+# 内置规则：(规则标识, 触发条件, 提示内容)，按列表顺序决定优先级
+# 触发条件中的字符串为单个关键词，列表表示需同时出现的多个关键词
+BUILTIN_RULES = [
+    # 第一层：具体提示 - 针对特定操作（更具体的关键词先检查）
+    ("completing_square", ["配方法", "配方"], "配方过程中是否注意了常数项的处理？"),
+    ("factorization", ["因式分解", "分解因式"], "你用了什么因式分解方法？是否有其他分解方式？"),
+    ("combine_like_terms", ["合并同类项"], "你确定所有同类项都合并了吗？再检查一下系数。"),
+    ("normalize_coefficient", ["系数化为1", "除以"], "为什么要除以这个系数？是否可以乘以它的倒数？"),
+    ("auxiliary_line", ["辅助线", ["作", "线"]], "这条辅助线如何帮助你证明结论？是否还有其他可能的辅助线？"),
+    ("similar_congruent", ["相似", "全等"], "你是如何证明相似/全等的？是否符合相应的判定定理？"),
+    ("pythagorean", ["勾股定理", "毕达哥拉斯"], "你确定这个三角形是直角三角形吗？有没有其他方法可以验证？"),
+    ("area_volume", ["面积", "体积"], "你使用了什么面积/体积公式？是否适用于当前图形？"),
+    ("function_graph", ["函数", "图像"], "这个函数的定义域和值域是什么？图像有什么特征？"),
+    ("inequality", ["不等式", "不等"], "解不等式时是否注意了不等号的方向变化？"),
+    # 第二层：验证相关 - 针对验证操作
+    ("verification", ["检验", "验证"], "你是如何验证解的正确性的？是否考虑了所有可能的解？"),
+    # 第三层：基础操作 - 针对常见操作
+    ("define_variable", ["设未知数", "设x为", "假设"], "你为什么选择这个变量？是否有更简洁的设定方式？"),
+    ("transposition", ["移项"], "移项时是否考虑了符号变化？"),
+    ("solve_equation", ["解方程"], "你用了什么方法解方程？是否有更简便的方法？"),
+    ("calculation", ["计算", "算"], "你确定计算过程正确吗？可以再检查一遍吗？"),
+]
+
+
+def builtin_rules() -> List[SocraticRule]:
+    """
+    构建内置规则列表
+
+    返回:
+        List[SocraticRule]: 内置规则
+    """
+    return [
+        SocraticRule(priority, pattern_id, triggers, hint_text)
+        for priority, (pattern_id, triggers, hint_text) in enumerate(BUILTIN_RULES)
+    ]
+
+
+def load_rules() -> List[SocraticRule]:
+    """
+    加载内置规则和数据库中的HintRule规则，数据库规则优先级低于内置规则
+
+    返回:
+        List[SocraticRule]: 全部规则
+    """
+    from models.base import SessionLocal
+    from models.models import HintRule
+
+    rules = builtin_rules()
+    offset = len(rules)
+
+    db = SessionLocal()
+    try:
+        rows = db.query(HintRule).order_by(HintRule.id).all()
+    finally:
+        db.close()
+
+    for index, row in enumerate(rows):
+        if row.trigger_keywords:
+            rules.append(SocraticRule(offset + index, row.pattern_id, row.trigger_keywords, row.hint_text))
+    return rules
+
+
+def _watch_hint_rule_changes(engine: SocraticRuleEngine) -> None:
+    """HintRule表在本进程提交变更后，标记规则引擎过期"""
+    try:
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session, object_session
+        from models.models import HintRule
+    except Exception as e:
+        logger.warning(f"无法监听提示规则变更: {str(e)}")
+        return
+
+    def _flag_session(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info["hint_rules_changed"] = True
+
+    for event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(HintRule, event_name, _flag_session)
+
+    @event.listens_for(Session, "after_commit")
+    def _mark_engine_stale(session):
+        if session.info.pop("hint_rules_changed", False):
+            engine.mark_stale()
+
+
+def _create_rule_engine() -> SocraticRuleEngine:
+    """按应用配置创建规则引擎"""
+    from config import settings
+
+    engine = SocraticRuleEngine(
+        rules=builtin_rules(),
+        loader=load_rules,
+        reload_interval=settings.hint_rules_reload_interval
+    )
+    _watch_hint_rule_changes(engine)
+    return engine
+
+
+# 全局规则引擎实例
+rule_engine = _create_rule_engine()
+
+
 def generate_socratic_hint(step_content: str) -> str:
     """
     基于本地规则生成苏格拉底式提示
-    
+
     参数:
         step_content: 用户的解题步骤内容
-        
+
     返回:
         str: 生成的提示问题，如果没有匹配的规则则返回None
     """
-    step_text = step_content.lower()
-    
-    # 第一层：具体提示 - 针对特定操作（更具体的关键词先检查）
-    if '配方法' in step_text or '配方' in step_text:
-        return '配方过程中是否注意了常数项的处理？'
-    
-    if '因式分解' in step_text or '分解因式' in step_text:
-        return '你用了什么因式分解方法？是否有其他分解方式？'
-    
-    if '合并同类项' in step_text:
-        return '你确定所有同类项都合并了吗？再检查一下系数。'
-    
-    if '系数化为1' in step_text or '除以' in step_text:
-        return '为什么要除以这个系数？是否可以乘以它的倒数？'
-    
-    if '辅助线' in step_text or ('作' in step_text and '线' in step_text):
-        return '这条辅助线如何帮助你证明结论？是否还有其他可能的辅助线？'
-    
-    if '相似' in step_text or '全等' in step_text:
-        return '你是如何证明相似/全等的？是否符合相应的判定定理？'
-    
-    if '勾股定理' in step_text or '毕达哥拉斯' in step_text:
-        return '你确定这个三角形是直角三角形吗？有没有其他方法可以验证？'
-    
-    if '面积' in step_text or '体积' in step_text:
-        return '你使用了什么面积/体积公式？是否适用于当前图形？'
-    
-    if '函数' in step_text or '图像' in step_text:
-        return '这个函数的定义域和值域是什么？图像有什么特征？'
-    
-    if '不等式' in step_text or '不等' in step_text:
-        return '解不等式时是否注意了不等号的方向变化？'
-    
-    # 第二层：验证相关 - 针对验证操作
-    if '检验' in step_text or '验证' in step_text:
-        return '你是如何验证解的正确性的？是否考虑了所有可能的解？'
-    
-    # 第三层：基础操作 - 针对常见操作
-    if '设未知数' in step_text or '设x为' in step_text or '假设' in step_text:
-        return '你为什么选择这个变量？是否有更简洁的设定方式？'
-    
-    if '移项' in step_text:
-        return '移项时是否考虑了符号变化？'
-    
-    if '解方程' in step_text:
-        return '你用了什么方法解方程？是否有更简便的方法？'
-    
-    if '计算' in step_text or '算' in step_text:
-        return '你确定计算过程正确吗？可以再检查一遍吗？'
-    
-    # 如果没有匹配的规则，返回None
-    return None
+    rule = rule_engine.match(step_content)
+    return rule.hint_text if rule else None
@@ -1,13 +1,311 @@
+import time
+import bisect
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
+
+from utils.id_generator import generate_session_id, ulid_bound
+
+
+class LearningStep:
+    """解题步骤，按紧凑的元组形式保存"""
+    
+    __slots__ = ("content", "timestamp", "time_spent", "hint_used", "error_type")
+    
+    def __init__(
+        self,
+        content: str,
+        timestamp: float,
+        time_spent: float,
+        hint_used: bool = False,
+        error_type: Optional[str] = None
+    ):
+        """
+        初始化解题步骤
+        
+        参数:
+            content: 步骤内容
+            timestamp: 提交时间（Unix时间戳，秒）
+            time_spent: 步骤耗时（秒）
+            hint_used: 是否使用了提示
+            error_type: 错误类型（如果有）
+        """
+        self.content = content
+        self.timestamp = timestamp
+        self.time_spent = time_spent
+        self.hint_used = hint_used
+        self.error_type = error_type
+    
+    def to_list(self) -> List[Any]:
+        """转换为紧凑的列表，用于持久化"""
+        return [self.content, self.timestamp, self.time_spent, self.hint_used, self.error_type]
+    
+    @classmethod
+    def from_list(cls, data: List[Any]) -> "LearningStep":
+        """由to_list的结果恢复步骤"""
+        return cls(*data)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典
+        
+        返回:
+            Dict[str, Any]: 包含content、timestamp（datetime）、time_spent、hint_used和error_type的字典
+        """
+        return {
+            "content": self.content,
+            "timestamp": datetime.fromtimestamp(self.timestamp),
+            "time_spent": self.time_spent,
+            "hint_used": self.hint_used,
+            "error_type": self.error_type,
+        }
+
+
+class LearningSession:
+    """
+    学习会话
+    
+    步骤耗时之和、错误类型计数等统计在添加步骤时累加，生成报告时不需要遍历步骤
+    """
+    
+    __slots__ = (
+        "user_id", "problem_id", "problem_content", "start_time", "end_time", "steps",
+        "hint_count", "error_count", "total_time", "step_time_total", "error_types", "last_active"
+    )
+    
+    def __init__(self, user_id: str, problem_id: str, problem_content: str, start_time: Optional[float] = None):
+        """
+        初始化学习会话
+        
+        参数:
+            user_id: 用户ID
+            problem_id: 问题ID
+            problem_content: 问题内容
+            start_time: 开始时间（Unix时间戳，秒），默认为当前时间
+        """
+        self.user_id = user_id
+        self.problem_id = problem_id
+        self.problem_content = problem_content
+        self.start_time = time.time() if start_time is None else start_time
+        self.end_time: Optional[float] = None
+        self.steps: List[LearningStep] = []
+        self.hint_count = 0
+        self.error_count = 0
+        self.total_time = 0.0
+        self.step_time_total = 0.0
+        self.error_types: Dict[str, int] = {}
+        # 本进程最近一次访问的时间，用于清除空闲会话，不持久化
+        self.last_active = time.monotonic()
+    
+    def add_step(self, content: str, hint_used: bool = False, error_type: Optional[str] = None) -> LearningStep:
+        """
+        添加解题步骤并累加统计
+        
+        参数:
+            content: 步骤内容
+            hint_used: 是否使用了提示
+            error_type: 错误类型（如果有）
+            
+        返回:
+            LearningStep: 新添加的步骤
+        """
+        now = time.time()
+        previous = self.steps[-1].timestamp if self.steps else self.start_time
+        step = LearningStep(content, now, now - previous, hint_used, error_type)
+        self.steps.append(step)
+        
+        self.step_time_total += step.time_spent
+        if hint_used:
+            self.hint_count += 1
+        if error_type:
+            self.error_count += 1
+            self.error_types[error_type] = self.error_types.get(error_type, 0) + 1
+        return step
+    
+    def end(self) -> None:
+        """结束会话，记录总耗时"""
+        self.end_time = time.time()
+        self.total_time = self.end_time - self.start_time
+    
+    @property
+    def avg_step_time(self) -> float:
+        """平均步骤耗时（秒）"""
+        return self.step_time_total / len(self.steps) if self.steps else 0
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        获取会话的统计信息，不包含步骤，耗时与步骤数无关
+        
+        返回:
+            Dict[str, Any]: 会话统计信息，时间字段为datetime
+        """
+        return {
+            "user_id": self.user_id,
+            "problem_id": self.problem_id,
+            "problem_content": self.problem_content,
+            "start_time": datetime.fromtimestamp(self.start_time),
+            "end_time": datetime.fromtimestamp(self.end_time) if self.end_time is not None else None,
+            "step_count": len(self.steps),
+            "hint_count": self.hint_count,
+            "error_count": self.error_count,
+            "total_time": self.total_time,
+            "avg_step_time": self.avg_step_time,
+            "error_types": dict(self.error_types),
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为包含步骤的字典
+        
+        返回:
+            Dict[str, Any]: 会话数据，steps为步骤字典列表
+        """
+        data = self.summary()
+        data["steps"] = [step.to_dict() for step in self.steps]
+        return data
+    
+    def to_state(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的紧凑形式，用于持久化"""
+        return {
+            "user_id": self.user_id,
+            "problem_id": self.problem_id,
+            "problem_content": self.problem_content,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "steps": [step.to_list() for step in self.steps],
+            "hint_count": self.hint_count,
+            "error_count": self.error_count,
+            "total_time": self.total_time,
+            "step_time_total": self.step_time_total,
+            "error_types": self.error_types,
+        }
+    
+    @classmethod
+    def from_state(cls, data: Dict[str, Any]) -> "LearningSession":
+        """由to_state的结果恢复会话"""
+        session = cls(data["user_id"], data["problem_id"], data["problem_content"], data["start_time"])
+        session.end_time = data["end_time"]
+        session.steps = [LearningStep.from_list(item) for item in data["steps"]]
+        session.hint_count = data["hint_count"]
+        session.error_count = data["error_count"]
+        session.total_time = data["total_time"]
+        session.step_time_total = data["step_time_total"]
+        session.error_types = dict(data["error_types"])
+        return session
+
 
 class LearningTracker:
     """
     学习跟踪器，用于记录用户的学习过程数据
+    
+    会话ID为按创建时间排序的ULID，按用户维护有序的会话ID索引，
+    获取用户会话（包括按时间范围获取）时不需要遍历全部会话；
+    统计数据在添加步骤时累加，生成报告的耗时与步骤数无关。
+    超过idle_ttl未访问的会话会从本进程清除；会话数超过max_sessions时，按最近最少使用顺序清除。
+    配置了状态存储时，会话数据同时写入存储，修改会话前从存储重新读取，被清除的会话下次访问时从存储加载；
+    用户的会话ID追加到存储中的列表，多个worker同时开始会话不会丢失会话ID
     """
     
-    def __init__(self):
-        self.learning_sessions: Dict[str, dict] = {}
+    # 状态存储中的键前缀：会话数据整体保存为一个值，用户的会话ID保存为一个只追加的列表
+    SESSION_PREFIX = "learning_session:"
+    USER_PREFIX = "learning_user:"
+    
+    def __init__(self, store: Optional[Any] = None, idle_ttl: float = 0, max_sessions: int = 0):
+        """
+        初始化学习跟踪器
+        
+        参数:
+            store: 状态存储（storage.state_store.StateStore），为空时只保存在本进程
+            idle_ttl: 会话空闲过期时间（秒），0表示不过期
+            max_sessions: 本进程保留的最大会话数，0表示不限制
+        """
+        self.learning_sessions: "OrderedDict[str, LearningSession]" = OrderedDict()
+        self.user_sessions: Dict[str, List[str]] = {}
+        self.store = store
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.evictions = 0
+    
+    def _remember(self, session_id: str, session: LearningSession) -> None:
+        """将会话保存到本进程并标记为最近使用，超过最大会话数时清除最近最少使用的会话"""
+        self.learning_sessions[session_id] = session
+        self._touch(session_id, session)
+        if self.max_sessions:
+            while len(self.learning_sessions) > self.max_sessions:
+                self._remove(next(iter(self.learning_sessions)))
+                self.evictions += 1
+    
+    def _touch(self, session_id: str, session: LearningSession) -> None:
+        """标记会话为最近使用"""
+        self.learning_sessions.move_to_end(session_id)
+        session.last_active = time.monotonic()
+    
+    def _remove(self, session_id: str) -> None:
+        """从本进程移除会话及其在用户索引中的ID"""
+        session = self.learning_sessions.pop(session_id, None)
+        if session is None:
+            return
+        session_ids = self.user_sessions.get(session.user_id)
+        if session_ids:
+            index = bisect.bisect_left(session_ids, session_id)
+            if index < len(session_ids) and session_ids[index] == session_id:
+                del session_ids[index]
+            if not session_ids:
+                del self.user_sessions[session.user_id]
+    
+    def evict_idle(self) -> List[str]:
+        """
+        清除超过空闲过期时间的会话
+        
+        返回:
+            List[str]: 被清除的会话ID列表
+        """
+        if not self.idle_ttl:
+            return []
+        
+        deadline = time.monotonic() - self.idle_ttl
+        expired = []
+        # 按最近使用顺序排列，遇到未过期的会话即可停止
+        for session_id, session in self.learning_sessions.items():
+            if session.last_active > deadline:
+                break
+            expired.append(session_id)
+        for session_id in expired:
+            self._remove(session_id)
+        self.evictions += len(expired)
+        return expired
+    
+    def _save(self, session_id: str, session: LearningSession) -> None:
+        """将会话数据写入状态存储"""
+        if self.store is not None:
+            self.store.set(self.SESSION_PREFIX + session_id, session.to_state())
+    
+    def _load(self, session_id: str, refresh: bool = False) -> Optional[LearningSession]:
+        """
+        从本进程或状态存储获取会话数据
+        
+        参数:
+            session_id: 会话ID
+            refresh: 为True时从状态存储重新读取，获取其他worker的修改
+        """
+        self.evict_idle()
+        session = self.learning_sessions.get(session_id)
+        if (session is None or refresh) and self.store is not None:
+            data = self.store.get(self.SESSION_PREFIX + session_id, refresh=refresh)
+            if data is not None:
+                session = LearningSession.from_state(data)
+                self._remember(session_id, session)
+                return session
+        if session is not None:
+            self._touch(session_id, session)
+        return session
+    
+    def _require(self, session_id: str) -> LearningSession:
+        """获取最新的会话数据用于修改，不存在时抛出ValueError"""
+        session = self._load(session_id, refresh=True)
+        if session is None:
+            raise ValueError(f"会话ID不存在: {session_id}")
+        return session
     
     def start_session(self, user_id: str, problem_id: str, problem_content: str) -> str:
         """
@@ -21,21 +319,24 @@ class LearningTracker:
         返回:
             str: 会话ID
         """
-        session_id = f"{user_id}_{problem_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        self.learning_sessions[session_id] = {
-            "user_id": user_id,
-            "problem_id": problem_id,
-            "problem_content": problem_content,
-            "start_time": datetime.now(),
-            "end_time": None,
-            "steps": [],
-            "hint_count": 0,
-            "error_count": 0,
-            "total_time": 0
-        }
+        self.evict_idle()
+        session_id = generate_session_id()
+        session = LearningSession(user_id, problem_id, problem_content)
+        self.user_sessions.setdefault(user_id, []).append(session_id)
+        self._remember(session_id, session)
+        self._save(session_id, session)
+        if self.store is not None:
+            self.store.append(self.USER_PREFIX + user_id, session_id)
         return session_id
     
-    def add_step(self, session_id: str, step_content: str, hint_used: bool = False, error_type: Optional[str] = None) -> dict:
+    def add_step(
+        self,
+        session_id: str,
+        step_content: str,
+        hint_used: bool = False,
+        error_type: Optional[str] = None,
+        include_steps: bool = True
+    ) -> dict:
         """
         添加解题步骤
         
@@ -44,42 +345,15 @@ class LearningTracker:
             step_content: 步骤内容
             hint_used: 是否使用了提示
             error_type: 错误类型（如果有）
+            include_steps: 是否包含步骤列表，为False时只返回统计信息，耗时与步骤数无关
             
         返回:
             dict: 更新后的会话数据
         """
-        if session_id not in self.learning_sessions:
-            raise ValueError(f"会话ID不存在: {session_id}")
-        
-        session = self.learning_sessions[session_id]
-        
-        # 计算步骤耗时
-        current_time = datetime.now()
-        if session["steps"]:
-            prev_step_time = session["steps"][-1]["timestamp"]
-            step_time = (current_time - prev_step_time).total_seconds()
-        else:
-            step_time = (current_time - session["start_time"]).total_seconds()
-        
-        # 添加步骤
-        step = {
-            "content": step_content,
-            "timestamp": current_time,
-            "time_spent": step_time,
-            "hint_used": hint_used,
-            "error_type": error_type
-        }
-        
-        session["steps"].append(step)
-        
-        # 更新统计数据
-        if hint_used:
-            session["hint_count"] += 1
-        
-        if error_type:
-            session["error_count"] += 1
-        
-        return session
+        session = self._require(session_id)
+        session.add_step(step_content, hint_used, error_type)
+        self._save(session_id, session)
+        return session.to_dict() if include_steps else session.summary()
     
     def end_session(self, session_id: str) -> dict:
         """
@@ -91,14 +365,10 @@ class LearningTracker:
         返回:
             dict: 完整的会话数据
         """
-        if session_id not in self.learning_sessions:
-            raise ValueError(f"会话ID不存在: {session_id}")
-        
-        session = self.learning_sessions[session_id]
-        session["end_time"] = datetime.now()
-        session["total_time"] = (session["end_time"] - session["start_time"]).total_seconds()
-        
-        return session
+        session = self._require(session_id)
+        session.end()
+        self._save(session_id, session)
+        return session.to_dict()
     
     def get_session(self, session_id: str) -> Optional[dict]:
         """
@@ -110,63 +380,74 @@ class LearningTracker:
         返回:
             dict: 会话数据，如果不存在则返回None
         """
-        return self.learning_sessions.get(session_id)
+        session = self._load(session_id)
+        return session.to_dict() if session is not None else None
     
-    def get_user_sessions(self, user_id: str) -> List[dict]:
+    def get_user_sessions(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[dict]:
         """
-        获取用户的所有会话
+        获取用户的会话，按开始时间排序
         
         参数:
             user_id: 用户ID
+            since: 起始时间（包含），为空时不限制
+            until: 结束时间（包含），为空时不限制
             
         返回:
-            List[dict]: 用户的所有会话数据
+            List[dict]: 用户的会话数据
         """
-        return [session for session in self.learning_sessions.values() if session["user_id"] == user_id]
+        if self.store is not None:
+            # 多个worker追加的顺序可能交错，按ID排序即按创建时间排序
+            session_ids = sorted(self.store.get_list(self.USER_PREFIX + user_id))
+        else:
+            session_ids = self.user_sessions.get(user_id, [])
+        
+        start = bisect.bisect_left(session_ids, ulid_bound(since)) if since is not None else 0
+        end = bisect.bisect_right(session_ids, ulid_bound(until, upper=True)) if until is not None else len(session_ids)
+        sessions = [self._load(session_id) for session_id in session_ids[start:end]]
+        return [session.to_dict() for session in sessions if session is not None]
     
-    def generate_report(self, session_id: str) -> dict:
+    def generate_report(self, session_id: str, include_steps: bool = True) -> dict:
         """
         生成学习报告
         
         参数:
             session_id: 会话ID
+            include_steps: 是否包含步骤列表，为False时耗时与步骤数无关
             
         返回:
             dict: 学习报告
         """
-        session = self.get_session(session_id)
-        if not session:
-            raise ValueError(f"会话ID不存在: {session_id}")
-        
-        # 分析错误类型
-        error_types = {}
-        for step in session["steps"]:
-            if step["error_type"]:
-                error_types[step["error_type"]] = error_types.get(step["error_type"], 0) + 1
-        
-        # 计算平均步骤时间
-        if session["steps"]:
-            avg_step_time = sum(step["time_spent"] for step in session["steps"]) / len(session["steps"])
-        else:
-            avg_step_time = 0
-        
-        # 生成报告
-        report = {
-            "user_id": session["user_id"],
-            "problem_id": session["problem_id"],
-            "problem_content": session["problem_content"],
-            "start_time": session["start_time"].isoformat(),
-            "end_time": session["end_time"].isoformat() if session["end_time"] else None,
-            "total_time": session["total_time"],
-            "step_count": len(session["steps"]),
-            "hint_count": session["hint_count"],
-            "error_count": session["error_count"],
-            "avg_step_time": avg_step_time,
-            "error_types": error_types,
-            "steps": session["steps"]
-        }
+        session = self._require(session_id)
         
+        report = session.summary()
+        report["start_time"] = report["start_time"].isoformat()
+        report["end_time"] = report["end_time"].isoformat() if report["end_time"] else None
+        if include_steps:
+            report["steps"] = [step.to_dict() for step in session.steps]
         return report
 
+    def flush(self) -> None:
+        """将尚未写入的学习数据写入状态存储"""
+        if self.store is not None:
+            self.store.flush()
+
+
+def _create_learning_tracker() -> LearningTracker:
+    """按应用配置创建学习跟踪器"""
+    from config import settings
+    from storage.state_store import create_state_store
+
+    return LearningTracker(
+        store=create_state_store(ttl=settings.learning_session_ttl),
+        idle_ttl=settings.learning_idle_ttl,
+        max_sessions=settings.learning_max_sessions,
+    )
+
+
 # 创建全局学习跟踪器实例
-learning_tracker = LearningTracker()
+learning_tracker = _create_learning_tracker()
@@ -1,7 +1,8 @@
 # Prompt工程模块
 from .prompt_manager import PromptManager
+from .context_builder import HintContextBuilder, estimate_tokens, truncate_to_tokens
 
 # 创建Prompt管理器实例
 prompt_manager = PromptManager()
 
-__all__ = ["prompt_manager", "PromptManager"]
+__all__ = ["prompt_manager", "PromptManager", "HintContextBuilder", "estimate_tokens", "truncate_to_tokens"]
@@ -0,0 +1,200 @@
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+# 中日韩文字及全角符号，每个字符按1个token估算
+_CJK_CHARS = "\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef"
+_CJK_PATTERN = re.compile(f"[{_CJK_CHARS}]")
+
+# 估算时把文本切分为：单个中文字符、连续的英文字母、连续的空格、其他单个字符
+_SEGMENT_PATTERN = re.compile(f"[{_CJK_CHARS}]|[A-Za-z]+|[^\\S\\n]+|.", re.DOTALL)
+
+# 连续英文字母按3个字母1个token估算；数字、运算符、标点和换行按每个字符1个token估算，
+# 公式如x^2-2x+1=0在常见分词器中几乎逐字符切分，按字符计数才不会低估；
+# 空格通常与后一个词合并，不单独计数
+_LETTERS_PER_TOKEN = 3
+
+# 对话角色在提示中的称呼
+ROLE_LABELS = {
+    "user": "学生",
+    "ai": "老师",
+}
+
+
+def _segment_tokens(segment: str) -> int:
+    """估算单个切分片段的token数"""
+    if segment[0].isspace() and segment[0] != "\n":
+        return 0
+    if segment[0].isascii() and segment[0].isalpha():
+        return math.ceil(len(segment) / _LETTERS_PER_TOKEN)
+    return 1
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数，不依赖具体模型的分词器，估算值偏保守（不低于常见分词器的结果）
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    return sum(_segment_tokens(segment) for segment in _SEGMENT_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, suffix: str = "…") -> str:
+    """
+    截断文本，使估算的token数不超过上限
+
+    Args:
+        text: 输入文本
+        max_tokens: token上限
+        suffix: 截断后追加的后缀
+
+    Returns:
+        str: 截断后的文本，上限不足以容纳后缀时返回空字符串
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max_tokens - estimate_tokens(suffix)
+    if limit <= 0:
+        return ""
+
+    # 按估算规则累加，找到不超过上限的最长前缀
+    cost = 0
+    end = 0
+    for match in _SEGMENT_PATTERN.finditer(text):
+        segment = match.group()
+        segment_cost = _segment_tokens(segment)
+        if cost + segment_cost > limit:
+            if segment[0].isascii() and segment[0].isalpha():
+                # 较长的单词截取能放下的部分
+                end += (limit - cost) * _LETTERS_PER_TOKEN
+            break
+        cost += segment_cost
+        end = match.end()
+    return text[:end] + suffix
+
+
+class HintContextBuilder:
+    """
+    提示上下文构建器，在token预算内组合题目、最近的对话和当前解题步骤
+
+    优先保证当前步骤（至少保留min_step_tokens），其次是题目，剩余预算从最新的对话开始逐条放入；
+    放不下或超过保留轮数的较早对话压缩为一行摘要，预算不足时直接省略，
+    保证每次请求的提示长度有上限
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 1024,
+        max_question_tokens: int = 256,
+        max_turns: int = 6,
+        summary_tokens: int = 64,
+        min_step_tokens: int = 64
+    ):
+        """
+        初始化上下文构建器
+
+        Args:
+            max_prompt_tokens: 单次请求的提示token上限（含系统提示）
+            max_question_tokens: 题目内容的token上限
+            max_turns: 完整保留的最近消息数，更早的消息压缩为摘要
+            summary_tokens: 较早对话摘要的token上限
+            min_step_tokens: 当前步骤至少保留的token数，预留内容占满预算时也不会丢弃当前步骤
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_question_tokens = max_question_tokens
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.min_step_tokens = min_step_tokens
+
+    @staticmethod
+    def _format_turn(message: Dict[str, Any]) -> Optional[str]:
+        """将对话消息格式化为一行，非学生和老师的消息返回None"""
+        label = ROLE_LABELS.get(message.get("role"))
+        if label is None or not message.get("content"):
+            return None
+        content = " ".join(str(message["content"]).split())
+        return f"{label}: {content}"
+
+    def _summarize(self, turns: List[str], max_tokens: int) -> Optional[str]:
+        """将较早的对话压缩为一行摘要，每条只保留开头部分"""
+        max_tokens = min(max_tokens, self.summary_tokens)
+        prefix = f"（更早的{len(turns)}条对话摘要）"
+        remaining = max_tokens - estimate_tokens(prefix + "\n")
+        if remaining <= 0:
+            return None
+        per_turn = max(8, remaining // len(turns))
+        summary = "；".join(truncate_to_tokens(turn, per_turn) for turn in turns)
+        summary = truncate_to_tokens(summary, remaining)
+        return prefix + summary if summary else None
+
+    def build(
+        self,
+        step_content: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        question: Optional[str] = None,
+        reserved_tokens: int = 0
+    ) -> str:
+        """
+        构建提示请求的用户提示
+
+        Args:
+            step_content: 学生当前的解题步骤
+            history: 对话历史（按时间顺序，包含role和content），不含当前步骤
+            question: 题目内容
+            reserved_tokens: 预留给系统提示等固定内容的token数
+
+        Returns:
+            str: 用户提示，估算token数加上reserved_tokens不超过max_prompt_tokens；
+                预算不足以容纳min_step_tokens时仍保留当前步骤，题目和对话省略
+        """
+        instruction = "请提出一个引导性问题。"
+        header = "之前的对话：\n"
+        turns = [line for line in (self._format_turn(m) for m in history or []) if line]
+        budget = self.max_prompt_tokens - reserved_tokens - estimate_tokens(instruction)
+
+        # 有题目或对话时，当前步骤最多占一半预算，但不少于min_step_tokens
+        step_label = "学生当前的解题步骤：" if turns else "学生的解题步骤："
+        step_budget = budget // 2 if turns or question else budget
+        step_budget = max(step_budget, self.min_step_tokens + estimate_tokens(step_label) + 1)
+        step_line = truncate_to_tokens(step_label + step_content, step_budget - 1) + "\n"
+        budget -= estimate_tokens(step_line)
+
+        question_line = ""
+        if question:
+            question_line = truncate_to_tokens(
+                "题目：" + " ".join(question.split()), min(self.max_question_tokens, budget) - 1
+            )
+            if question_line:
+                question_line += "\n"
+                budget -= estimate_tokens(question_line)
+
+        if not turns or budget <= estimate_tokens(header):
+            return question_line + step_line + instruction
+        budget -= estimate_tokens(header)
+
+        # 从最新的消息开始放入完整对话
+        recent: List[str] = []
+        index = len(turns)
+        while index > 0 and len(recent) < self.max_turns:
+            line = turns[index - 1] + "\n"
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            recent.append(line)
+            budget -= cost
+            index -= 1
+        recent.reverse()
+
+        # 较早的对话压缩为摘要
+        summary = self._summarize(turns[:index], budget - 1) if index > 0 else None
+        if summary:
+            recent.insert(0, summary + "\n")
+        if not recent:
+            return question_line + step_line + instruction
+        return question_line + header + "".join(recent) + step_line + instruction
@@ -0,0 +1,4 @@
+# 题库缓存模块
+from .question_cache import QuestionBankCache, question_cache
+
+__all__ = ["question_cache", "QuestionBankCache"]
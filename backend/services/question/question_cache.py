@@ -0,0 +1,290 @@
+import json
+import time
+import asyncio
+import bisect
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 难度等级与题目难度的对应关系：1初级（1-2），2中级（3），3高级（4-5）
+DIFFICULTY_LEVELS: Dict[int, Tuple[int, ...]] = {
+    1: (1, 2),
+    2: (3,),
+    3: (4, 5),
+}
+
+
+class QuestionBankSnapshot:
+    """题库快照，加载后只读，更新时整体替换"""
+
+    __slots__ = ("questions", "ordered_ids", "level_ids", "tags", "tag_index", "etag", "loaded_at")
+
+    def __init__(self, questions: Dict[int, Dict[str, Any]]):
+        """
+        根据题目数据构建索引
+
+        Args:
+            questions: 题目ID到题目数据的映射
+        """
+        self.questions = questions
+        self.ordered_ids: List[int] = sorted(questions)
+
+        self.level_ids: Dict[int, List[int]] = {
+            level: [qid for qid in self.ordered_ids if questions[qid]["difficulty"] in difficulties]
+            for level, difficulties in DIFFICULTY_LEVELS.items()
+        }
+
+        # 标签 -> 题目ID的倒排索引
+        self.tag_index: Dict[str, Set[int]] = {}
+        for qid in self.ordered_ids:
+            for tag in questions[qid]["tags"]:
+                self.tag_index.setdefault(tag, set()).add(qid)
+        self.tags: List[str] = sorted(self.tag_index)
+
+        # 内容摘要作为ETag，多个worker加载相同数据时ETag一致
+        digest = hashlib.sha1(
+            json.dumps([questions[qid] for qid in self.ordered_ids], ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        self.etag = f'"{digest[:20]}"'
+        self.loaded_at = time.monotonic()
+
+    def query(
+        self,
+        difficulty: Optional[int] = None,
+        tags: Optional[List[str]] = None,
+        limit: int = 10,
+        cursor: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], int, Optional[int]]:
+        """
+        按难度和标签筛选题目，按ID游标分页
+
+        Args:
+            difficulty: 难度等级（1初级，2中级，3高级）
+            tags: 标签列表，匹配任一标签即可
+            limit: 返回数量限制
+            cursor: 分页游标，返回ID大于该值的题目
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int, Optional[int]]: 本页题目、符合条件的总数、下一页游标
+        """
+        ids = self.level_ids.get(difficulty, self.ordered_ids)
+        if tags:
+            tagged: Set[int] = set()
+            for tag in tags:
+                tagged |= self.tag_index.get(tag, set())
+            ids = [qid for qid in ids if qid in tagged]
+
+        start = bisect.bisect_right(ids, cursor) if cursor is not None else 0
+        page_ids = ids[start:start + limit]
+        next_cursor = page_ids[-1] if page_ids and len(page_ids) == limit else None
+
+        return [self.questions[qid] for qid in page_ids], len(ids), next_cursor
+
+
+class QuestionBankCache:
+    """
+    题库读穿透缓存
+
+    首次访问时一次性加载全部题目和标签，构建标签倒排索引；
+    题库变更后失效，下次访问时重新加载。并发访问时只有一个请求加载，其余请求等待并共享结果
+    """
+
+    def __init__(self, ttl: float = 0):
+        """
+        初始化题库缓存
+
+        Args:
+            ttl: 缓存有效期（秒），用于感知其他进程的修改，0表示仅在显式失效时重新加载
+        """
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot: Optional[QuestionBankSnapshot] = None
+        self._lock = threading.Lock()
+        # 异步加载锁，按事件循环创建
+        self._async_lock: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = None
+
+    @staticmethod
+    def _select_questions():
+        """构建加载全部题目及其标签的查询"""
+        from sqlalchemy import select
+        from sqlalchemy.orm import selectinload
+        from models.models import Question
+
+        return select(Question).options(selectinload(Question.tags))
+
+    @staticmethod
+    def _serialize(questions) -> Dict[int, Dict[str, Any]]:
+        """将题目对象转换为题目ID到题目数据的映射"""
+        return {
+            q.id: {
+                "id": q.id,
+                "type": q.type.value if hasattr(q.type, "value") else str(q.type),
+                "content": q.content,
+                "difficulty": q.difficulty,
+                "solution": q.solution,
+                "hint_pattern": q.hint_pattern,
+                "tags": [question_tag.tag for question_tag in q.tags],
+            }
+            for q in questions
+        }
+
+    def _is_fresh(self, snapshot: Optional[QuestionBankSnapshot]) -> bool:
+        """判断快照是否可用"""
+        if snapshot is None:
+            return False
+        return self.ttl <= 0 or time.monotonic() - snapshot.loaded_at <= self.ttl
+
+    def _store(self, version: int, snapshot: QuestionBankSnapshot) -> QuestionBankSnapshot:
+        """保存新加载的快照，加载期间发生失效时不缓存，避免保存过期数据"""
+        if version == self.version:
+            self._snapshot = snapshot
+        logger.info(f"题库缓存已加载，共 {len(snapshot.questions)} 道题目")
+        return snapshot
+
+    def get_snapshot(self, db) -> QuestionBankSnapshot:
+        """
+        获取题库快照，缓存失效时从数据库重新加载
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            QuestionBankSnapshot: 题库快照
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                return snapshot
+
+            version = self.version
+            questions = db.execute(self._select_questions()).scalars().all()
+            return self._store(version, QuestionBankSnapshot(self._serialize(questions)))
+
+    async def aget_snapshot(self, db) -> QuestionBankSnapshot:
+        """
+        异步获取题库快照，缓存失效时通过异步会话重新加载
+
+        Args:
+            db: 异步数据库会话
+
+        Returns:
+            QuestionBankSnapshot: 题库快照
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        async with self._get_async_lock():
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                return snapshot
+
+            version = self.version
+            result = await db.execute(self._select_questions())
+            return self._store(version, QuestionBankSnapshot(self._serialize(result.scalars().all())))
+
+    def _get_async_lock(self) -> asyncio.Lock:
+        """获取当前事件循环的异步加载锁"""
+        loop = asyncio.get_running_loop()
+        if self._async_lock is None or self._async_lock[0] is not loop:
+            self._async_lock = (loop, asyncio.Lock())
+        return self._async_lock[1]
+
+    def invalidate(self) -> None:
+        """使缓存失效，下次访问时重新加载"""
+        self.version += 1
+        self._snapshot = None
+
+    def get_question(self, db, question_id: int) -> Optional[Dict[str, Any]]:
+        """
+        获取单个题目
+
+        Args:
+            db: 数据库会话
+            question_id: 题目ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 题目数据，不存在时返回None
+        """
+        return self.get_snapshot(db).questions.get(question_id)
+
+    def get_tags(self, db) -> List[str]:
+        """
+        获取所有知识点标签
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            List[str]: 标签列表
+        """
+        return self.get_snapshot(db).tags
+
+    def query(
+        self,
+        db,
+        difficulty: Optional[int] = None,
+        tags: Optional[List[str]] = None,
+        limit: int = 10,
+        cursor: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], int, Optional[int]]:
+        """
+        按难度和标签筛选题目，按ID游标分页
+
+        Args:
+            db: 数据库会话
+            difficulty: 难度等级（1初级，2中级，3高级）
+            tags: 标签列表，匹配任一标签即可
+            limit: 返回数量限制
+            cursor: 分页游标，返回ID大于该值的题目
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int, Optional[int]]: 本页题目、符合条件的总数、下一页游标
+        """
+        return self.get_snapshot(db).query(difficulty, tags, limit, cursor)
+
+
+def _watch_question_changes(cache: QuestionBankCache) -> None:
+    """题目或标签在本进程提交变更后，使题库缓存失效"""
+    try:
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session, object_session
+        from models.models import Question, QuestionTag
+    except Exception as e:
+        logger.warning(f"无法监听题库变更: {str(e)}")
+        return
+
+    def _flag_session(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info["question_bank_changed"] = True
+
+    for model in (Question, QuestionTag):
+        for event_name in ("after_insert", "after_update", "after_delete"):
+            event.listen(model, event_name, _flag_session)
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate_cache(session):
+        if session.info.pop("question_bank_changed", False):
+            cache.invalidate()
+
+
+def _create_question_cache() -> QuestionBankCache:
+    """按应用配置创建题库缓存"""
+    from config import settings
+
+    cache = QuestionBankCache(ttl=settings.question_cache_ttl)
+    _watch_question_changes(cache)
+    return cache
+
+
+# 全局题库缓存实例
+question_cache = _create_question_cache()
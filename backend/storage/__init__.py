@@ -1,3 +1,18 @@
-# Storage 模块已移除，相关功能已迁移到 endpoints.py
+# 状态存储模块
+from .state_store import (
+    StateStore,
+    StateStoreBackend,
+    MemoryStateStoreBackend,
+    SQLiteStateStoreBackend,
+    RedisStateStoreBackend,
+    create_state_store,
+)
 
-__all__ = []
+__all__ = [
+    "StateStore",
+    "StateStoreBackend",
+    "MemoryStateStoreBackend",
+    "SQLiteStateStoreBackend",
+    "RedisStateStoreBackend",
+    "create_state_store",
+]
@@ -0,0 +1,687 @@
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 本进程没有尚未提交的修改
+_MISSING = object()
+
+
+# 状态存储后端接口
+class StateStoreBackend(ABC):
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """
+        批量读取
+
+        Args:
+            keys: 键列表
+
+        Returns:
+            Dict[str, str]: 存在且未过期的键值
+        """
+        pass
+
+    @abstractmethod
+    def set_many(self, items: Dict[str, str], ttl: float = 0) -> None:
+        """
+        批量写入
+
+        Args:
+            items: 键值
+            ttl: 过期时间（秒），0表示不过期
+        """
+        pass
+
+    @abstractmethod
+    def delete_many(self, keys: List[str]) -> None:
+        """
+        批量删除，同时删除同名的列表
+
+        Args:
+            keys: 键列表
+        """
+        pass
+
+    @abstractmethod
+    def get_list(self, key: str) -> List[str]:
+        """
+        读取列表
+
+        Args:
+            key: 键
+
+        Returns:
+            List[str]: 按追加顺序排列的元素，不存在或已过期时返回空列表
+        """
+        pass
+
+    @abstractmethod
+    def append_many(self, items: Dict[str, List[str]], ttl: float = 0, max_length: int = 0) -> None:
+        """
+        批量向列表末尾追加元素，由后端原子完成，多个worker同时追加不会互相覆盖
+
+        Args:
+            items: 键和要追加的元素
+            ttl: 列表过期时间（秒），每次追加后重新计算，0表示不过期
+            max_length: 列表最大长度，超过后丢弃最早的元素，0表示不限制
+        """
+        pass
+
+
+# 进程内存储后端
+class MemoryStateStoreBackend(StateStoreBackend):
+    def __init__(self):
+        """初始化进程内存储，主要用于测试和单进程部署"""
+        self._data: Dict[str, Tuple[str, float]] = {}
+        self._lists: Dict[str, Tuple[List[str], float]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        now = time.time()
+        result = {}
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                if item[1] and item[1] <= now:
+                    del self._data[key]
+                    continue
+                result[key] = item[0]
+        return result
+
+    def set_many(self, items: Dict[str, str], ttl: float = 0) -> None:
+        expires_at = time.time() + ttl if ttl else 0
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires_at)
+
+    def delete_many(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._lists.pop(key, None)
+
+    def get_list(self, key: str) -> List[str]:
+        with self._lock:
+            item = self._lists.get(key)
+            if item is None:
+                return []
+            if item[1] and item[1] <= time.time():
+                del self._lists[key]
+                return []
+            return list(item[0])
+
+    def append_many(self, items: Dict[str, List[str]], ttl: float = 0, max_length: int = 0) -> None:
+        expires_at = time.time() + ttl if ttl else 0
+        with self._lock:
+            for key, values in items.items():
+                item = self._lists.get(key)
+                current = item[0] if item is not None and not (item[1] and item[1] <= time.time()) else []
+                current = current + list(values)
+                if max_length:
+                    current = current[-max_length:]
+                self._lists[key] = (current, expires_at)
+
+
+# SQLite存储后端
+class SQLiteStateStoreBackend(StateStoreBackend):
+    def __init__(self, path: str = "./state.db"):
+        """
+        初始化SQLite存储，同一台机器上的多个worker可共享同一文件
+
+        Args:
+            path: 数据库文件路径
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state_store ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # 列表每个元素一行，追加即插入，多个worker同时追加不会互相覆盖
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state_list ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, "
+            "value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_state_list_key ON state_list (key, seq)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM state_store WHERE key IN ({placeholders}) "
+                "AND (expires_at = 0 OR expires_at > ?)",
+                (*keys, time.time()),
+            ).fetchall()
+        return dict(rows)
+
+    def set_many(self, items: Dict[str, str], ttl: float = 0) -> None:
+        expires_at = time.time() + ttl if ttl else 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO state_store (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()],
+            )
+            self._conn.commit()
+
+    def delete_many(self, keys: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM state_store WHERE key = ?", [(key,) for key in keys])
+            self._conn.executemany("DELETE FROM state_list WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+
+    def get_list(self, key: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value FROM state_list WHERE key = ? AND (expires_at = 0 OR expires_at > ?) ORDER BY seq",
+                (key, time.time()),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def append_many(self, items: Dict[str, List[str]], ttl: float = 0, max_length: int = 0) -> None:
+        expires_at = time.time() + ttl if ttl else 0
+        with self._lock:
+            # 在一个写事务中完成追加、续期和截断
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key, values in items.items():
+                    self._conn.execute(
+                        "DELETE FROM state_list WHERE key = ? AND expires_at != 0 AND expires_at <= ?",
+                        (key, time.time()),
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO state_list (key, value, expires_at) VALUES (?, ?, ?)",
+                        [(key, value, expires_at) for value in values],
+                    )
+                    self._conn.execute("UPDATE state_list SET expires_at = ? WHERE key = ?", (expires_at, key))
+                    if max_length:
+                        self._conn.execute(
+                            "DELETE FROM state_list WHERE key = ? AND seq <= ("
+                            "SELECT seq FROM state_list WHERE key = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                            (key, key, max_length),
+                        )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def purge_expired(self) -> int:
+        """
+        删除已过期的记录
+
+        Returns:
+            int: 删除的记录数
+        """
+        with self._lock:
+            now = time.time()
+            cursor = self._conn.execute(
+                "DELETE FROM state_store WHERE expires_at != 0 AND expires_at <= ?", (now,)
+            )
+            deleted = cursor.rowcount
+            cursor = self._conn.execute(
+                "DELETE FROM state_list WHERE expires_at != 0 AND expires_at <= ?", (now,)
+            )
+            self._conn.commit()
+            return deleted + cursor.rowcount
+
+
+# Redis协议存储后端
+class RedisStateStoreBackend(StateStoreBackend):
+    def __init__(self, client: Any = None, url: Optional[str] = None, prefix: str = "state:"):
+        """
+        初始化Redis存储，多台服务器可共享
+
+        Args:
+            client: 兼容Redis协议的客户端（需支持get/set/delete/rpush/lrange/ltrim/pexpire，支持pipeline时批量发送命令）
+            url: Redis连接地址，未提供client时使用
+            prefix: 键前缀
+        """
+        if client is None:
+            import redis
+
+            if not url:
+                raise ValueError("Redis连接地址未提供")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+
+    def _pipeline(self):
+        """支持pipeline时合并为一次往返，否则逐条执行"""
+        return self.client.pipeline() if hasattr(self.client, "pipeline") else None
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        pipeline = self._pipeline()
+        if pipeline is not None:
+            for key in keys:
+                pipeline.get(self.prefix + key)
+            values = pipeline.execute()
+        else:
+            values = [self.client.get(self.prefix + key) for key in keys]
+
+        result = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            result[key] = value.decode("utf-8") if isinstance(value, bytes) else value
+        return result
+
+    def set_many(self, items: Dict[str, str], ttl: float = 0) -> None:
+        target = self._pipeline() or self.client
+        px = max(1, int(ttl * 1000)) if ttl else None
+        for key, value in items.items():
+            target.set(self.prefix + key, value, px=px)
+        if target is not self.client:
+            target.execute()
+
+    def delete_many(self, keys: List[str]) -> None:
+        target = self._pipeline() or self.client
+        for key in keys:
+            target.delete(self.prefix + key)
+        if target is not self.client:
+            target.execute()
+
+    def get_list(self, key: str) -> List[str]:
+        values = self.client.lrange(self.prefix + key, 0, -1) or []
+        return [value.decode("utf-8") if isinstance(value, bytes) else value for value in values]
+
+    def append_many(self, items: Dict[str, List[str]], ttl: float = 0, max_length: int = 0) -> None:
+        target = self._pipeline() or self.client
+        for key, values in items.items():
+            if not values:
+                continue
+            target.rpush(self.prefix + key, *values)
+            if max_length:
+                target.ltrim(self.prefix + key, -max_length, -1)
+            if ttl:
+                target.pexpire(self.prefix + key, max(1, int(ttl * 1000)))
+        if target is not self.client:
+            target.execute()
+
+
+class StateStore:
+    """
+    跨进程共享的状态存储
+
+    值以JSON保存到后端；写入先进入缓冲区，达到批量大小或超过刷新间隔后批量写入后端；
+    读取时优先使用本进程的缓存，缓存超过cache_ttl后从后端重新读取，
+    使其他worker写入的状态在有限时间内可见。
+    多个worker都会修改的集合（如对话消息、用户的会话列表）使用append追加到列表，
+    由后端原子完成，不会像set整体覆盖那样丢失其他worker的修改。
+    同一时间只有一次写入后端，按修改顺序提交；正在写入的修改在提交前对读取仍然可见
+    """
+
+    def __init__(
+        self,
+        backend: StateStoreBackend,
+        ttl: float = 0,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        cache_ttl: float = 5.0,
+        max_cache_entries: int = 10000
+    ):
+        """
+        初始化状态存储
+
+        Args:
+            backend: 存储后端
+            ttl: 状态过期时间（秒），0表示不过期
+            batch_size: 缓冲区达到该数量时立即写入后端
+            flush_interval: 缓冲区最长保留时间（秒）
+            cache_ttl: 本进程读缓存的有效期（秒）
+            max_cache_entries: 本进程读缓存的最大条目数，超过后淘汰最久未使用的条目
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._flush_task: Optional["asyncio.Future[None]"] = None
+        self._pending: Dict[str, Optional[str]] = {}
+        # 尚未写入后端的列表追加：键 -> (元素列表, 最大长度)
+        self._pending_appends: Dict[str, Tuple[List[str], int]] = {}
+        # 正在写入后端、尚未提交的修改
+        self._inflight: Dict[str, Optional[str]] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        # 串行化写入后端，读取后端时同样持有，不会读到写入到一半的状态；获取顺序先于_lock
+        self._flush_lock = threading.Lock()
+        self.flushes = 0
+        self.errors = 0
+
+    def get(self, key: str, refresh: bool = False) -> Optional[Any]:
+        """
+        读取状态
+
+        Args:
+            key: 键
+            refresh: 为True时跳过本进程的读缓存，用于修改前读取其他worker的最新写入
+
+        Returns:
+            Optional[Any]: 状态值，不存在时返回None
+        """
+        with self._lock:
+            cached = self._cache.get(key)
+            if not refresh and cached is not None and time.monotonic() - cached[1] <= self.cache_ttl:
+                self._cache.move_to_end(key)
+                return cached[0]
+            local = self._local(key)
+            if local is not _MISSING:
+                # 尚未提交到后端的修改以本进程为准
+                return json.loads(local) if local is not None else None
+
+        with self._flush_lock:
+            try:
+                raw = self.backend.get_many([key]).get(key)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"读取状态失败: {str(e)}")
+                return cached[0] if cached is not None else None
+
+            with self._lock:
+                local = self._local(key)
+                if local is not _MISSING:
+                    # 读取期间本进程写入了新的值，不缓存后端的旧值
+                    return json.loads(local) if local is not None else None
+                value = json.loads(raw) if raw is not None else None
+                self._cache_put(key, value)
+            return value
+
+    def _local(self, key: str) -> Any:
+        """本进程尚未提交到后端的值，删除为None，没有时返回_MISSING；调用方需持有锁"""
+        if key in self._pending:
+            return self._pending[key]
+        return self._inflight.get(key, _MISSING)
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        写入状态，批量写入后端
+
+        Args:
+            key: 键
+            value: 可JSON序列化的状态值
+        """
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._cache_put(key, value)
+            self._pending[key] = raw
+        self._maybe_flush()
+
+    def delete(self, key: str) -> None:
+        """
+        删除状态
+
+        Args:
+            key: 键
+        """
+        with self._lock:
+            self._cache.pop(key, None)
+            self._pending[key] = None
+            # 删除之前的追加一并丢弃
+            self._pending_appends.pop(key, None)
+        self._maybe_flush()
+
+    def get_list(self, key: str) -> List[Any]:
+        """
+        读取列表，包含本进程尚未写入后端的追加
+
+        Args:
+            key: 键
+
+        Returns:
+            List[Any]: 列表元素，不存在时返回空列表
+        """
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[1] <= self.cache_ttl:
+                self._cache.move_to_end(key)
+                return list(cached[0])
+
+        # 持有写入锁时没有正在写入的追加，后端的列表加上缓冲区中的追加即为完整的列表
+        with self._flush_lock:
+            with self._lock:
+                deleted = self._pending.get(key, "") is None
+            if deleted:
+                raw_values: List[str] = []
+            else:
+                try:
+                    raw_values = self.backend.get_list(key)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"读取状态失败: {str(e)}")
+                    return list(cached[0]) if cached is not None else []
+
+            with self._lock:
+                if self._pending.get(key, "") is None:
+                    raw_values = []
+                pending_values, max_length = self._pending_appends.get(key, ([], 0))
+                values = [json.loads(raw) for raw in raw_values + pending_values]
+                if max_length:
+                    values = values[-max_length:]
+                self._cache_put(key, values)
+            return list(values)
+
+    def append(self, key: str, value: Any, max_length: int = 0) -> None:
+        """
+        向列表末尾追加元素，批量写入后端
+
+        Args:
+            key: 键
+            value: 可JSON序列化的元素
+            max_length: 列表最大长度，超过后丢弃最早的元素，0表示不限制
+        """
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            values, _ = self._pending_appends.get(key, ([], 0))
+            values.append(raw)
+            self._pending_appends[key] = (values[-max_length:] if max_length else values, max_length)
+            cached = self._cache.get(key)
+            if cached is not None:
+                cached_values = cached[0] + [value]
+                self._cache[key] = (cached_values[-max_length:] if max_length else cached_values, cached[1])
+        self._maybe_flush()
+
+    def _cache_put(self, key: str, value: Any) -> None:
+        """写入本进程的读缓存，超过最大条目数时淘汰最久未使用的条目，调用方需持有锁"""
+        self._cache[key] = (value, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+    def _cached(self, key: str) -> bool:
+        """读缓存中是否有未过期的值"""
+        with self._lock:
+            cached = self._cache.get(key)
+            return cached is not None and time.monotonic() - cached[1] <= self.cache_ttl
+
+    async def aget(self, key: str, refresh: bool = False) -> Optional[Any]:
+        """
+        异步读取状态，需要访问后端时在线程池中执行，不阻塞事件循环
+
+        Args:
+            key: 键
+            refresh: 为True时跳过本进程的读缓存
+
+        Returns:
+            Optional[Any]: 状态值，不存在时返回None
+        """
+        if not refresh and self._cached(key):
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key, refresh)
+
+    async def aget_list(self, key: str) -> List[Any]:
+        """
+        异步读取列表，需要访问后端时在线程池中执行，不阻塞事件循环
+
+        Args:
+            key: 键
+
+        Returns:
+            List[Any]: 列表元素，不存在时返回空列表
+        """
+        if self._cached(key):
+            return self.get_list(key)
+        return await asyncio.to_thread(self.get_list, key)
+
+    def prune(self) -> int:
+        """
+        清理本进程读缓存中已过期的条目
+
+        Returns:
+            int: 清理的条目数
+        """
+        deadline = time.monotonic() - self.cache_ttl
+        with self._lock:
+            expired = [key for key, (_, cached_at) in self._cache.items() if cached_at < deadline]
+            for key in expired:
+                del self._cache[key]
+        return len(expired)
+
+    def _maybe_flush(self) -> None:
+        """
+        缓冲区满或超过刷新间隔时写入后端
+
+        在事件循环中调用时由线程池写入，不阻塞调用方；没有事件循环时直接写入
+        """
+        pending = len(self._pending) + len(self._pending_appends)
+        if pending < self.batch_size and time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(asyncio.to_thread(self.flush))
+
+    def flush(self) -> None:
+        """
+        将缓冲区中的修改写入后端，写入失败时保留以便下次重试
+
+        多次调用串行执行，先取出的修改先提交；写入期间修改仍对读取可见
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                appends, self._pending_appends = self._pending_appends, {}
+                self._last_flush = time.monotonic()
+                if not pending and not appends:
+                    return
+                self._inflight = pending
+            try:
+                self._write(pending, appends)
+            finally:
+                with self._lock:
+                    self._inflight = {}
+
+    def _write(self, pending: Dict[str, Optional[str]], appends: Dict[str, Tuple[List[str], int]]) -> None:
+        """写入一批修改，失败时将尚未写入的修改放回缓冲区，调用方需持有写入锁"""
+        updates = {key: raw for key, raw in pending.items() if raw is not None}
+        deletes = [key for key, raw in pending.items() if raw is None]
+        # 按最大长度分组追加，删除先于追加执行
+        append_groups: Dict[int, Dict[str, List[str]]] = {}
+        for key, (values, max_length) in appends.items():
+            append_groups.setdefault(max_length, {})[key] = values
+        try:
+            if deletes:
+                self.backend.delete_many(deletes)
+                deletes = []
+            if updates:
+                self.backend.set_many(updates, ttl=self.ttl)
+                updates = {}
+            for max_length in list(append_groups):
+                self.backend.append_many(append_groups[max_length], ttl=self.ttl, max_length=max_length)
+                del append_groups[max_length]
+            self.flushes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"写入状态失败: {str(e)}")
+            # 保留尚未写入的修改，之后的修改优先
+            with self._lock:
+                for key in deletes:
+                    self._pending.setdefault(key, None)
+                for key, raw in updates.items():
+                    self._pending.setdefault(key, raw)
+                for max_length, group in append_groups.items():
+                    for key, values in group.items():
+                        if self._pending.get(key, "") is None:
+                            continue
+                        newer, _ = self._pending_appends.get(key, ([], max_length))
+                        merged = values + newer
+                        self._pending_appends[key] = (merged[-max_length:] if max_length else merged, max_length)
+
+    async def run_flusher(self, interval: Optional[float] = None) -> None:
+        """
+        定期在线程池中将缓冲区写入后端并清理过期的读缓存，直到任务被取消；
+        没有新的读写时修改也会在刷新间隔内对其他worker可见
+
+        Args:
+            interval: 刷新间隔（秒），默认为flush_interval
+        """
+        interval = interval or self.flush_interval
+        while True:
+            await asyncio.sleep(interval)
+            self.prune()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.warning(f"定期写入状态失败: {str(e)}")
+
+    def evict(self, keys: Iterable[str]) -> None:
+        """
+        丢弃本进程的读缓存，下次读取时从后端加载
+
+        Args:
+            keys: 键列表
+        """
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+
+def create_state_store(ttl: float = 0) -> Optional[StateStore]:
+    """
+    按应用配置创建状态存储
+
+    Args:
+        ttl: 状态过期时间（秒），0表示不过期
+
+    Returns:
+        Optional[StateStore]: 状态存储，配置为memory时返回None，状态只保存在各对象内
+    """
+    from config import settings
+
+    backend_name = settings.state_store_backend.lower()
+    if backend_name == "memory":
+        return None
+    if backend_name == "sqlite":
+        backend = SQLiteStateStoreBackend(path=settings.state_store_sqlite_path)
+    elif backend_name == "redis":
+        backend = RedisStateStoreBackend(url=settings.state_store_redis_url)
+    else:
+        raise ValueError(f"不支持的状态存储后端: {settings.state_store_backend}")
+
+    return StateStore(
+        backend,
+        ttl=ttl,
+        batch_size=settings.state_store_batch_size,
+        flush_interval=settings.state_store_flush_interval,
+        cache_ttl=settings.state_store_cache_ttl,
+        max_cache_entries=settings.state_store_cache_max_entries,
+    )
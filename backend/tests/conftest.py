@@ -0,0 +1,4 @@
+import os
+
+# 测试使用内存数据库，避免修改仓库中的app.db
+os.environ["DATABASE_URL"] = "sqlite://"
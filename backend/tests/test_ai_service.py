@@ -1,10 +1,19 @@
 import pytest
 from unittest.mock import patch, AsyncMock
 from services.ai.ai_service import get_ai_hint, analyze_solution
+from services.ai.hint_cache import hint_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_hint_cache():
+    """每个测试前清空提示缓存，避免测试间互相影响"""
+    hint_cache.clear()
+    yield
+    hint_cache.clear()
 
 
 @pytest.mark.asyncio
-@patch('services.ai.model_client.client.ModelClient.generate', return_value="这是一个测试提示")
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, return_value="这是一个测试提示")
 async def test_get_ai_hint_success(mock_generate):
     """测试AI服务调用成功的情况"""
     # 调用函数
@@ -13,11 +22,11 @@ async def test_get_ai_hint_success(mock_generate):
     # 验证结果
     assert result == "这是一个测试提示"
     # 验证API调用
-    mock_generate.assert_called_once()
+    mock_generate.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-@patch('services.ai.model_client.client.ModelClient.generate', side_effect=Exception("API调用失败"))
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, side_effect=Exception("API调用失败"))
 async def test_get_ai_hint_failure(mock_generate):
     """测试AI服务调用失败的情况"""
     # 调用函数并验证异常
@@ -28,7 +37,7 @@ async def test_get_ai_hint_failure(mock_generate):
 
 
 @pytest.mark.asyncio
-@patch('services.ai.model_client.client.ModelClient.generate')
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock)
 async def test_get_ai_hint_retry(mock_generate):
     """测试AI服务重试机制"""
     # 设置模拟响应，前两次失败，第三次成功
@@ -48,7 +57,7 @@ async def test_get_ai_hint_retry(mock_generate):
 
 
 @pytest.mark.asyncio
-@patch('services.ai.model_client.client.ModelClient.generate', return_value="这是一个测试分析")
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, return_value="这是一个测试分析")
 async def test_analyze_solution_success(mock_generate):
     """测试分析解题过程成功的情况"""
     # 调用函数
@@ -58,11 +67,11 @@ async def test_analyze_solution_success(mock_generate):
     assert result["analysis"] == "这是一个测试分析"
     assert result["solution_steps"] == ["步骤1", "步骤2", "步骤3"]
     # 验证API调用
-    mock_generate.assert_called_once()
+    mock_generate.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-@patch('services.ai.model_client.client.ModelClient.generate', side_effect=Exception("API调用失败"))
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, side_effect=Exception("API调用失败"))
 async def test_analyze_solution_failure(mock_generate):
     """测试分析解题过程失败的情况"""
     # 调用函数并验证异常
@@ -73,7 +82,7 @@ async def test_analyze_solution_failure(mock_generate):
 
 
 @pytest.mark.asyncio
-@patch('services.ai.model_client.client.ModelClient.generate')
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock)
 async def test_analyze_solution_retry(mock_generate):
     """测试分析解题过程重试机制"""
     # 设置模拟响应，前两次失败，第三次成功
@@ -93,7 +102,7 @@ async def test_analyze_solution_retry(mock_generate):
 
 
 @pytest.mark.asyncio
-@patch('services.ai.model_client.client.ModelClient.generate', return_value="这是一个针对初中数学题的AI提示")
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, return_value="这是一个针对初中数学题的AI提示")
 async def test_middle_school_math_cases(mock_generate):
     """测试AI服务对初中各阶段数学题的处理能力"""
     # 初一数学 - 有理数运算
@@ -155,3 +164,120 @@ async def test_middle_school_math_cases(mock_generate):
     hint = await get_ai_hint("在Rt△ABC中，∠C=90°，sinA=3/5，BC=6，求AB和AC的长")
     assert isinstance(hint, str)
     assert len(hint) > 0
+
+
+@pytest.mark.asyncio
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, return_value="移项时符号变了吗？")
+async def test_get_ai_hint_cache_normalized_step(mock_generate):
+    """测试书写差异不同的相同步骤命中缓存"""
+    first = await get_ai_hint("移项得 2x=6", question_id=1)
+    second = await get_ai_hint("移项得2x ＝ 6。", question_id=1)
+
+    assert first == second == "移项时符号变了吗？"
+    mock_generate.assert_awaited_once()
+    assert hint_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, return_value="这是一个测试提示")
+async def test_get_ai_hint_cache_scoped_by_question(mock_generate):
+    """测试不同题目的相同步骤不共享缓存"""
+    await get_ai_hint("移项得 2x=6", question_id=1)
+    await get_ai_hint("移项得 2x=6", question_id=2)
+
+    assert mock_generate.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_ai_hint_coalesces_concurrent_requests():
+    """测试并发的相同提示请求只调用一次模型"""
+    import asyncio
+
+    async def slow_generate(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return "你检查过符号吗？"
+
+    with patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, side_effect=slow_generate) as mock_generate:
+        results = await asyncio.gather(*[get_ai_hint("移项得 2x = 6") for _ in range(5)])
+
+    assert results == ["你检查过符号吗？"] * 5
+    mock_generate.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions_and_survives_cancellation():
+    """测试合并请求共享异常，单个等待者取消不影响其他等待者"""
+    import asyncio
+    from services.ai.single_flight import SingleFlight
+
+    flight = SingleFlight()
+    gate = asyncio.Event()
+
+    async def upstream():
+        await gate.wait()
+        return "结果"
+
+    first = asyncio.ensure_future(flight.do("key", upstream))
+    second = asyncio.ensure_future(flight.do("key", upstream))
+    await asyncio.sleep(0)
+    first.cancel()
+    gate.set()
+
+    assert await second == "结果"
+    assert flight.stats() == {"calls": 1, "shared": 1, "cancelled": 0, "inflight": 0}
+
+    async def failing():
+        raise RuntimeError("上游错误")
+
+    results = await asyncio.gather(flight.do("bad", failing), flight.do("bad", failing), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancels_upstream_when_all_waiters_leave():
+    """测试全部等待者取消后上游调用被取消，之后的相同请求发起新的调用"""
+    import asyncio
+    from services.ai.single_flight import SingleFlight
+
+    flight = SingleFlight()
+    started = []
+    upstream_cancelled = asyncio.Event()
+
+    async def upstream():
+        started.append(1)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            upstream_cancelled.set()
+            raise
+        return "结果"
+
+    waiters = [asyncio.ensure_future(flight.do("key", upstream)) for _ in range(2)]
+    await asyncio.sleep(0)
+    waiters[0].cancel()
+    await asyncio.sleep(0)
+    assert not upstream_cancelled.is_set()
+
+    waiters[1].cancel()
+    await asyncio.wait_for(upstream_cancelled.wait(), 1)
+    assert flight.stats()["cancelled"] == 1
+    assert flight.inflight_count() == 0
+
+    async def quick():
+        return "新结果"
+
+    assert await flight.do("key", quick) == "新结果"
+
+
+@pytest.mark.asyncio
+@patch('services.ai.model_client.client.ModelClient.agenerate', new_callable=AsyncMock, return_value="这是一个测试提示")
+async def test_get_ai_hint_includes_history(mock_generate):
+    """测试对话历史加入提示，且不会命中没有上下文时的缓存"""
+    await get_ai_hint("x=1")
+    history = [{"role": "user", "content": "设未知数x"}, {"role": "ai", "content": "x代表什么？"}]
+    await get_ai_hint("x=1", history=history)
+
+    assert mock_generate.await_count == 2
+    prompt = mock_generate.await_args.kwargs["prompt"]
+    assert "学生: 设未知数x\n老师: x代表什么？\n" in prompt
+    assert prompt.endswith("学生当前的解题步骤：x=1\n请提出一个引导性问题。")
@@ -0,0 +1,111 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from config.settings import Settings
+from models.base import Base, create_engine_from_settings, create_async_engine_from_settings
+from models.models import AnswerRecord, Question, QuestionType, StudentAnalysis
+from services.analysis.analytics_engine import AnalyticsEngine, BASELINE_SCORE, build_summary
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """写入题目和答题记录的临时数据库"""
+    settings = Settings()
+    settings.database_url = f"sqlite:///{tmp_path / 'analysis.db'}"
+    engine = create_engine_from_settings(settings)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Question.__table__.insert(), [
+            {"id": 1, "type": QuestionType.CALCULATION, "content": "解方程"},
+            {"id": 2, "type": QuestionType.PROOF, "content": "证明全等"},
+        ])
+        conn.execute(AnswerRecord.__table__.insert(), [
+            # 学生A：方程独立且按时完成，几何证明多次提示且超时
+            {"question_id": 1, "student_id": "a", "tag": "一元二次方程", "level": "beginner", "time_spent": 300, "hint_count": 0},
+            {"question_id": 1, "student_id": "a", "tag": "一元二次方程", "level": "beginner", "time_spent": 200, "hint_count": 0},
+            {"question_id": 2, "student_id": "a", "tag": "全等三角形", "level": "advanced", "time_spent": 1200, "hint_count": 3},
+            {"question_id": 2, "student_id": "b", "tag": "全等三角形", "level": "advanced", "time_spent": 600, "hint_count": 0},
+        ])
+    engine.dispose()
+
+    async_engine = create_async_engine_from_settings(settings)
+    yield async_sessionmaker(async_engine, expire_on_commit=False)
+    async_engine.sync_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_compute_scores_per_student(session_factory):
+    """测试按学生聚合知识点和能力得分"""
+    engine = AnalyticsEngine()
+    async with session_factory() as db:
+        result = await engine.compute(db, student_id="a")
+
+    assert result["record_count"] == 3
+    assert result["tag_scores"]["一元二次方程"] == 100
+    # 提示：100 * (0 + 0.5 / 4) = 12.5，用时：100 * 600 / 1200 = 50
+    assert result["tag_scores"]["全等三角形"] == 28
+    assert result["abilities"]["计算能力"] == 100
+    assert result["abilities"]["逻辑推理"] == 28
+    assert result["abilities"]["空间想象"] == 28
+    assert result["abilities"]["知识应用"] == BASELINE_SCORE
+
+    async with session_factory() as db:
+        other = await engine.compute(db, student_id="b")
+    assert other["tag_scores"] == {"全等三角形": 100}
+
+
+@pytest.mark.asyncio
+async def test_compute_cached_until_invalidated(session_factory):
+    """测试结果按学生缓存，新记录写入后失效"""
+    engine = AnalyticsEngine(ttl=300)
+    async with session_factory() as db:
+        first = await engine.compute(db, student_id="b")
+        db.add(AnswerRecord(question_id=1, student_id="b", tag="一元二次方程", hint_count=0))
+        await db.commit()
+
+        assert await engine.compute(db, student_id="b") is first
+        engine.invalidate(["b"])
+        assert "一元二次方程" in (await engine.compute(db, student_id="b"))["tag_scores"]
+
+
+@pytest.mark.asyncio
+async def test_save_snapshots_only_for_recomputed_results(session_factory):
+    """测试只为重新计算过的结果保存快照"""
+    engine = AnalyticsEngine()
+    async with session_factory() as db:
+        await engine.compute(db, student_id="a")
+        await engine.compute(db, student_id="a")
+
+    assert await engine.save_snapshots(session_factory) == 1
+    assert await engine.save_snapshots(session_factory) == 0
+
+    async with session_factory() as db:
+        snapshots = (await db.execute(select(StudentAnalysis))).scalars().all()
+    assert [s.student_id for s in snapshots] == ["a"]
+    assert "全等三角形" in snapshots[0].summary
+
+
+@pytest.mark.asyncio
+async def test_cache_bounded_by_max_entries_and_ttl(session_factory):
+    """测试缓存按最大学生数淘汰最久未使用的结果，过期结果可被清理"""
+    engine = AnalyticsEngine(ttl=300, max_entries=2)
+    async with session_factory() as db:
+        await engine.compute(db, student_id="a")
+        await engine.compute(db, student_id="b")
+        await engine.compute(db, student_id="a")
+        await engine.compute(db, student_id=None)
+
+    assert list(engine._cache) == ["a", None]
+    assert len(engine._dirty) == 2
+    assert engine.evictions == 1
+
+    engine.ttl = 0
+    assert engine.prune() == 2
+    assert not engine._cache
+
+
+def test_build_summary():
+    """测试根据薄弱能力和知识点生成总结"""
+    summary = build_summary({"计算能力": 90, "逻辑推理": 40, "空间想象": 55}, {"圆": 50, "方程": 90})
+    assert summary.startswith("根据您的答题表现，建议加强逻辑推理和空间想象能力的训练。")
+    assert "圆" in summary and "方程" not in summary
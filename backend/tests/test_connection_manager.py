@@ -0,0 +1,146 @@
+import json
+import asyncio
+
+import pytest
+
+from services.conversation import ConversationHistory
+from services.conversation.connection_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    """模拟WebSocket连接"""
+
+    def __init__(self):
+        self.accepted = False
+        self.closed_code = None
+        self.sent = []
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code=1000):
+        self.closed_code = code
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+@pytest.mark.asyncio
+async def test_update_ping_records_current_time():
+    """测试心跳记录当前单调时间，连接后立即检查不会超时"""
+    manager = ConnectionManager()
+    client_id = await manager.connect(FakeWebSocket())
+
+    assert manager.check_timeouts(timeout=30) == []
+    manager.last_ping[client_id] -= 60
+    assert manager.check_timeouts(timeout=30) == [client_id]
+    manager.update_ping(client_id)
+    assert manager.check_timeouts(timeout=30) == []
+
+
+@pytest.mark.asyncio
+async def test_reap_closes_stale_connections_and_cleans_history():
+    """测试清理任务关闭超时连接并移除其对话历史"""
+    history = ConversationHistory()
+    manager = ConnectionManager()
+    manager.add_disconnect_listener(history.remove_client)
+
+    stale_socket, fresh_socket = FakeWebSocket(), FakeWebSocket()
+    stale = await manager.connect(stale_socket)
+    fresh = await manager.connect(fresh_socket)
+    history.add_message(stale, "user", "x=1")
+    history.add_message(fresh, "user", "x=2")
+    manager.last_ping[stale] -= 120
+
+    assert await manager.reap(timeout=90) == [stale]
+    assert stale_socket.closed_code == 1001
+    assert fresh_socket.closed_code is None
+    assert list(manager.active_connections) == [fresh]
+    assert history.get_history(stale) == []
+    assert len(history.get_history(fresh)) == 1
+
+    # 已清理的连接再次断开时不会重复通知
+    manager.disconnect(stale)
+    await manager.broadcast({"type": "notice"}, wait=True)
+    assert stale_socket.sent == []
+    assert fresh_socket.sent == [{"type": "notice"}]
+
+
+class SlowWebSocket(FakeWebSocket):
+    """发送时阻塞的WebSocket连接，模拟接收过慢的客户端"""
+
+    async def send_text(self, text):
+        await asyncio.sleep(10)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_is_not_delayed_by_slow_clients():
+    """测试慢客户端发送超时后被断开，不影响其他客户端"""
+    manager = ConnectionManager(send_timeout=0.05)
+    fast_sockets = [FakeWebSocket() for _ in range(50)]
+    for websocket in fast_sockets:
+        await manager.connect(websocket)
+    slow_socket = SlowWebSocket()
+    slow = await manager.connect(slow_socket)
+
+    assert await manager.broadcast({"type": "notice", "content": "下课"}, wait=True) == 51
+    assert all(websocket.sent == [{"type": "notice", "content": "下课"}] for websocket in fast_sockets)
+
+    await asyncio.sleep(0.01)
+    assert slow not in manager.active_connections
+    assert slow_socket.closed_code == 1001
+    assert manager.stats()["slow_disconnects"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_overflow_policy():
+    """测试发送队列已满时按策略丢弃消息或断开客户端"""
+    drop_manager = ConnectionManager(queue_size=1, overflow_policy="drop")
+    client_id = await drop_manager.connect(SlowWebSocket())
+    for i in range(3):
+        await drop_manager.send_personal_message({"i": i}, client_id)
+        # 让发送任务取出第一条消息
+        await asyncio.sleep(0)
+    # 第一条正在发送，第二条在队列中，第三条被丢弃
+    assert drop_manager.stats()["dropped"] == 1
+    assert client_id in drop_manager.active_connections
+    drop_manager.disconnect(client_id)
+
+    disconnect_manager = ConnectionManager(queue_size=1)
+    client_id = await disconnect_manager.connect(SlowWebSocket())
+    for i in range(3):
+        await disconnect_manager.send_personal_message({"i": i}, client_id)
+        # 让发送任务取出第一条消息
+        await asyncio.sleep(0)
+    assert client_id not in disconnect_manager.active_connections
+    assert disconnect_manager.stats()["slow_disconnects"] == 1
+
+    with pytest.raises(ValueError):
+        ConnectionManager(overflow_policy="block")
+
+
+@pytest.mark.asyncio
+async def test_room_fan_out_only_reaches_members():
+    """测试按房间发送只发给房间内的客户端，断开后自动离开房间"""
+    manager = ConnectionManager(max_rooms_per_client=2)
+    sockets = {name: FakeWebSocket() for name in ("a", "b", "c")}
+    for name, websocket in sockets.items():
+        await manager.connect(websocket, client_id=name)
+    manager.join_room("a", "class:3A")
+    manager.join_room("b", "class:3A")
+    manager.join_room("c", "class:3B")
+
+    assert await manager.send_to_room("class:3A", {"type": "notice"}, exclude="b", wait=True) == 1
+    assert sockets["a"].sent == [{"type": "notice"}]
+    assert sockets["b"].sent == [] and sockets["c"].sent == []
+
+    manager.join_room("a", "question:42")
+    with pytest.raises(ValueError):
+        manager.join_room("a", "question:43")
+    assert manager.get_client_rooms("a") == ["class:3A", "question:42"]
+
+    manager.leave_room("b", "class:3A")
+    manager.disconnect("a")
+    assert "class:3A" not in manager.rooms
+    assert manager.get_room_members("class:3B") == ["c"]
+    assert await manager.send_to_room("class:3A", {"type": "notice"}) == 0
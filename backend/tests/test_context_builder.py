@@ -0,0 +1,58 @@
+from services.prompt.context_builder import HintContextBuilder, estimate_tokens, truncate_to_tokens
+
+
+def _history(count):
+    return [
+        {"role": "user" if i % 2 == 0 else "ai", "content": f"第{i}步：解方程 x^2-{i}x+1=0 的过程"}
+        for i in range(count)
+    ]
+
+
+def test_estimate_and_truncate_tokens():
+    """测试token估算：中文、数字和符号每个字符1个token，英文字母3个1个token，空格不计"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("设未知数") == 4
+    assert estimate_tokens("x+1=2") == 5
+    # 公式在常见分词器中几乎逐字符切分，估算不能低估
+    assert estimate_tokens("x^2-2x+1=0") == 10
+    assert estimate_tokens("hello world") == 4
+    assert truncate_to_tokens("x^2-2x+1=0", 5) == "x^2-…"
+    assert truncate_to_tokens("一二三四五六", 4) == "一二三…"
+    assert truncate_to_tokens("一二三", 3) == "一二三"
+
+
+def test_build_without_context_keeps_plain_prompt():
+    """测试没有题目和对话时只包含当前步骤"""
+    builder = HintContextBuilder()
+    assert builder.build("x=1") == "学生的解题步骤：x=1\n请提出一个引导性问题。"
+
+
+def test_build_includes_question_and_recent_turns():
+    """测试提示包含题目和最近的对话，当前步骤在最后"""
+    builder = HintContextBuilder(max_prompt_tokens=1024, max_turns=2)
+    prompt = builder.build("配方得(x-1)^2=0", _history(4), question="解方程x^2-2x+1=0")
+
+    assert prompt.startswith("题目：解方程x^2-2x+1=0\n之前的对话：\n")
+    assert "学生: 第2步" in prompt and "老师: 第3步" in prompt
+    # 超过保留条数的较早对话压缩为摘要
+    assert "（更早的2条对话摘要）" in prompt
+    assert prompt.endswith("学生当前的解题步骤：配方得(x-1)^2=0\n请提出一个引导性问题。")
+
+
+def test_build_respects_token_budget():
+    """测试对话、题目和步骤再长，提示也不超过token上限"""
+    for max_tokens in (128, 300, 1024):
+        builder = HintContextBuilder(max_prompt_tokens=max_tokens)
+        prompt = builder.build("很长的步骤" * 200, _history(40), question="题目内容" * 200, reserved_tokens=20)
+        assert estimate_tokens(prompt) + 20 <= max_tokens
+        assert prompt.endswith("请提出一个引导性问题。")
+
+
+def test_build_keeps_step_when_reserved_tokens_exhaust_budget():
+    """测试预留内容占满预算时仍保留当前步骤，题目和对话省略"""
+    builder = HintContextBuilder(max_prompt_tokens=100, min_step_tokens=16)
+    prompt = builder.build("移项得x=3", _history(4), question="解方程", reserved_tokens=100)
+
+    assert "移项得x=3" in prompt
+    assert "题目" not in prompt and "之前的对话" not in prompt
+    assert prompt.endswith("请提出一个引导性问题。")
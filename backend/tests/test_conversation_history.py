@@ -0,0 +1,58 @@
+import time
+from unittest.mock import patch
+from services.conversation.conversation_history import ConversationHistory, ConversationMessage
+
+
+def test_history_keeps_latest_messages():
+    """测试每个客户端只保留最近的消息"""
+    history = ConversationHistory(max_history_length=3)
+    for i in range(5):
+        history.add_message("c1", "user", f"步骤{i}")
+
+    messages = history.get_history("c1")
+    assert [m["content"] for m in messages] == ["步骤2", "步骤3", "步骤4"]
+    assert isinstance(messages[0]["timestamp"], float)
+    assert [m["content"] for m in history.get_history("c1", limit=2)] == ["步骤3", "步骤4"]
+    assert history.total_size == sum(ConversationMessage("user", f"步骤{i}").size for i in range(2, 5))
+
+
+def test_context_formats_user_and_ai_messages():
+    """测试对话上下文格式"""
+    history = ConversationHistory()
+    history.add_message("c1", "user", "x^2=4")
+    history.add_message("c1", "ai", "别忘了负根")
+    history.add_message("c1", "system", "忽略")
+
+    assert history.get_context("c1") == "学生: x^2=4\n老师: 别忘了负根"
+
+
+def test_idle_clients_evicted():
+    """测试空闲超时的客户端被清除"""
+    history = ConversationHistory(idle_ttl=60)
+    now = time.monotonic()
+    with patch("services.conversation.conversation_history.time.monotonic", return_value=now):
+        history.add_message("idle", "user", "a")
+        history.add_message("active", "user", "b")
+    with patch("services.conversation.conversation_history.time.monotonic", return_value=now + 30):
+        history.get_history("active")
+    with patch("services.conversation.conversation_history.time.monotonic", return_value=now + 70):
+        assert history.evict_idle() == ["idle"]
+
+    assert history.get_client_count() == 1
+    assert history.get_history("idle") == []
+
+
+def test_memory_limit_evicts_least_recently_used():
+    """测试超过内存上限时清除最近最少使用的客户端"""
+    size = ConversationMessage("user", "x" * 100).size
+    history = ConversationHistory(max_memory_bytes=size * 3)
+    history.add_message("a", "user", "x" * 100)
+    history.add_message("b", "user", "x" * 100)
+    history.add_message("c", "user", "x" * 100)
+    # 访问a后，b成为最近最少使用的客户端
+    history.get_history("a")
+    history.add_message("d", "user", "x" * 100)
+
+    assert set(history.conversations) == {"a", "c", "d"}
+    assert history.total_size <= size * 3
+    assert history.stats()["evictions"] == 1
@@ -0,0 +1,124 @@
+import pytest
+from sqlalchemy import text
+from config.settings import Settings
+from models.base import create_engine_from_settings
+
+
+def _settings(database_url, **overrides):
+    settings = Settings()
+    settings.database_url = database_url
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    return settings
+
+
+def _pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_sqlite_file_engine_pragmas(tmp_path):
+    """测试文件数据库启用WAL并设置synchronous和busy_timeout"""
+    settings = _settings(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        sqlite_wal=True,
+        sqlite_synchronous="NORMAL",
+        sqlite_busy_timeout=3000,
+        db_pool_size=3,
+    )
+    engine = create_engine_from_settings(settings)
+
+    assert _pragma(engine, "journal_mode") == "wal"
+    # NORMAL对应1
+    assert _pragma(engine, "synchronous") == 1
+    assert _pragma(engine, "busy_timeout") == 3000
+    assert engine.pool.size() == 3
+    engine.dispose()
+
+
+def test_sqlite_memory_engine_shares_connection():
+    """测试内存数据库跨会话共享同一连接"""
+    engine = create_engine_from_settings(_settings("sqlite://"))
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+    assert _pragma(engine, "journal_mode") == "memory"
+    engine.dispose()
+
+
+def test_invalid_sqlite_synchronous_mode():
+    """测试不支持的同步模式"""
+    with pytest.raises(ValueError):
+        create_engine_from_settings(_settings("sqlite://", sqlite_synchronous="FAST"))
+
+
+def test_async_database_url():
+    """测试同步URL转换为异步驱动URL"""
+    from models.base import async_database_url
+
+    assert async_database_url("sqlite:///./app.db").drivername == "sqlite+aiosqlite"
+    assert async_database_url("postgresql://u:p@db/app").drivername == "postgresql+asyncpg"
+    assert async_database_url("sqlite+aiosqlite://").drivername == "sqlite+aiosqlite"
+    with pytest.raises(ValueError):
+        async_database_url("oracle://u:p@db/app")
+
+
+def test_upgrade_database_adds_columns_and_indexes(tmp_path):
+    """测试升级旧数据库时补充新增的列和索引"""
+    from sqlalchemy import create_engine, inspect
+    from init_db import upgrade_database
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE questions (id INTEGER PRIMARY KEY, type VARCHAR(11), content TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE answer_records (id INTEGER PRIMARY KEY, question_id INTEGER NOT NULL, "
+            "student_input TEXT, used_hint TEXT, level VARCHAR(20), tag VARCHAR(50), "
+            "time_spent INTEGER, hint_count INTEGER, created_at DATETIME)"
+        ))
+
+    upgrade_database(engine)
+    upgrade_database(engine)
+
+    inspector = inspect(engine)
+    assert "student_id" in {c["name"] for c in inspector.get_columns("answer_records")}
+    assert {i["name"] for i in inspector.get_indexes("answer_records")} >= {
+        "ix_answer_records_question_id",
+        "ix_answer_records_created_at",
+        "ix_answer_records_student_id_tag_level",
+        "ix_answer_records_tag_created_at",
+    }
+    engine.dispose()
+
+
+def test_upgrade_schema_on_shipped_database(tmp_path):
+    """测试启动时升级仓库中的app.db：补充新增的列和索引，之后可以查询答题记录"""
+    import shutil
+    from pathlib import Path
+    from sqlalchemy import create_engine, inspect
+    from sqlalchemy.orm import Session
+    from models.models import AnswerRecord
+    from models.schema import upgrade_schema
+
+    path = tmp_path / "app.db"
+    shutil.copy(Path(__file__).resolve().parent.parent / "app.db", path)
+    engine = create_engine(f"sqlite:///{path}")
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    assert "student_id" in {c["name"] for c in inspector.get_columns("answer_records")}
+    assert {i["name"] for i in inspector.get_indexes("answer_records")} >= {
+        "ix_answer_records_student_id_tag_level",
+        "ix_answer_records_tag_created_at",
+    }
+    assert "ix_student_analyses_student_id_created_at" in {
+        i["name"] for i in inspector.get_indexes("student_analyses")
+    }
+    with Session(engine) as db:
+        db.query(AnswerRecord).filter(AnswerRecord.student_id == "s1").all()
+    engine.dispose()
@@ -0,0 +1,118 @@
+import time
+import fnmatch
+import threading
+import pytest
+from services.ai.hint_cache import (
+    HintCache,
+    MemoryHintCacheBackend,
+    SQLiteHintCacheBackend,
+    RedisHintCacheBackend,
+)
+
+
+class FakeRedis:
+    """兼容Redis协议的测试替身"""
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires_at = self.data.get(key, (None, 0))
+        if value is None or expires_at <= time.time():
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value, time.time() + (ex or 3600))
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match="*"):
+        return [key for key in self.data if fnmatch.fnmatch(key, match)]
+
+
+def test_make_key_normalizes_step():
+    """测试缓存键对空白、全角和LaTeX写法归一化"""
+    key = HintCache.make_key("移项得 2x=6", 1, "v1", "doubao")
+    assert key == HintCache.make_key("$移项得2x＝6$", 1, "v1", "doubao")
+    assert key != HintCache.make_key("移项得 2x+6", 1, "v1", "doubao")
+    assert key != HintCache.make_key("移项得 2x=6", 1, "v2", "doubao")
+    assert key != HintCache.make_key("移项得 2x=6", 1, "v1", "openai")
+
+
+def test_make_key_keeps_case_and_digit_spacing():
+    """测试缓存键保留大小写和数字之间的空白"""
+    assert HintCache.make_key("2 3") != HintCache.make_key("23")
+    assert HintCache.make_key("X=2y") != HintCache.make_key("x=2Y")
+    assert HintCache.make_key("2x  +  3 = 5") == HintCache.make_key("2x+3=5")
+
+
+def test_memory_backend_lru_eviction():
+    """测试进程内缓存按LRU淘汰"""
+    cache = HintCache(MemoryHintCacheBackend(max_entries=2))
+    cache.set("a", "提示A")
+    cache.set("b", "提示B")
+    assert cache.get("a") == "提示A"
+    cache.set("c", "提示C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "提示A"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_backend_ttl_expiry():
+    """测试缓存过期"""
+    cache = HintCache(MemoryHintCacheBackend(), ttl=0)
+    cache.set("a", "提示A")
+    assert cache.get("a") is None
+
+
+def test_sqlite_backend(tmp_path):
+    """测试SQLite缓存后端读写和LRU淘汰"""
+    cache = HintCache(SQLiteHintCacheBackend(str(tmp_path / "cache.db"), max_entries=2))
+    cache.set("a", "提示A")
+    time.sleep(0.01)
+    cache.set("b", "提示B")
+    time.sleep(0.01)
+    cache.set("c", "提示C")
+
+    assert cache.get("a") is None
+    assert cache.get("c") == "提示C"
+    assert cache.stats()["entries"] == 2
+
+
+def test_redis_backend_with_stand_in():
+    """测试Redis协议缓存后端"""
+    cache = HintCache(RedisHintCacheBackend(client=FakeRedis()))
+    cache.set("a", "提示A")
+
+    assert cache.get("a") == "提示A"
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_blocking_backend_runs_off_event_loop(tmp_path):
+    """测试阻塞I/O的缓存后端在线程池中读写"""
+    threads = []
+
+    class RecordingBackend(SQLiteHintCacheBackend):
+        def get(self, key):
+            threads.append(threading.get_ident())
+            return super().get(key)
+
+        def set(self, key, value, ttl):
+            threads.append(threading.get_ident())
+            super().set(key, value, ttl)
+
+    cache = HintCache(RecordingBackend(str(tmp_path / "cache.db")))
+    await cache.aset("a", "提示A")
+
+    assert await cache.aget("a") == "提示A"
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
@@ -0,0 +1,32 @@
+import time
+from unittest.mock import patch
+
+from utils.id_generator import MonotonicIdGenerator, generate_ulid, ulid_bound, ulid_timestamp
+
+
+def test_ulid_is_unique_and_sorted():
+    """测试同一进程生成的ID唯一且按生成顺序递增"""
+    ids = [generate_ulid() for _ in range(10000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all(len(i) == 26 for i in ids)
+
+
+def test_ulid_monotonic_when_clock_goes_back():
+    """测试系统时钟回拨时ID仍然递增"""
+    generator = MonotonicIdGenerator()
+    with patch("utils.id_generator.time.time_ns", return_value=2_000_000_000_000_000):
+        first = generator.generate()
+    with patch("utils.id_generator.time.time_ns", return_value=1_000_000_000_000_000):
+        second = generator.generate()
+    assert second > first
+    assert ulid_timestamp(second) == ulid_timestamp(first) == 2_000_000
+
+
+def test_ulid_bounds_cover_generation_time():
+    """测试时间边界可用于按时间范围筛选ID"""
+    before = time.time()
+    ulid = generate_ulid()
+    after = time.time()
+    assert ulid_bound(before - 0.001) <= ulid <= ulid_bound(after, upper=True)
+    assert abs(ulid_timestamp(ulid) - before) < 1
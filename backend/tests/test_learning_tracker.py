@@ -0,0 +1,95 @@
+from services.learning.learning_tracker import LearningSession, LearningTracker
+
+
+def test_user_sessions_use_index():
+    """测试按用户索引获取会话"""
+    tracker = LearningTracker()
+    first = tracker.start_session("u1", "p1", "解方程")
+    tracker.start_session("u2", "p1", "解方程")
+
+    assert tracker.user_sessions == {"u1": [first], "u2": [tracker.user_sessions["u2"][0]]}
+    sessions = tracker.get_user_sessions("u1")
+    assert [s["user_id"] for s in sessions] == ["u1"]
+    assert tracker.get_user_sessions("u3") == []
+
+
+def test_running_statistics_match_steps():
+    """测试添加步骤时累加的统计与步骤一致"""
+    tracker = LearningTracker()
+    session_id = tracker.start_session("u1", "p1", "解方程")
+    tracker.add_step(session_id, "移项", hint_used=True)
+    full = tracker.add_step(session_id, "化简", error_type="计算错误")
+    summary = tracker.add_step(session_id, "求解", error_type="计算错误", include_steps=False)
+
+    assert [step["content"] for step in full["steps"]] == ["移项", "化简"]
+    assert "steps" not in summary
+    assert summary["step_count"] == 3
+
+    report = tracker.generate_report(session_id, include_steps=False)
+    session = tracker.get_session(session_id)
+    assert report["hint_count"] == 1
+    assert report["error_count"] == 2
+    assert report["error_types"] == {"计算错误": 2}
+    assert report["avg_step_time"] == sum(step["time_spent"] for step in session["steps"]) / 3
+    assert "steps" not in report
+    assert [step["content"] for step in tracker.generate_report(session_id)["steps"]] == ["移项", "化简", "求解"]
+
+
+def test_session_state_round_trip():
+    """测试会话的紧凑持久化形式可以完整恢复"""
+    session = LearningSession("u1", "p1", "解方程")
+    session.add_step("移项", hint_used=True)
+    session.add_step("化简", error_type="符号错误")
+    session.end()
+
+    restored = LearningSession.from_state(session.to_state())
+    assert restored.to_dict() == session.to_dict()
+    assert restored.steps[0].to_list() == session.steps[0].to_list()
+
+
+def test_session_ids_do_not_collide_and_support_time_range():
+    """测试同一秒内开始的会话ID不重复，并可按时间范围获取"""
+    from datetime import datetime, timedelta
+
+    tracker = LearningTracker()
+    session_ids = [tracker.start_session("u1", "p1", "解方程") for _ in range(5)]
+
+    assert len(set(session_ids)) == 5
+    assert len(tracker.get_user_sessions("u1")) == 5
+    now = datetime.now()
+    assert len(tracker.get_user_sessions("u1", since=now - timedelta(minutes=1), until=now)) == 5
+    assert tracker.get_user_sessions("u1", since=now + timedelta(minutes=1)) == []
+
+
+def test_idle_and_lru_eviction():
+    """测试空闲会话和超过最大会话数的会话从本进程清除，用户索引同步更新"""
+    tracker = LearningTracker(max_sessions=2)
+    first = tracker.start_session("u1", "p1", "解方程")
+    second = tracker.start_session("u1", "p2", "解方程")
+    tracker.add_step(first, "移项")
+    third = tracker.start_session("u2", "p3", "解方程")
+
+    # 最近最少使用的second被清除
+    assert list(tracker.learning_sessions) == [first, third]
+    assert tracker.user_sessions == {"u1": [first], "u2": [third]}
+    assert tracker.get_session(second) is None
+    assert tracker.evictions == 1
+
+    tracker.idle_ttl = 60
+    tracker.learning_sessions[first].last_active -= 120
+    assert tracker.evict_idle() == [first]
+    assert tracker.user_sessions == {"u2": [third]}
+
+
+def test_evicted_session_reloads_from_store():
+    """测试配置了状态存储时，被清除的会话下次访问时从存储加载"""
+    from storage.state_store import MemoryStateStoreBackend, StateStore
+
+    tracker = LearningTracker(store=StateStore(MemoryStateStoreBackend()), max_sessions=1)
+    first = tracker.start_session("u1", "p1", "解方程")
+    tracker.add_step(first, "移项")
+    tracker.start_session("u1", "p2", "解方程")
+    assert first not in tracker.learning_sessions
+
+    assert tracker.add_step(first, "化简")["step_count"] == 2
+    assert [s["problem_id"] for s in tracker.get_user_sessions("u1")] == ["p1", "p2"]
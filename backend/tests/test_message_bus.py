@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from services.conversation import ConnectionManager, MemoryMessageBus, RedisMessageBus
+from services.conversation.message_bus import MemoryBroker
+from tests.test_connection_manager import FakeWebSocket
+
+
+async def _workers(count):
+    """创建共享同一消息代理的多个连接管理器，模拟多个worker"""
+    broker = MemoryBroker()
+    managers = [ConnectionManager(bus=MemoryMessageBus(broker)) for _ in range(count)]
+    for manager in managers:
+        await manager.start()
+    return managers
+
+
+@pytest.mark.asyncio
+async def test_messages_reach_clients_on_other_workers():
+    """测试单发、广播和房间消息可以送达其他worker上的连接"""
+    first, second = await _workers(2)
+    a, b, c = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await first.connect(a, client_id="a")
+    await second.connect(b, client_id="b")
+    await second.connect(c, client_id="c")
+    first.join_room("a", "class:3A")
+    second.join_room("b", "class:3A")
+
+    await first.send_personal_message({"type": "hint"}, "b")
+    await first.broadcast({"type": "notice"})
+    await second.send_to_room("class:3A", {"type": "room"}, exclude="b")
+    await first.flush()
+    await second.flush()
+
+    assert a.sent == [{"type": "notice"}, {"type": "room"}]
+    assert b.sent == [{"type": "hint"}, {"type": "notice"}]
+    assert c.sent == [{"type": "notice"}]
+
+    # 关闭后不再接收其他worker的消息
+    await first.close()
+    await second.broadcast({"type": "after_close"})
+    await first.flush()
+    assert a.sent == [{"type": "notice"}, {"type": "room"}]
+
+
+@pytest.mark.asyncio
+async def test_publish_failure_does_not_block_local_delivery():
+    """测试总线发布失败时本进程的连接仍能收到消息"""
+    class BrokenBus(MemoryMessageBus):
+        async def publish(self, message):
+            raise ConnectionError("总线不可用")
+
+    manager = ConnectionManager(bus=BrokenBus())
+    websocket = FakeWebSocket()
+    await manager.connect(websocket)
+
+    assert await manager.broadcast({"type": "notice"}, wait=True) == 1
+    assert websocket.sent == [{"type": "notice"}]
+    assert manager.bus_errors == 1
+
+
+class FakePubSub:
+    """模拟Redis异步发布订阅"""
+
+    def __init__(self, server):
+        self.server = server
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.server.setdefault(channel, []).append(self.queue)
+
+    async def unsubscribe(self, channel):
+        self.server[channel].remove(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+
+class FakeAsyncRedis:
+    """模拟Redis异步客户端，多个实例共享同一服务器"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def pubsub(self):
+        return FakePubSub(self.server)
+
+    async def publish(self, channel, data):
+        for queue in self.server.get(channel, []):
+            queue.put_nowait({"type": "message", "data": data.encode("utf-8")})
+
+
+@pytest.mark.asyncio
+async def test_redis_bus_fans_out_across_workers():
+    """测试Redis总线在worker之间转发消息"""
+    server = {}
+    first = ConnectionManager(bus=RedisMessageBus(client=FakeAsyncRedis(server)))
+    second = ConnectionManager(bus=RedisMessageBus(client=FakeAsyncRedis(server)))
+    await first.start()
+    await second.start()
+    websocket = FakeWebSocket()
+    await second.connect(websocket, client_id="b")
+
+    await first.broadcast({"type": "notice", "content": "下课"})
+    for _ in range(5):
+        await asyncio.sleep(0)
+    await second.flush()
+    assert websocket.sent == [{"type": "notice", "content": "下课"}]
+
+    await first.close()
+    await second.close()
+    assert server["ws:bus"] == []
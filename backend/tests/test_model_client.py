@@ -0,0 +1,112 @@
+import json
+import pytest
+import httpx
+from services.ai.model_client import ModelClient, ModelClientRegistry, ModelType, ModelRequest, ModelResponse, ModelStrategy, DoubaoStrategy
+
+
+def _doubao_transport(captured: list):
+    """构造模拟豆包API的传输层"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        captured.append(json.loads(request.content))
+        return httpx.Response(200, json={"choices": [{"message": {"content": "异步提示"}}]})
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_doubao_acall_uses_async_client():
+    """测试豆包策略通过异步HTTP客户端调用"""
+    captured = []
+    async_client = httpx.AsyncClient(transport=_doubao_transport(captured))
+    strategy = DoubaoStrategy(api_key="test-key", async_client=async_client)
+
+    response = await strategy.acall(ModelRequest(prompt="移项得 2x=6", system_prompt="系统"))
+
+    assert response.text == "异步提示"
+    assert response.model_type == ModelType.DOUBAO
+    assert captured[0]["messages"][1]["content"] == [{"text": "移项得 2x=6", "type": "text"}]
+    await async_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_doubao_acall_error_status():
+    """测试豆包策略异步调用返回错误状态码"""
+    transport = httpx.MockTransport(lambda request: httpx.Response(429, text="rate limited"))
+    async_client = httpx.AsyncClient(transport=transport)
+    strategy = DoubaoStrategy(api_key="test-key", async_client=async_client)
+
+    with pytest.raises(RuntimeError) as excinfo:
+        await strategy.acall(ModelRequest(prompt="测试"))
+
+    assert "429" in str(excinfo.value)
+    await async_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_default_acall_runs_sync_call_in_thread():
+    """测试未覆盖acall的策略在线程池中执行同步调用"""
+    class SyncOnlyStrategy(ModelStrategy):
+        def call(self, request: ModelRequest) -> ModelResponse:
+            return ModelResponse(f"同步:{request.prompt}", ModelType.QWEN)
+
+    response = await SyncOnlyStrategy().acall(ModelRequest(prompt="测试"))
+    assert response.text == "同步:测试"
+
+
+@pytest.mark.asyncio
+async def test_agenerate_awaits_strategy_acall():
+    """测试ModelClient.agenerate等待策略的异步调用"""
+    captured = []
+    async_client = httpx.AsyncClient(transport=_doubao_transport(captured))
+    client = ModelClient(ModelType.DOUBAO, api_key="test-key")
+    client.strategy.async_client = async_client
+
+    text = await client.agenerate(prompt="测试", system_prompt="系统", max_tokens=50)
+
+    assert text == "异步提示"
+    assert captured[0]["max_tokens"] == 50
+    await async_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_clients_per_credentials():
+    """测试注册表按模型类型和凭据复用客户端"""
+    registry = ModelClientRegistry()
+
+    first = registry.get(ModelType.DOUBAO, api_key="key-a")
+    second = registry.get(ModelType.DOUBAO, api_key="key-a")
+    other = registry.get(ModelType.DOUBAO, api_key="key-b")
+
+    assert first is second
+    assert first is not other
+    assert len(registry) == 2
+    # 豆包客户端使用共享的异步连接池
+    assert isinstance(first.strategy.async_client, httpx.AsyncClient)
+
+    await registry.aclose()
+    assert len(registry) == 0
+    assert first.strategy.async_client is None
+
+
+@pytest.mark.asyncio
+async def test_doubao_astream_parses_sse():
+    """测试豆包策略解析SSE流式响应"""
+    captured = []
+    sse_body = (
+        'data: {"choices": [{"delta": {"content": "你"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "确定吗"}}]}\n\n'
+        'data: {"choices": [{"delta": {}}]}\n\n'
+        'data: [DONE]\n\n'
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        captured.append(json.loads(request.content))
+        return httpx.Response(200, text=sse_body, headers={"Content-Type": "text/event-stream"})
+
+    async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client = ModelClient(ModelType.DOUBAO, api_key="test-key", async_client=async_client)
+
+    deltas = [delta async for delta in client.astream(prompt="测试")]
+
+    assert deltas == ["你", "确定吗"]
+    assert captured[0]["stream"] is True
+    await client.aclose()
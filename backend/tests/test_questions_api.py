@@ -0,0 +1,255 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from config.settings import Settings
+from main import app
+from models.base import Base, get_async_db, create_engine_from_settings, create_async_engine_from_settings
+from models.models import AnswerRecord, Question, QuestionTag, QuestionType
+from services.question.question_cache import question_cache
+from services.answer.record_writer import answer_record_writer
+from services.analysis.analytics_engine import analytics_engine
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """使用临时数据库，避免修改app.db；同步引擎写入测试数据，接口使用异步引擎"""
+    settings = Settings()
+    settings.database_url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine_from_settings(settings)
+    async_engine = create_async_engine_from_settings(settings)
+    Base.metadata.create_all(bind=engine)
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSession()
+    for i in range(1, 26):
+        question = Question(
+            type=QuestionType.CALCULATION,
+            content=f"题目{i}",
+            difficulty=(i % 5) + 1,
+        )
+        db.add(question)
+        db.flush()
+        db.add(QuestionTag(question_id=question.id, tag="二次函数" if i % 2 else "圆"))
+        db.add(QuestionTag(question_id=question.id, tag=f"标签{i % 3}"))
+    db.commit()
+    db.close()
+
+    AsyncTestingSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncTestingSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    answer_record_writer.session_factory = AsyncTestingSession
+    question_cache.invalidate()
+    analytics_engine.clear()
+    yield engine, async_engine
+    app.dependency_overrides.pop(get_async_db, None)
+    answer_record_writer.session_factory = None
+    question_cache.invalidate()
+    analytics_engine.clear()
+    engine.dispose()
+    async_engine.sync_engine.dispose()
+
+
+def _count_queries(engine):
+    """统计执行的SQL语句数"""
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_get_questions_constant_query_count(db_engine):
+    """测试题目列表的查询数不随limit增长，缓存命中后不再查询数据库"""
+    client = TestClient(app)
+    statements = _count_queries(db_engine[1].sync_engine)
+
+    response = client.get("/api/questions", params={"limit": 20})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["questions"]) == 20
+    assert data["total"] == 25
+    assert all(len(q["tags"]) == 2 for q in data["questions"])
+    # 题目 + 标签
+    assert len(statements) == 2
+
+    client.get("/api/questions", params={"limit": 5, "difficulty": 1})
+    client.get("/api/tags")
+    assert len(statements) == 2
+
+
+def test_get_questions_keyset_pagination(db_engine):
+    """测试游标分页遍历全部题目"""
+    client = TestClient(app)
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 10, "tags": "二次函数"}
+        if cursor is not None:
+            params["cursor"] = cursor
+        data = client.get("/api/questions", params=params).json()
+        assert data["total"] == 13
+        seen.extend(q["id"] for q in data["questions"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 13
+    assert seen == sorted(set(seen))
+
+
+def test_get_question_by_id(db_engine):
+    """测试获取单个题目及其标签"""
+    client = TestClient(app)
+    response = client.get("/api/questions/1")
+
+    assert response.status_code == 200
+    assert sorted(response.json()["tags"]) == ["二次函数", "标签1"]
+    assert client.get("/api/questions/999").status_code == 404
+
+
+def test_question_endpoints_etag(db_engine):
+    """测试ETag条件请求返回304"""
+    client = TestClient(app)
+    for url in ("/api/questions", "/api/questions/1", "/api/tags"):
+        response = client.get(url)
+        etag = response.headers["ETag"]
+        assert response.status_code == 200
+
+        cached = client.get(url, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+
+
+def test_question_cache_invalidated_on_write(db_engine):
+    """测试题库写入后缓存失效，ETag随之变化"""
+    client = TestClient(app)
+    first = client.get("/api/tags")
+    assert "新标签" not in first.json()
+
+    db = sessionmaker(bind=db_engine[0])()
+    db.add(QuestionTag(question_id=1, tag="新标签"))
+    db.commit()
+    db.close()
+
+    second = client.get("/api/tags", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert "新标签" in second.json()
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+@pytest.mark.asyncio
+async def test_question_cache_concurrent_reload_loads_once():
+    """测试冷启动和缓存过期时，并发请求只加载一次题库"""
+    import asyncio
+    from services.question.question_cache import QuestionBankCache
+
+    loads = []
+
+    class SlowResult:
+        def scalars(self):
+            return self
+
+        def all(self):
+            return []
+
+    class SlowSession:
+        async def execute(self, statement):
+            loads.append(statement)
+            await asyncio.sleep(0.01)
+            return SlowResult()
+
+    cache = QuestionBankCache(ttl=300)
+    snapshots = await asyncio.gather(*[cache.aget_snapshot(SlowSession()) for _ in range(10)])
+    assert len(loads) == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+
+    # 缓存过期后同样只有一个请求重新加载
+    snapshots[0].loaded_at -= 301
+    await asyncio.gather(*[cache.aget_snapshot(SlowSession()) for _ in range(10)])
+    assert len(loads) == 2
+
+
+def test_create_answer_record_and_analysis(db_engine):
+    """测试通过异步会话保存答题记录和获取分析数据"""
+    client = TestClient(app)
+    response = client.post(
+        "/api/answer-records",
+        json={"question_id": 1, "student_input": "x=1", "tag": "二次函数", "hint_count": 1},
+    )
+    assert response.status_code == 200
+    assert response.json()["question_id"] == 1
+
+    db = sessionmaker(bind=db_engine[0])()
+    assert db.query(AnswerRecord).count() == 1
+    db.close()
+
+    analysis = client.get("/api/analysis", params={"question_id": 1})
+    assert analysis.status_code == 200
+    tag_scores = analysis.json()["tag_scores"]
+    assert set(tag_scores) == {"二次函数", "标签1"}
+    # 一次提示、无用时记录：100 * (0.5 * 0 + 0.5 / 2)
+    assert tag_scores["二次函数"] == 25
+    # GET不再写入分析快照
+    assert db_engine[0].connect().exec_driver_sql("SELECT COUNT(*) FROM student_analyses").scalar() == 0
+
+
+def test_create_answer_records_batch(db_engine):
+    """测试批量提交答题记录，按提交顺序返回记录ID"""
+    client = TestClient(app)
+    records = [{"question_id": i, "student_input": f"步骤{i}", "time_spent": 60} for i in range(1, 6)]
+    response = client.post("/api/answer-records/batch", json={"records": records})
+
+    assert response.status_code == 200
+    data = response.json()["records"]
+    assert [r["question_id"] for r in data] == [1, 2, 3, 4, 5]
+    assert [r["id"] for r in data] == sorted(r["id"] for r in data)
+
+    db = sessionmaker(bind=db_engine[0])()
+    assert db.query(AnswerRecord).count() == 5
+    db.close()
+
+    assert client.post("/api/answer-records/batch", json={"records": []}).status_code == 422
+
+
+def test_get_tag_stats(db_engine):
+    """测试知识点统计随答题记录写入增量更新"""
+    client = TestClient(app)
+    assert client.get("/api/tag-stats").json() == []
+
+    records = [
+        {"question_id": 1, "student_input": "x=1", "tag": "二次函数", "time_spent": 240, "hint_count": 0},
+        {"question_id": 3, "student_input": "x=2", "tag": "二次函数", "time_spent": 360, "hint_count": 2},
+        {"question_id": 2, "student_input": "r=3", "tag": "圆", "hint_count": 1},
+    ]
+    client.post("/api/answer-records/batch", json={"records": records})
+
+    stats = {s["tag"]: s for s in client.get("/api/tag-stats", params={"days": 1}).json()}
+    assert stats["二次函数"]["record_count"] == 2
+    assert stats["二次函数"]["avg_time"] == 300
+    assert stats["二次函数"]["avg_hints"] == 1
+    assert stats["二次函数"]["no_hint_rate"] == 0.5
+    assert stats["圆"]["avg_time"] is None
+
+
+def test_get_tag_stats_rejects_invalid_days(db_engine):
+    """测试days小于1时返回422"""
+    client = TestClient(app)
+
+    assert client.get("/api/tag-stats", params={"days": 0}).status_code == 422
+    assert client.get("/api/tag-stats", params={"days": -3}).status_code == 422
+    assert client.get("/api/tag-stats", params={"days": 1}).status_code == 200
+
+
+def test_get_questions_rejects_invalid_limit(db_engine):
+    """测试limit超出1-100时返回422"""
+    client = TestClient(app)
+
+    assert client.get("/api/questions", params={"limit": 0}).status_code == 422
+    assert client.get("/api/questions", params={"limit": -5}).status_code == 422
+    assert client.get("/api/questions", params={"limit": 101}).status_code == 422
+    assert client.get("/api/questions", params={"limit": 100}).status_code == 200
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from config.settings import Settings
+from models.base import Base, create_engine_from_settings, create_async_engine_from_settings
+from models.models import AnswerRecord, Question, QuestionType
+from services.answer.record_writer import AnswerRecordWriter
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """临时数据库的异步会话工厂"""
+    settings = Settings()
+    settings.database_url = f"sqlite:///{tmp_path / 'records.db'}"
+    engine = create_engine_from_settings(settings)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Question.__table__.insert(), [{"type": QuestionType.CHOICE, "content": "题目"}])
+    engine.dispose()
+
+    async_engine = create_async_engine_from_settings(settings)
+    yield async_sessionmaker(async_engine, expire_on_commit=False)
+    async_engine.sync_engine.dispose()
+
+
+async def _count(session_factory):
+    async with session_factory() as db:
+        return (await db.execute(select(func.count(AnswerRecord.id)))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_share_one_batch(session_factory):
+    """测试并发提交的记录在一个事务中写入"""
+    writer = AnswerRecordWriter(session_factory, batch_size=100, flush_interval=0.05)
+
+    results = await asyncio.gather(*[
+        writer.submit({"question_id": 1, "student_input": f"步骤{i}"}) for i in range(20)
+    ])
+
+    assert len({record_id for record_id, _ in results}) == 20
+    assert writer.stats() == {"records_written": 20, "batches_written": 1, "pending": 0}
+    assert await _count(session_factory) == 20
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting(session_factory):
+    """测试缓冲区达到批量大小时立即写入"""
+    writer = AnswerRecordWriter(session_factory, batch_size=5, flush_interval=10)
+
+    results = await asyncio.wait_for(
+        writer.submit_many([{"question_id": 1} for _ in range(5)]), timeout=2
+    )
+
+    assert len(results) == 5
+    assert writer.batches_written == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_row_fails_only_its_submitter(session_factory):
+    """测试批次中有错误记录时拆分重试，只有对应的提交方收到异常"""
+    writer = AnswerRecordWriter(session_factory, flush_interval=0.01)
+
+    results = await asyncio.gather(
+        writer.submit({"question_id": 1, "student_input": "步骤1"}),
+        writer.submit({"question_id": None}),
+        writer.submit_many([{"question_id": 1}, {"question_id": 1}]),
+        writer.submit({"question_id": 1, "student_input": "步骤2"}),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[1], Exception)
+    assert not isinstance(results[0], Exception)
+    assert len(results[2]) == 2
+    assert not isinstance(results[3], Exception)
+    assert await _count(session_factory) == 4
+    assert writer.records_written == 4
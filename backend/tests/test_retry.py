@@ -0,0 +1,76 @@
+import pytest
+from utils.retry import async_retry, is_retryable_error, jittered_backoff, RetryBudget
+
+
+class StatusError(Exception):
+    """带HTTP状态码的测试异常"""
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_is_retryable_error_classification():
+    """测试异常分类：限流和服务端错误重试，客户端错误不重试"""
+    assert is_retryable_error(StatusError(429)) is True
+    assert is_retryable_error(StatusError(503)) is True
+    assert is_retryable_error(StatusError(400)) is False
+    assert is_retryable_error(StatusError(401)) is False
+    assert is_retryable_error(RuntimeError("豆包API调用失败: 状态码 429, 错误信息: busy")) is True
+    assert is_retryable_error(RuntimeError("豆包API调用失败: 状态码 400, 错误信息: bad")) is False
+    assert is_retryable_error(ValueError("不支持的模型类型")) is False
+    assert is_retryable_error(ConnectionError("网络错误")) is True
+
+
+def test_jittered_backoff_within_bounds():
+    """测试抖动退避不超过指数退避上限"""
+    for attempt in range(6):
+        delay = jittered_backoff(attempt, 1.0, 8.0)
+        assert 0 <= delay <= min(2 ** attempt, 8.0)
+
+
+@pytest.mark.asyncio
+async def test_async_retry_retries_transient_errors():
+    """测试临时错误被重试直到成功"""
+    calls = []
+
+    @async_retry(max_attempts=3, base_delay=0)
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise StatusError(429)
+        return "ok"
+
+    assert await flaky() == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_retry_does_not_retry_client_errors():
+    """测试客户端错误立即抛出"""
+    calls = []
+
+    @async_retry(max_attempts=3, base_delay=0)
+    async def bad_request():
+        calls.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        await bad_request()
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_retry_respects_budget():
+    """测试重试预算耗尽后不再重试"""
+    budget = RetryBudget(max_tokens=1, refill_rate=0)
+    calls = []
+
+    @async_retry(max_attempts=5, base_delay=0, budget=budget)
+    async def always_fails():
+        calls.append(1)
+        raise StatusError(503)
+
+    with pytest.raises(StatusError):
+        await always_fails()
+    # 首次调用 + 1次预算内重试
+    assert len(calls) == 2
@@ -147,3 +147,83 @@ def test_generate_socratic_hint_middle_school_cases():
 
 
 
+
+
+def test_aho_corasick_finds_overlapping_keywords():
+    """测试自动机一次扫描找出重叠和嵌套的关键词"""
+    from services.hint.rule_engine import AhoCorasickAutomaton
+
+    automaton = AhoCorasickAutomaton(["配方", "配方法", "方法", "he", "she", "hers"])
+    assert automaton.find_all("用配方法解") == {"配方", "配方法", "方法"}
+    assert automaton.find_all("ushers") == {"she", "he", "hers"}
+    assert automaton.find_all("无关文本") == set()
+
+
+def test_rule_engine_priority_and_conjunction():
+    """测试规则按优先级返回，组合条件需全部出现"""
+    from services.hint.rule_engine import SocraticRule, SocraticRuleEngine
+
+    engine = SocraticRuleEngine(rules=[
+        SocraticRule(1, "calc", ["计算"], "计算提示"),
+        SocraticRule(0, "line", [["作", "线"]], "辅助线提示"),
+    ])
+    assert engine.match("作线段后计算").pattern_id == "line"
+    assert engine.match("作图后计算").pattern_id == "calc"
+    assert engine.match("其他") is None
+
+
+def test_rule_engine_reloads_when_stale():
+    """测试规则变更后重新加载"""
+    from services.hint.rule_engine import SocraticRule, SocraticRuleEngine
+
+    rules = [SocraticRule(0, "vertex", ["顶点"], "顶点提示")]
+    engine = SocraticRuleEngine(loader=lambda: list(rules))
+    assert engine.match("求顶点坐标").hint_text == "顶点提示"
+
+    rules.append(SocraticRule(1, "root", ["开方"], "开方提示"))
+    assert engine.match("两边开方") is None
+    engine.mark_stale()
+    assert engine.match("两边开方").hint_text == "开方提示"
+
+
+def test_rule_engine_loads_before_first_match():
+    """测试带初始规则和加载函数的引擎在首次匹配前加载完整规则"""
+    from services.hint.rule_engine import SocraticRule, SocraticRuleEngine
+
+    engine = SocraticRuleEngine(
+        rules=[SocraticRule(0, "vertex", ["顶点"], "顶点提示")],
+        loader=lambda: [SocraticRule(0, "vertex", ["顶点"], "顶点提示"), SocraticRule(1, "root", ["开方"], "开方提示")],
+    )
+    assert engine.match("两边开方").hint_text == "开方提示"
+
+
+def test_rule_accepts_single_string_trigger():
+    """测试触发条件为单个字符串时作为一个关键词，而不是逐个字符"""
+    from services.hint.rule_engine import SocraticRule, SocraticRuleEngine
+
+    engine = SocraticRuleEngine(rules=[SocraticRule(0, "vertex", "顶点坐标", "顶点提示")])
+    assert engine.match("求顶点坐标").hint_text == "顶点提示"
+    assert engine.match("求顶点") is None
+
+
+@pytest.mark.asyncio
+async def test_rule_engine_reloads_off_event_loop():
+    """测试在事件循环中匹配时，规则在后台线程加载，不阻塞本次匹配"""
+    import threading
+    from services.hint.rule_engine import SocraticRule, SocraticRuleEngine
+
+    threads = []
+
+    def loader():
+        threads.append(threading.get_ident())
+        return [SocraticRule(0, "root", ["开方"], "开方提示")]
+
+    engine = SocraticRuleEngine(rules=[], loader=loader)
+    assert engine.match("两边开方") is None
+    await engine._reload_task
+
+    assert threads and threading.get_ident() not in threads
+    assert engine.match("两边开方").hint_text == "开方提示"
+
+    await engine.areload()
+    assert len(threads) == 2
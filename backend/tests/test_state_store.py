@@ -0,0 +1,315 @@
+import json
+import time
+import pytest
+from storage.state_store import (
+    StateStore,
+    MemoryStateStoreBackend,
+    SQLiteStateStoreBackend,
+    RedisStateStoreBackend,
+)
+from services.conversation.conversation_history import ConversationHistory
+from services.learning.learning_tracker import LearningTracker
+
+
+class FakeRedis:
+    """兼容Redis协议的测试替身"""
+    def __init__(self):
+        self.data = {}
+        self.commands = 0
+
+    def get(self, key):
+        self.commands += 1
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value
+
+    def set(self, key, value, px=None):
+        self.commands += 1
+        self.data[key] = (value, time.time() + px / 1000 if px else None)
+
+    def delete(self, key):
+        self.commands += 1
+        self.data.pop(key, None)
+
+    def rpush(self, key, *values):
+        self.commands += 1
+        current, expires_at = self.data.get(key, ([], None))
+        self.data[key] = (current + list(values), expires_at)
+
+    def ltrim(self, key, start, end):
+        self.commands += 1
+        current, expires_at = self.data.get(key, ([], None))
+        self.data[key] = (current[start:end + 1 if end != -1 else None], expires_at)
+
+    def lrange(self, key, start, end):
+        self.commands += 1
+        return list(self.get(key) or [])[start:end + 1 if end != -1 else None]
+
+    def pexpire(self, key, px):
+        self.commands += 1
+        if key in self.data:
+            self.data[key] = (self.data[key][0], time.time() + px / 1000)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStateStoreBackend()
+    if request.param == "sqlite":
+        return SQLiteStateStoreBackend(str(tmp_path / "state.db"))
+    return RedisStateStoreBackend(client=FakeRedis())
+
+
+def test_backend_roundtrip(backend):
+    """测试各后端的批量读写和删除"""
+    backend.set_many({"a": "1", "b": "2"})
+    backend.set_many({"c": "3"}, ttl=0.001)
+    time.sleep(0.01)
+
+    assert backend.get_many(["a", "b", "c", "d"]) == {"a": "1", "b": "2"}
+    backend.delete_many(["a"])
+    assert backend.get_many(["a", "b"]) == {"b": "2"}
+
+
+def test_store_batches_writes():
+    """测试写入先进入缓冲区，达到批量大小后一次写入后端"""
+    client = FakeRedis()
+    store = StateStore(RedisStateStoreBackend(client=client), batch_size=3, flush_interval=60)
+
+    store.set("a", {"x": 1})
+    store.set("b", [1, 2])
+    assert client.commands == 0
+    assert store.get("a") == {"x": 1}
+
+    store.set("c", "文本")
+    assert store.flushes == 1
+    assert RedisStateStoreBackend(client=client).get_many(["c"]) == {"c": '"文本"'}
+
+
+def test_store_read_through_sees_other_worker_writes():
+    """测试本进程缓存过期后读取其他worker写入的值"""
+    backend = MemoryStateStoreBackend()
+    worker_a = StateStore(backend, flush_interval=0)
+    worker_b = StateStore(backend, flush_interval=0, cache_ttl=0)
+
+    worker_a.set("k", 1)
+    assert worker_b.get("k") == 1
+    worker_a.set("k", 2)
+    assert worker_b.get("k") == 2
+    worker_a.delete("k")
+    assert worker_b.get("k") is None
+
+
+def test_conversation_history_shared_across_workers(tmp_path):
+    """测试对话历史在重启或切换worker后从存储恢复"""
+    backend = SQLiteStateStoreBackend(str(tmp_path / "state.db"))
+    first = ConversationHistory(max_history_length=3, store=StateStore(backend, flush_interval=60))
+    for i in range(4):
+        first.add_message("c1", "user", f"步骤{i}")
+    first.flush()
+
+    second = ConversationHistory(max_history_length=3, store=StateStore(backend))
+    assert [m["content"] for m in second.get_history("c1")] == ["步骤1", "步骤2", "步骤3"]
+
+    second.clear_history("c1")
+    second.flush()
+    third = ConversationHistory(store=StateStore(backend))
+    assert third.get_history("c1") == []
+
+
+def test_remove_client_keeps_persisted_history(tmp_path):
+    """测试断开或心跳超时移除客户端只释放内存副本，重连后仍可从存储加载"""
+    backend = SQLiteStateStoreBackend(str(tmp_path / "state.db"))
+    history = ConversationHistory(store=StateStore(backend, flush_interval=60))
+    history.add_message("c1", "user", "步骤1")
+    history.flush()
+
+    history.remove_client("c1")
+    history.flush()
+    assert history.get_client_count() == 0
+    assert [m["content"] for m in history.get_history("c1")] == ["步骤1"]
+
+
+def test_backend_list_append_and_trim(backend):
+    """测试各后端的列表追加、截断和删除"""
+    backend.append_many({"l": ["1", "2"]})
+    backend.append_many({"l": ["3", "4"]}, max_length=3)
+
+    assert backend.get_list("l") == ["2", "3", "4"]
+    assert backend.get_list("missing") == []
+    backend.delete_many(["l"])
+    assert backend.get_list("l") == []
+
+
+def test_conversation_appends_from_workers_do_not_overwrite(tmp_path):
+    """测试两个worker交替写入同一客户端的对话时不会覆盖对方的消息"""
+    backend = SQLiteStateStoreBackend(str(tmp_path / "state.db"))
+    worker_a = ConversationHistory(store=StateStore(backend, flush_interval=0, cache_ttl=0))
+    worker_b = ConversationHistory(store=StateStore(backend, flush_interval=0, cache_ttl=0))
+
+    worker_a.add_message("c1", "user", "a1")
+    worker_b.add_message("c1", "user", "b1")
+    worker_a.add_message("c1", "user", "a2")
+
+    expected = ["a1", "b1", "a2"]
+    assert [json.loads(raw)[1] for raw in backend.get_list("conversation:c1")] == expected
+    assert [m["content"] for m in worker_a.get_history("c1")] == expected
+    assert [m["content"] for m in worker_b.get_history("c1")] == expected
+
+
+def test_learning_tracker_shared_across_workers():
+    """测试学习会话在其他worker中可继续记录"""
+    backend = MemoryStateStoreBackend()
+    first = LearningTracker(store=StateStore(backend, flush_interval=0))
+    session_id = first.start_session("u1", "p1", "解方程")
+    first.add_step(session_id, "移项", hint_used=True)
+
+    second = LearningTracker(store=StateStore(backend, flush_interval=0, cache_ttl=0))
+    second.add_step(session_id, "化简", error_type="计算错误")
+    second.end_session(session_id)
+
+    sessions = first.get_user_sessions("u1")
+    assert len(sessions) == 1
+    report = LearningTracker(store=StateStore(backend)).generate_report(session_id)
+    assert report["step_count"] == 2
+    assert report["hint_count"] == 1
+    assert report["error_types"] == {"计算错误": 1}
+
+
+def test_learning_tracker_concurrent_starts_keep_all_sessions():
+    """测试两个worker为同一用户开始会话时不会丢失会话ID，修改前读取最新的会话数据"""
+    backend = MemoryStateStoreBackend()
+    worker_a = LearningTracker(store=StateStore(backend, flush_interval=0))
+    worker_b = LearningTracker(store=StateStore(backend, flush_interval=0))
+
+    worker_a.get_user_sessions("u1")
+    worker_b.get_user_sessions("u1")
+    first = worker_a.start_session("u1", "p1", "解方程")
+    second = worker_b.start_session("u1", "p2", "证明全等")
+
+    sessions = LearningTracker(store=StateStore(backend)).get_user_sessions("u1")
+    assert sorted(s["problem_id"] for s in sessions) == ["p1", "p2"]
+
+    worker_a.add_step(first, "移项")
+    worker_b.add_step(first, "化简")
+    assert worker_a.generate_report(first)["step_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_flusher_writes_idle_buffer():
+    """测试没有新的写入时，后台任务也会在刷新间隔内写入缓冲区"""
+    import asyncio
+
+    backend = MemoryStateStoreBackend()
+    store = StateStore(backend, flush_interval=0.05)
+    store.set("k", 1)
+    assert backend.get_many(["k"]) == {}
+
+    task = asyncio.create_task(store.run_flusher())
+    await asyncio.sleep(0.2)
+    task.cancel()
+
+    assert backend.get_many(["k"]) == {"k": "1"}
+
+
+@pytest.mark.asyncio
+async def test_store_io_runs_off_event_loop():
+    """测试在事件循环中读取和写入后端时在线程池中执行"""
+    import asyncio
+    import threading
+
+    threads = []
+
+    class RecordingBackend(MemoryStateStoreBackend):
+        def get_list(self, key):
+            threads.append(threading.get_ident())
+            return super().get_list(key)
+
+        def append_many(self, items, ttl=0, max_length=0):
+            threads.append(threading.get_ident())
+            super().append_many(items, ttl, max_length)
+
+    store = StateStore(RecordingBackend(), flush_interval=0, cache_ttl=0)
+    history = ConversationHistory(store=store)
+    history.add_message("c1", "user", "步骤")
+    await store._flush_task
+    assert [m["content"] for m in await history.aget_history("c1")] == ["步骤"]
+
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+
+
+def test_store_read_cache_bounded():
+    """测试读缓存按最大条目数淘汰，过期条目可被清理"""
+    backend = MemoryStateStoreBackend()
+    store = StateStore(backend, flush_interval=0, max_cache_entries=2)
+    for key in ("a", "b", "c"):
+        store.set(key, key)
+
+    assert list(store._cache) == ["b", "c"]
+    assert store.get("a") == "a"
+    assert list(store._cache) == ["c", "a"]
+
+    store.cache_ttl = 0
+    time.sleep(0.01)
+    assert store.prune() == 2
+    assert not store._cache
+
+
+class BlockingBackend(MemoryStateStoreBackend):
+    """写入时等待放行的内存后端，用于模拟进行中的写入"""
+    def __init__(self):
+        super().__init__()
+        import threading
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.written = []
+
+    def set_many(self, items, ttl=0):
+        self.writing.set()
+        assert self.release.wait(5)
+        super().set_many(items, ttl)
+        self.written.append(dict(items))
+
+    def append_many(self, items, ttl=0, max_length=0):
+        self.writing.set()
+        assert self.release.wait(5)
+        super().append_many(items, ttl, max_length)
+
+
+def test_interleaved_flushes_and_reads_keep_latest_state():
+    """测试写入期间的读取能看到正在写入的修改，两次写入按修改顺序提交"""
+    import threading
+
+    backend = BlockingBackend()
+    store = StateStore(backend, flush_interval=60, cache_ttl=60)
+    store.set("k", 1)
+    store.append("l", "a")
+
+    first = threading.Thread(target=store.flush)
+    first.start()
+    assert backend.writing.wait(5)
+
+    # 第一次写入尚未提交：读取仍能看到正在写入的值，也不会缓存后端的旧值
+    assert store.get("k", refresh=True) == 1
+    store.set("k", 2)
+    store.append("l", "b")
+    second = threading.Thread(target=store.flush)
+    second.start()
+
+    reads = []
+    reader = threading.Thread(target=lambda: reads.append((store.get("k", refresh=True), store.get_list("l"))))
+    store.evict(["l"])
+    reader.start()
+
+    backend.release.set()
+    for thread in (first, second, reader):
+        thread.join(5)
+        assert not thread.is_alive()
+
+    assert backend.written == [{"k": "1"}, {"k": "2"}]
+    assert reads == [(2, ["a", "b"])]
+    fresh = StateStore(backend)
+    assert fresh.get("k") == 2
+    assert fresh.get_list("l") == ["a", "b"]
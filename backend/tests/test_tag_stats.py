@@ -0,0 +1,200 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from config.settings import Settings
+from models.base import Base, create_engine_from_settings, create_async_engine_from_settings
+from models.models import AnswerRecord, Question, QuestionType, TagStat
+from services.analysis.analytics_engine import AnalyticsEngine
+from services.analysis.tag_stats import apply_answer_records, rebuild_tag_stats
+from services.answer.record_writer import AnswerRecordWriter
+
+RECORDS = [
+    {"question_id": 1, "tag": "二次函数", "level": "beginner", "time_spent": 200, "hint_count": 0},
+    {"question_id": 1, "tag": "二次函数", "level": "beginner", "time_spent": 400, "hint_count": 2},
+    {"question_id": 2, "tag": "全等三角形", "level": "advanced", "time_spent": None, "hint_count": 1},
+    {"question_id": 2, "tag": None, "level": None, "time_spent": 100, "hint_count": 0},
+]
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """临时数据库的同步引擎和异步会话工厂"""
+    settings = Settings()
+    settings.database_url = f"sqlite:///{tmp_path / 'stats.db'}"
+    engine = create_engine_from_settings(settings)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Question.__table__.insert(), [
+            {"id": 1, "type": QuestionType.CALCULATION, "content": "解方程"},
+            {"id": 2, "type": QuestionType.PROOF, "content": "证明全等"},
+        ])
+
+    async_engine = create_async_engine_from_settings(settings)
+    yield engine, async_sessionmaker(async_engine, expire_on_commit=False)
+    async_engine.sync_engine.dispose()
+    engine.dispose()
+
+
+def _stat_rows(engine):
+    db = sessionmaker(bind=engine)()
+    try:
+        rows = db.execute(select(TagStat).order_by(TagStat.tag, TagStat.level, TagStat.question_type)).scalars().all()
+        return [
+            (r.tag, r.level, r.question_type, r.day, r.record_count, r.hint_total,
+             r.no_hint_count, r.time_total, r.timed_count, r.target_total)
+            for r in rows
+        ]
+    finally:
+        db.close()
+
+
+@pytest.mark.asyncio
+async def test_incremental_stats_match_rebuild(engines):
+    """测试增量维护的统计与重建结果一致"""
+    engine, session_factory = engines
+    writer = AnswerRecordWriter(session_factory, flush_interval=0.01)
+    writer.add_batch_hook(apply_answer_records)
+
+    await writer.submit_many(RECORDS[:2])
+    await writer.submit_many(RECORDS[2:])
+    incremental = _stat_rows(engine)
+
+    assert len(incremental) == 3
+    quadratic = next(row for row in incremental if row[0] == "二次函数")
+    assert quadratic[2] == "calculation"
+    assert quadratic[4:] == (2, 2, 1, 600, 2, 600)
+
+    db = sessionmaker(bind=engine)()
+    assert rebuild_tag_stats(db) == 3
+    db.close()
+    assert _stat_rows(engine) == incremental
+
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_records_of_unknown_questions(engines):
+    """测试题目不存在的记录在增量维护和重建中同样计入统计，题型为空"""
+    engine, session_factory = engines
+    writer = AnswerRecordWriter(session_factory, flush_interval=0.01)
+    writer.add_batch_hook(apply_answer_records)
+
+    await writer.submit_many([RECORDS[0], dict(RECORDS[0], question_id=99)])
+    incremental = _stat_rows(engine)
+    assert sorted(row[2] for row in incremental) == ["", "calculation"]
+
+    db = sessionmaker(bind=engine)()
+    assert rebuild_tag_stats(db) == 2
+    db.close()
+    assert _stat_rows(engine) == incremental
+
+
+@pytest.mark.asyncio
+async def test_class_analysis_reads_tag_stats(engines):
+    """测试全体统计来自汇总表，与逐条聚合的结果一致"""
+    engine, session_factory = engines
+    writer = AnswerRecordWriter(session_factory, flush_interval=0.01)
+    writer.add_batch_hook(apply_answer_records)
+    await writer.submit_many([dict(record, student_id="a") for record in RECORDS])
+
+    analytics = AnalyticsEngine()
+    async with session_factory() as db:
+        from_stats = await analytics.compute(db)
+        from_records = await analytics.compute(db, student_id="a")
+
+    assert from_stats == from_records
+
+
+@pytest.mark.asyncio
+async def test_failed_stats_update_rolls_back_batch(engines):
+    """测试统计更新失败时答题记录一并回滚"""
+    engine, session_factory = engines
+
+    async def failing_hook(db, rows):
+        raise RuntimeError("统计更新失败")
+
+    writer = AnswerRecordWriter(session_factory, flush_interval=0.01)
+    writer.add_batch_hook(failing_hook)
+    with pytest.raises(RuntimeError):
+        await writer.submit(RECORDS[0])
+
+    db = sessionmaker(bind=engine)()
+    assert db.query(AnswerRecord).count() == 0
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_upgrade_shipped_database_creates_tag_stats(tmp_path):
+    """测试升级仓库中的app.db时创建统计表，并根据已有的答题记录填充"""
+    import shutil
+    from pathlib import Path
+    from sqlalchemy import func
+    from models.schema import upgrade_schema
+
+    path = tmp_path / "app.db"
+    shutil.copy(Path(__file__).resolve().parent.parent / "app.db", path)
+    settings = Settings()
+    settings.database_url = f"sqlite:///{path}"
+    engine = create_engine_from_settings(settings)
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(AnswerRecord.__table__)).scalar()
+
+    assert upgrade_schema(engine) == ["tag_stats"]
+    assert upgrade_schema(engine) == []
+    db = sessionmaker(bind=engine)()
+    rebuild_tag_stats(db)
+    assert db.query(func.sum(TagStat.record_count)).scalar() == existing
+    db.close()
+
+    # 升级后答题记录写入时可以更新统计表
+    async_engine = create_async_engine_from_settings(settings)
+    writer = AnswerRecordWriter(async_sessionmaker(async_engine, expire_on_commit=False), flush_interval=0.01)
+    writer.add_batch_hook(apply_answer_records)
+    await writer.submit(RECORDS[0])
+    await async_engine.dispose()
+
+    db = sessionmaker(bind=engine)()
+    assert db.query(func.sum(TagStat.record_count)).scalar() == existing + 1
+    db.close()
+    engine.dispose()
+
+
+def test_startup_creates_and_fills_missing_tag_stats():
+    """测试应用启动时创建缺少的统计表并根据已有的答题记录填充"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import delete, inspect
+    from main import app
+    from models.base import engine
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Question.__table__.insert(), [{"id": 9001, "type": QuestionType.CHOICE, "content": "启动测试"}])
+        conn.execute(AnswerRecord.__table__.insert(), [{"question_id": 9001, "tag": "启动测试", "level": "beginner"}])
+    TagStat.__table__.drop(engine)
+
+    try:
+        with TestClient(app):
+            assert "tag_stats" in inspect(engine).get_table_names()
+        rows = [row for row in _stat_rows(engine) if row[0] == "启动测试"]
+        assert [row[:3] for row in rows] == [("启动测试", "beginner", QuestionType.CHOICE.value)]
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(AnswerRecord.__table__).where(AnswerRecord.question_id == 9001))
+            conn.execute(delete(Question.__table__).where(Question.id == 9001))
+            conn.execute(delete(TagStat.__table__))
+
+
+def test_global_writer_maintains_tag_stats_without_analytics_import():
+    """测试全局写入器自身注册统计钩子，不依赖分析模块是否已被导入"""
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    script = (
+        "import sys\n"
+        "from services.answer.record_writer import answer_record_writer, _apply_tag_stats\n"
+        "assert 'services.analysis.analytics_engine' not in sys.modules\n"
+        "assert answer_record_writer._batch_hooks == [_apply_tag_stats]\n"
+        "import services.analysis\n"
+        "assert answer_record_writer._batch_hooks == [_apply_tag_stats]\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).resolve().parent.parent, check=True)
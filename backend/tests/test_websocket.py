@@ -1,4 +1,5 @@
 import pytest
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 from main import app
 
@@ -79,6 +80,145 @@ async def test_websocket_step_message_without_content():
         assert "消息格式错误" in response["content"]
 
 
+@pytest.mark.asyncio
+async def test_websocket_step_message_uses_history():
+    """测试后续步骤的AI提示参考之前的对话"""
+    calls = []
+
+    async def fake_hint(step_content, question_id=None, history=None):
+        calls.append(history)
+        return "你能再想想吗？"
+
+    client = TestClient(app)
+    with patch("api.websocket.websocket.generate_socratic_hint", return_value=None), \
+            patch("api.websocket.websocket.get_ai_hint", fake_hint):
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({"type": "step", "content": "x=3"})
+            websocket.receive_json()
+            websocket.send_json({"type": "step", "content": "x=4"})
+            websocket.receive_json()
+
+    assert calls[0] == []
+    assert [(m["role"], m["content"]) for m in calls[1]] == [("user", "x=3"), ("ai", "你能再想想吗？")]
+
+
+@pytest.mark.asyncio
+async def test_websocket_subscribe_room():
+    """测试WebSocket订阅和退订房间"""
+    client = TestClient(app)
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_json({"type": "subscribe", "room": "class:3A"})
+        assert websocket.receive_json() == {"type": "subscribed", "room": "class:3A", "rooms": ["class:3A"]}
+        websocket.send_json({"type": "unsubscribe", "room": "class:3A"})
+        assert websocket.receive_json() == {"type": "unsubscribed", "room": "class:3A", "rooms": []}
+        websocket.send_json({"type": "subscribe"})
+        assert websocket.receive_json()["type"] == "error"
+
+
+@pytest.mark.asyncio
+async def test_websocket_concurrent_dispatch_and_step_cancellation():
+    """测试等待AI提示时心跳仍能响应，新的步骤取消过时的步骤"""
+    import asyncio
+
+    calls = []
+
+    async def fake_hint(step_content, question_id=None, history=None):
+        calls.append(step_content)
+        if step_content == "x=3":
+            await asyncio.sleep(10)
+        return f"关于{step_content}的提示"
+
+    client = TestClient(app)
+    with patch("api.websocket.websocket.generate_socratic_hint", return_value=None), \
+            patch("api.websocket.websocket.get_ai_hint", fake_hint):
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({"type": "step", "content": "x=3", "request_id": 1})
+            websocket.send_json({"type": "ping", "request_id": 2})
+            assert websocket.receive_json() == {"type": "pong", "request_id": 2}
+
+            websocket.send_json({"type": "step", "content": "x=4", "request_id": "3"})
+            cancelled = websocket.receive_json()
+            assert cancelled["type"] == "cancelled" and cancelled["request_id"] == 1
+            assert websocket.receive_json() == {"type": "hint", "content": "关于x=4的提示", "request_id": "3"}
+
+    assert calls == ["x=3", "x=4"]
+
+
+@pytest.mark.asyncio
+async def test_websocket_superseded_step_cancels_model_call():
+    """测试新的步骤取代上一个步骤时，上一个步骤的大模型调用被取消"""
+    import asyncio
+    from unittest.mock import AsyncMock
+    from services.ai.hint_cache import hint_cache
+
+    calls = []
+    cancelled = []
+
+    async def slow_generate(prompt, **kwargs):
+        calls.append(prompt)
+        if prompt.endswith("x=3\n请提出一个引导性问题。"):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(prompt)
+                raise
+        return "你检查过符号吗？"
+
+    hint_cache.clear()
+    client = TestClient(app)
+    with patch("api.websocket.websocket.generate_socratic_hint", return_value=None), \
+            patch("services.ai.model_client.client.ModelClient.agenerate",
+                  new_callable=AsyncMock, side_effect=slow_generate):
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({"type": "step", "content": "x=3", "request_id": 1})
+            websocket.send_json({"type": "ping"})
+            assert websocket.receive_json() == {"type": "pong"}
+
+            websocket.send_json({"type": "step", "content": "x=4", "request_id": 2})
+            assert websocket.receive_json()["type"] == "cancelled"
+            assert websocket.receive_json() == {"type": "hint", "content": "你检查过符号吗？", "request_id": 2}
+            # 连接仍然打开时上一个步骤的调用已被取消，而不是等到连接关闭
+            assert len(calls) == 2
+            assert cancelled == calls[:1]
+    hint_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_client_session_sends_nothing_after_close():
+    """测试连接断开时取消的消息不再发送响应，也不会标记为被新的步骤取代"""
+    import asyncio
+    from unittest.mock import AsyncMock
+    from api.websocket.websocket import ClientSession
+
+    async def slow_handle(client_id, raw_data, reply):
+        await asyncio.sleep(10)
+
+    session = ClientSession("c1")
+    with patch("api.websocket.websocket.handle_message", slow_handle), \
+            patch("api.websocket.websocket.manager.send_personal_message", new_callable=AsyncMock) as send:
+        await session.dispatch({"type": "step", "content": "x=3", "request_id": 1})
+        await session.dispatch({"type": "error_report", "content": "报告"})
+        tasks = list(session.tasks)
+        await asyncio.sleep(0)
+
+        session.cancel_all()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(task.cancelled() for task in tasks)
+    send.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_websocket_server_error_is_delivered_before_close():
+    """测试接收循环出错时，错误消息在断开连接前发送给客户端"""
+    client = TestClient(app)
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_text("不是JSON")
+        response = websocket.receive_json()
+        assert response["type"] == "error"
+        assert "服务器错误" in response["content"]
+
+
 @pytest.mark.asyncio
 async def test_health_check():
     """测试健康检查端点"""
@@ -95,3 +235,19 @@ async def test_root_endpoint():
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "欢迎使用初中数学残局挑战系统 API"}
+
+
+@pytest.mark.asyncio
+async def test_websocket_step_message_stream():
+    """测试WebSocket step消息流式返回AI提示"""
+    async def fake_stream(step_content, question_id=None, history=None):
+        for delta in ["你能", "再想想吗？"]:
+            yield delta
+
+    client = TestClient(app)
+    with patch("api.websocket.websocket.stream_ai_hint", fake_stream):
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({"type": "step", "content": "x=3", "stream": True})
+            assert websocket.receive_json() == {"type": "hint_delta", "content": "你能"}
+            assert websocket.receive_json() == {"type": "hint_delta", "content": "再想想吗？"}
+            assert websocket.receive_json() == {"type": "hint_done", "content": "你能再想想吗？"}
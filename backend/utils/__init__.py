@@ -1,20 +1,28 @@
 # 工具模块初始化
-from .id_generator import generate_uuid, generate_session_id
+from .id_generator import generate_uuid, generate_session_id, generate_ulid, ulid_timestamp, ulid_bound
 from .time_utils import format_datetime, get_timestamp, calculate_time_diff
-from .string_utils import sanitize_string, truncate_string, extract_keywords
-from .retry import retry, exponential_backoff
+from .string_utils import sanitize_string, truncate_string, extract_keywords, normalize_math_text
+from .retry import retry, async_retry, exponential_backoff, jittered_backoff, is_retryable_error, RetryBudget
 from .logger import get_logger
 
 __all__ = [
     "generate_uuid",
     "generate_session_id",
+    "generate_ulid",
+    "ulid_timestamp",
+    "ulid_bound",
     "format_datetime",
     "get_timestamp",
     "calculate_time_diff",
     "sanitize_string",
     "truncate_string",
     "extract_keywords",
+    "normalize_math_text",
     "retry",
+    "async_retry",
     "exponential_backoff",
+    "jittered_backoff",
+    "is_retryable_error",
+    "RetryBudget",
     "get_logger"
 ]
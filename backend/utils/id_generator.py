@@ -1,27 +1,130 @@
+import os
+import time
 import uuid
+import threading
 from datetime import datetime
+from typing import Union
+
+# Crockford Base32字母表，按字符排序与按数值排序一致
+_ENCODING = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODING = {char: index for index, char in enumerate(_ENCODING)}
+
+# ULID由48位毫秒时间戳和80位随机数组成，编码为26个字符
+_TIMESTAMP_BITS = 48
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+ULID_LENGTH = 26
+
+
+def _encode(value: int) -> str:
+    """将128位整数编码为26个字符"""
+    chars = []
+    for _ in range(ULID_LENGTH):
+        chars.append(_ENCODING[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+class MonotonicIdGenerator:
+    """
+    单调递增的ULID生成器
+
+    同一毫秒内生成的ID在上一个ID的随机部分上加1，系统时钟回拨时沿用上一个时间戳，
+    因此同一进程生成的ID严格递增；不同进程的ID由80位随机数区分。
+    ID按字符串排序即按生成时间排序，可用于时间范围查询
+    """
+
+    def __init__(self):
+        """初始化生成器"""
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def generate(self) -> str:
+        """
+        生成新的ID
+
+        Returns:
+            str: 26个字符的ULID
+        """
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms <= self._last_ms:
+                now_ms = self._last_ms
+                self._last_random += 1
+                if self._last_random > _RANDOM_MAX:
+                    # 同一毫秒内随机部分耗尽，借用下一毫秒
+                    now_ms += 1
+                    self._last_random = int.from_bytes(os.urandom(10), "big") >> 1
+            else:
+                # 最高位留空，保证同一毫秒内有足够的递增空间
+                self._last_random = int.from_bytes(os.urandom(10), "big") >> 1
+            self._last_ms = now_ms
+            return _encode((now_ms << _RANDOM_BITS) | self._last_random)
+
+
+# 进程级ID生成器
+_generator = MonotonicIdGenerator()
+
+
+def generate_ulid() -> str:
+    """
+    生成按时间排序的唯一ID（ULID）
+
+    Returns:
+        str: 26个字符的ULID，同一进程内严格递增
+    """
+    return _generator.generate()
+
+
+def ulid_timestamp(ulid: str) -> float:
+    """
+    获取ULID的生成时间
+
+    Args:
+        ulid: ULID字符串
+
+    Returns:
+        float: Unix时间戳（秒，精确到毫秒）
+    """
+    value = 0
+    for char in ulid[:10].upper():
+        value = (value << 5) | _DECODING[char]
+    return value / 1000
+
+
+def ulid_bound(moment: Union[datetime, float], upper: bool = False) -> str:
+    """
+    生成某一时刻的ULID边界，用于按时间范围查询排序后的ID
+
+    Args:
+        moment: 时间（datetime或Unix时间戳）
+        upper: 为True时返回该毫秒内的最大ID，否则返回最小ID
+
+    Returns:
+        str: ULID边界值
+    """
+    if isinstance(moment, datetime):
+        moment = moment.timestamp()
+    now_ms = min(max(int(moment * 1000), 0), (1 << _TIMESTAMP_BITS) - 1)
+    return _encode((now_ms << _RANDOM_BITS) | (_RANDOM_MAX if upper else 0))
 
 
 def generate_uuid() -> str:
     """
     生成唯一UUID
-    
+
     Returns:
         str: 唯一UUID字符串
     """
     return str(uuid.uuid4())
 
 
-def generate_session_id(user_id: str, problem_id: str) -> str:
+def generate_session_id() -> str:
     """
-    生成会话ID，格式：user_id_problem_id_timestamp
-    
-    Args:
-        user_id: 用户ID
-        problem_id: 问题ID
-    
+    生成会话ID，同一秒内多次生成也不会重复，按字符串排序即按创建时间排序
+
     Returns:
-        str: 会话ID字符串
+        str: 会话ID字符串（ULID）
     """
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    return f"{user_id}_{problem_id}_{timestamp}"
+    return generate_ulid()
@@ -1,7 +1,10 @@
+import re
 import time
+import random
+import asyncio
 import logging
 from functools import wraps
-from typing import Callable, Any, TypeVar, Tuple
+from typing import Callable, Any, Awaitable, Optional, TypeVar, Tuple, Type
 
 T = TypeVar('T')
 
@@ -25,6 +28,114 @@ def exponential_backoff(attempt: int, base_delay: float = 1.0, max_delay: float
     return min(delay, max_delay)
 
 
+def jittered_backoff(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """
+    计算带随机抖动的指数退避延迟时间（full jitter），
+    避免大量客户端在同一时刻集中重试
+    
+    Args:
+        attempt: 当前重试次数（从0开始）
+        base_delay: 基础延迟时间（秒）
+        max_delay: 最大延迟时间（秒）
+    
+    Returns:
+        float: 延迟时间（秒）
+    """
+    return random.uniform(0, exponential_backoff(attempt, base_delay, max_delay))
+
+
+# 可重试的HTTP状态码：超时、限流和服务端临时错误
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def get_status_code(exc: BaseException) -> Optional[int]:
+    """
+    从异常中提取HTTP状态码
+    
+    依次尝试异常的status_code属性、response.status_code属性，
+    以及错误信息中的"状态码 NNN"文本
+    
+    Args:
+        exc: 异常实例
+    
+    Returns:
+        Optional[int]: 状态码，无法识别时返回None
+    """
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status_code, int):
+        return status_code
+    
+    match = re.search(r"状态码\s*(\d{3})", str(exc))
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """
+    判断异常是否值得重试
+    
+    - 429、5xx等临时错误重试
+    - 400、401、404等客户端错误不重试
+    - ValueError/TypeError等参数或配置错误不重试
+    - 其他未知错误（网络异常等）重试
+    
+    Args:
+        exc: 异常实例
+    
+    Returns:
+        bool: 是否重试
+    """
+    if isinstance(exc, (ValueError, TypeError)):
+        return False
+    
+    status_code = get_status_code(exc)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return True
+
+
+class RetryBudget:
+    """
+    重试预算（令牌桶），限制单位时间内的重试总量，
+    防止上游故障时重试流量放大
+    """
+    
+    def __init__(self, max_tokens: float = 10.0, refill_rate: float = 1.0):
+        """
+        初始化重试预算
+        
+        Args:
+            max_tokens: 令牌桶容量，即允许的最大突发重试次数
+            refill_rate: 每秒补充的令牌数
+        """
+        self.max_tokens = max_tokens
+        self.refill_rate = refill_rate
+        self.tokens = max_tokens
+        self.updated_at = time.monotonic()
+    
+    def _refill(self) -> None:
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+    
+    def try_acquire(self) -> bool:
+        """
+        尝试消耗一个重试令牌
+        
+        Returns:
+            bool: 预算充足返回True，否则返回False
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
 def retry(
     exceptions: Tuple[Type[Exception], ...] = (Exception,),
     max_attempts: int = 3,
@@ -66,3 +177,56 @@ def retry(
                         raise
         return wrapper
     return decorator
+
+
+def async_retry(
+    exceptions: Tuple[Type[Exception], ...] = (Exception,),
+    max_attempts: int = 3,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    backoff_func: Callable[[int, float, float], float] = jittered_backoff,
+    retry_on: Callable[[BaseException], bool] = is_retryable_error,
+    budget: Optional[RetryBudget] = None
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """
+    异步重试装饰器，退避期间使用asyncio.sleep，不阻塞事件循环
+    
+    Args:
+        exceptions: 要捕获的异常类型元组
+        max_attempts: 最大尝试次数
+        base_delay: 基础延迟时间（秒）
+        max_delay: 最大延迟时间（秒）
+        backoff_func: 退避函数，默认带随机抖动
+        retry_on: 异常分类函数，返回False时立即抛出不再重试
+        budget: 重试预算，预算耗尽时立即抛出不再重试
+    
+    Returns:
+        Callable: 装饰器函数
+    """
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            for attempt in range(max_attempts):
+                try:
+                    return await func(*args, **kwargs)
+                except exceptions as e:
+                    if attempt >= max_attempts - 1:
+                        logger.error(
+                            f"函数 {func.__name__} 调用失败 (尝试 {attempt+1}/{max_attempts}): {str(e)}"
+                        )
+                        raise
+                    if not retry_on(e):
+                        logger.error(f"函数 {func.__name__} 调用失败，错误不可重试: {str(e)}")
+                        raise
+                    if budget is not None and not budget.try_acquire():
+                        logger.error(f"函数 {func.__name__} 调用失败，重试预算已耗尽: {str(e)}")
+                        raise
+                    
+                    delay = backoff_func(attempt, base_delay, max_delay)
+                    logger.warning(
+                        f"函数 {func.__name__} 调用失败 (尝试 {attempt+1}/{max_attempts}): {str(e)}. "
+                        f"等待 {delay:.2f} 秒后重试..."
+                    )
+                    await asyncio.sleep(delay)
+        return wrapper
+    return decorator
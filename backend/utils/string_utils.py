@@ -1,4 +1,5 @@
 import re
+import unicodedata
 from typing import List, Optional
 
 
@@ -74,3 +75,57 @@ def extract_keywords(text: str, max_keywords: int = 5) -> List[str]:
                 break
     
     return keywords
+
+
+# LaTeX排版命令，不影响数学含义
+_LATEX_LAYOUT_PATTERN = re.compile(r'\\(left|right|,|;|!|quad|qquad)')
+
+# 等价运算符的统一写法
+_MATH_SYMBOL_MAP = {
+    '\\times': '*',
+    '\\cdot': '*',
+    '×': '*',
+    '·': '*',
+    '\\div': '/',
+    '÷': '/',
+    '\\leq': '<=',
+    '\\geq': '>=',
+    '\\le': '<=',
+    '\\ge': '>=',
+    '≤': '<=',
+    '≥': '>=',
+}
+
+
+# 至少一侧不是字母数字的空格
+_OPERATOR_SPACE_PATTERN = re.compile(r'(?<![0-9A-Za-z]) | (?![0-9A-Za-z])')
+
+
+def normalize_math_text(text: str) -> str:
+    """
+    归一化数学解题步骤，使书写差异不同但含义相同的步骤得到相同结果
+    
+    与sanitize_string不同，保留运算符和等号，适合作为缓存键
+    
+    Args:
+        text: 输入字符串
+    
+    Returns:
+        str: 归一化后的字符串
+    """
+    # 全角字符转半角（如"＝"、"２"）
+    text = unicodedata.normalize('NFKC', text)
+    
+    # 去除LaTeX定界符和排版命令
+    text = text.replace('$', '')
+    text = _LATEX_LAYOUT_PATTERN.sub('', text)
+    
+    # 统一运算符写法（先替换较长的命令，避免\le误匹配\left等）
+    for symbol in sorted(_MATH_SYMBOL_MAP, key=len, reverse=True):
+        text = text.replace(symbol, _MATH_SYMBOL_MAP[symbol])
+    
+    # 连续空白合并为一个空格，只去掉运算符和汉字两侧的空白；
+    # 字母数字之间的空白和大小写保留，"2 3"与"23"、"X"与"x"含义不同
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = _OPERATOR_SPACE_PATTERN.sub('', text)
+    return text.rstrip('。.,，;；!！?？')
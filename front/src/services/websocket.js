@@ -2,6 +2,9 @@
 const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8765'
 const WS_RECONNECT_INTERVAL = 3000
 const WS_MAX_RECONNECT_ATTEMPTS = 5
+// 心跳间隔，需明显小于后端的 WEBSOCKET_HEARTBEAT_TIMEOUT（默认 90 秒），
+// 学生停下来思考时连接也不会被当作失效连接清理
+const WS_HEARTBEAT_INTERVAL = Number(import.meta.env.VITE_WS_HEARTBEAT_INTERVAL) || 25000
 
 /**
  * WebSocket 服务类
@@ -17,6 +20,8 @@ export class WebSocketService {
     this.listeners = new Map()
     this.isConnecting = false
     this.shouldReconnect = true
+    this.heartbeatInterval = WS_HEARTBEAT_INTERVAL
+    this.heartbeatTimer = null
   }
 
   /**
@@ -38,6 +43,7 @@ export class WebSocketService {
           console.log('WebSocket 连接成功')
           this.isConnecting = false
           this.reconnectAttempts = 0
+          this.startHeartbeat()
           this.emit('open')
           resolve()
         }
@@ -62,6 +68,7 @@ export class WebSocketService {
         this.ws.onclose = () => {
           console.log('WebSocket 连接关闭')
           this.isConnecting = false
+          this.stopHeartbeat()
           this.emit('close')
 
           // 自动重连
@@ -105,6 +112,18 @@ export class WebSocketService {
       case 'ai_response_end':
         this.emit('ai_response_end', data)
         break
+      case 'hint':
+        this.emit('hint', data)
+        break
+      case 'hint_delta':
+        this.emit('hint_delta', data)
+        break
+      case 'hint_done':
+        this.emit('hint_done', data)
+        break
+      case 'pong':
+        this.emit('pong', data)
+        break
       case 'error':
         this.emit('error', data)
         break
@@ -141,25 +160,26 @@ export class WebSocketService {
   }
 
   /**
-   * 发送聊天消息（请求 AI 提示）
-   */
-  sendChatMessage(userInput, question) {
-    const prompt = this.buildHintPrompt(question, userInput)
-    return this.send('chat', prompt)
-  }
-
-  /**
-   * 构建提示词
+   * 发送解题步骤，stream 为 true 时 AI 提示以 hint_delta/hint_done 逐段返回
+   * questionId 为当前题目 ID，后端据此将题目内容加入 AI 提示的上下文
    */
-  buildHintPrompt(question, userInput) {
-    return `你是一个数学解题助手。请根据学生的解题步骤，给出适当的提示，帮助他们解决这道数学题。
-
-题目：${question}
-
-学生当前的解题步骤：
-${userInput || '（学生还没有开始解题）'}
+  sendStep(content, { stream = true, questionId = null } = {}) {
+    if (!this.ws || this.ws.readyState !== WebSocket.OPEN) {
+      console.error('WebSocket 未连接，无法发送消息')
+      return false
+    }
 
-请给出简洁、鼓励的提示，不要直接给出答案，而是引导学生思考。如果学生还没有开始解题，请给出如何开始的建议。`
+    try {
+      const data = { type: 'step', content, stream }
+      if (questionId !== null && questionId !== undefined) {
+        data.question_id = questionId
+      }
+      this.ws.send(JSON.stringify(data))
+      return true
+    } catch (error) {
+      console.error('发送消息失败:', error)
+      return false
+    }
   }
 
   /**
@@ -176,10 +196,33 @@ ${userInput || '（学生还没有开始解题）'}
     return this.send('history')
   }
 
+  /**
+   * 开始定时发送心跳，让后端知道连接仍然有效
+   */
+  startHeartbeat() {
+    this.stopHeartbeat()
+    this.heartbeatTimer = setInterval(() => {
+      if (this.isConnected()) {
+        this.ws.send(JSON.stringify({ type: 'ping' }))
+      }
+    }, this.heartbeatInterval)
+  }
+
+  /**
+   * 停止发送心跳
+   */
+  stopHeartbeat() {
+    if (this.heartbeatTimer) {
+      clearInterval(this.heartbeatTimer)
+      this.heartbeatTimer = null
+    }
+  }
+
   /**
    * 断开连接
    */
   disconnect() {
+    this.stopHeartbeat()
     this.shouldReconnect = false
     if (this.ws) {
       this.ws.close()